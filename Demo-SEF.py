@@ -1,17 +1,25 @@
 import sys
 import os
-import requests
-import base64
 import json
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QPushButton, QLabel, QFileDialog, 
                              QVBoxLayout, QHBoxLayout, QWidget, QComboBox, QProgressBar, QTextEdit, 
                              QMessageBox, QTabWidget, QListWidget, QSplitter, QDialog, QDialogButtonBox, 
-                             QTreeWidget, QTreeWidgetItem, QLineEdit, QFormLayout)
+                             QTreeWidget, QTreeWidgetItem, QLineEdit, QFormLayout, QCheckBox, QSpinBox)
 from PyQt6.QtGui import QPixmap, QFont, QIcon
 from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QUrl
 from PyQt6.QtMultimedia import QMediaPlayer
 from PyQt6.QtMultimediaWidgets import QVideoWidget
 
+from sef.batch import BATCH_WORKERS, collect_media, format_stats
+from sef.client import has_api_key
+from sef.engine import AnalysisEngine
+from sef.history import HistoryModel, HistoryView
+from sef.images import ImageLoader
+from sef.logview import AnalysisLog
+from sef.jobs import QueueFull
+from sef.qt import AnalysisJob, BatchAnalysisJob, ScenarioAnalysisJob
+from sef.scheduler import format_scheduler_stats, get_scheduler
+
 API_KEY = 'YOUR_API_KEY'  # Replace with your actual API key
 API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent'
 
@@ -25,10 +33,22 @@ class SEFDemoApp(QMainWindow):
             "Medical Emergency": "A scenario where an individual is experiencing a critical health issue that requires immediate attention.",
             "Suspicious Package": "A scenario where an unattended package is found in a public place, raising concerns about its contents."
         }
+        self.engine = AnalysisEngine(API_URL, API_KEY)
+        # Both the media pool and the network loop reach the API host warm.
+        self.engine.prewarm()
         self.current_file = None
-        self.history = []
+        self.streaming_response = False
+        self.analysis_job = None
+        self.history = HistoryModel(parent=self)
+        self.displayed_file = None
+        self.image_loader = ImageLoader(parent=self)
+        self.image_loader.image_loaded.connect(self.show_image)
         self.initUI()
 
+        # Precompute the predefined scenarios so switching between them is instant
+        if has_api_key(API_KEY):
+            self.engine.warm_up_scenarios(self.scenarios)
+
     def initUI(self):
         self.setWindowTitle("Enhanced SEF Interactive Demo")
         self.setGeometry(100, 100, 1400, 900)
@@ -57,6 +77,33 @@ class SEFDemoApp(QMainWindow):
         self.analyze_btn.clicked.connect(self.start_analysis)
         left_layout.addWidget(self.analyze_btn)
 
+        # Stream AI answers into the Analysis tab as they are generated
+        self.stream_checkbox = QCheckBox("Stream Results", self)
+        self.stream_checkbox.setChecked(True)
+        left_layout.addWidget(self.stream_checkbox)
+
+        # Analyze long videos as concurrently processed time segments
+        self.segment_checkbox = QCheckBox("Split Long Videos Into Segments", self)
+        self.segment_checkbox.setChecked(True)
+        left_layout.addWidget(self.segment_checkbox)
+
+        # Batch analysis of a whole folder
+        self.batch_btn = QPushButton("Analyze Folder", self)
+        self.batch_btn.clicked.connect(self.start_batch_analysis)
+        left_layout.addWidget(self.batch_btn)
+
+        batch_workers_layout = QHBoxLayout()
+        batch_workers_layout.addWidget(QLabel("Batch Concurrency:"))
+        self.batch_workers_spin = QSpinBox(self)
+        self.batch_workers_spin.setRange(1, 128)
+        self.batch_workers_spin.setValue(BATCH_WORKERS)
+        batch_workers_layout.addWidget(self.batch_workers_spin)
+        left_layout.addLayout(batch_workers_layout)
+
+        self.batch_stats_label = QLabel("", self)
+        self.batch_stats_label.setWordWrap(True)
+        left_layout.addWidget(self.batch_stats_label)
+
         # Real-time threat detection button
         self.threat_detection_btn = QPushButton("Simulate Real-Time Threat Detection", self)
         self.threat_detection_btn.clicked.connect(self.simulate_real_time_threat_detection)
@@ -105,16 +152,20 @@ class SEFDemoApp(QMainWindow):
         # Analysis result tab
         analysis_tab = QWidget()
         analysis_layout = QVBoxLayout(analysis_tab)
-        self.analysis_text = QTextEdit(self)
-        self.analysis_text.setReadOnly(True)
+        self.analysis_text = AnalysisLog(self)
         analysis_layout.addWidget(self.analysis_text)
         right_panel.addTab(analysis_tab, "Analysis")
 
         # History tab
         history_tab = QWidget()
         history_layout = QVBoxLayout(history_tab)
-        self.history_list = QListWidget()
-        self.history_list.itemClicked.connect(self.load_history_item)
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search past analyses...")
+        self.history_search.textChanged.connect(self.history.set_search)
+        history_layout.addWidget(self.history_search)
+        self.history_list = HistoryView()
+        self.history_list.setModel(self.history)
+        self.history_list.clicked.connect(self.load_history_item)
         history_layout.addWidget(self.history_list)
         right_panel.addTab(history_tab, "History")
 
@@ -151,9 +202,10 @@ class SEFDemoApp(QMainWindow):
             self.display_file(file_path)
 
     def display_file(self, file_path):
+        self.displayed_file = file_path
         if file_path.lower().endswith(('.png', '.jpg', '.jpeg')):
-            pixmap = QPixmap(file_path)
-            self.media_label.setPixmap(pixmap.scaled(800, 600, Qt.AspectRatioMode.KeepAspectRatio))
+            # Decoded at display size off the GUI thread; show_image puts it up.
+            self.image_loader.load(file_path)
             self.video_widget.hide()
             self.media_label.show()
         elif file_path.lower().endswith(('.mp4', '.avi', '.mov')):
@@ -162,6 +214,11 @@ class SEFDemoApp(QMainWindow):
             self.media_label.hide()
         self.media_label.setText("")
 
+    def show_image(self, file_path, image):
+        # A slower decode of a file no longer on display is dropped.
+        if file_path == self.displayed_file:
+            self.media_label.setPixmap(QPixmap.fromImage(image))
+
     def start_analysis(self):
         if self.current_file:
             self.analyze_content(self.current_file)
@@ -170,23 +227,44 @@ class SEFDemoApp(QMainWindow):
 
     def analyze_content(self, file_path):
         self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p%")
+        self.streaming_response = False
         self.analysis_text.append("Analyzing content...")
 
-        # Run the analysis in a separate thread
-        self.analysis_thread = AnalysisThread(file_path)
-        self.analysis_thread.progress_update.connect(self.update_progress)
-        self.analysis_thread.analysis_complete.connect(self.display_analysis)
-        self.analysis_thread.start()
+        # Run the analysis on the shared worker pool
+        self.start_analysis_job(AnalysisJob(self.engine, file_path, self.stream_checkbox.isChecked(), self.segment_checkbox.isChecked()))
 
     def analyze_scenario(self, scenario):
         self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p%")
+        self.streaming_response = False
         self.analysis_text.append(f"Analyzing scenario: {scenario}")
 
-        # Run the scenario analysis in a separate thread
-        self.analysis_thread = ScenarioAnalysisThread(scenario, self.scenarios[scenario])
-        self.analysis_thread.progress_update.connect(self.update_progress)
-        self.analysis_thread.analysis_complete.connect(self.display_analysis)
-        self.analysis_thread.start()
+        # Run the scenario analysis on the shared worker pool
+        self.start_analysis_job(ScenarioAnalysisJob(self.engine, scenario, self.scenarios[scenario], self.stream_checkbox.isChecked()))
+
+    def start_analysis_job(self, job):
+        job.progress_update.connect(self.update_progress)
+        job.stage_update.connect(self.update_stage)
+        job.partial_result.connect(self.display_partial_analysis)
+        job.analysis_complete.connect(self.display_analysis)
+        try:
+            job.start()
+        except QueueFull:
+            job.deleteLater()
+            self.analysis_text.append("Too many analyses are queued; please try again shortly.")
+            return
+        # Only the newest request is shown: the one it replaces is cancelled,
+        # which also aborts its HTTP call.  It may report synchronously, so
+        # the new job must already be current.
+        previous, self.analysis_job = self.analysis_job, job
+        if previous is not None:
+            previous.cancel()
+
+    def is_current_request(self):
+        # Signals a superseded job queued before it was cancelled can still
+        # arrive; they are recognised by their sender.
+        return self.sender() is self.analysis_job
 
     def simulate_real_time_threat_detection(self):
         QMessageBox.information(self, "Real-Time Threat Detection", "Simulating real-time threat detection...")
@@ -201,19 +279,77 @@ class SEFDemoApp(QMainWindow):
         self.analysis_text.append(f"Real-Time Threat Detected: {threat_info}")
 
     def update_progress(self, value):
+        if not self.is_current_request():
+            return
         self.progress_bar.setValue(value)
 
+    def update_stage(self, stage):
+        if not self.is_current_request():
+            return
+        self.progress_bar.setFormat(f"{stage}: %p%")
+
+    def display_partial_analysis(self, text):
+        if not self.is_current_request():
+            return
+        if not self.streaming_response:
+            self.analysis_text.append("")
+            self.streaming_response = True
+        self.analysis_text.insert_text(text)
+
     def display_analysis(self, analysis_result):
+        if analysis_result.get('request_id') != self.analysis_job.request_id:
+            return
+        self.progress_bar.setFormat("%p%")
+        preprocess = analysis_result.get('preprocess')
+        if preprocess:
+            self.statusBar().showMessage(f"Image optimized for upload: {preprocess['original_bytes'] // 1024} KB -> "
+                                         f"{preprocess['bytes'] // 1024} KB ({preprocess['saved_bytes'] // 1024} KB saved)")
+        elif 'keyframes' in analysis_result:
+            self.statusBar().showMessage(f"Video analyzed from {analysis_result['keyframes']} keyframes")
+        elif 'segments' in analysis_result:
+            self.statusBar().showMessage(f"Video analyzed in {analysis_result['segments']} segments")
         if 'error' in analysis_result:
             self.analysis_text.append(f"Error: {analysis_result['error']}")
         else:
-            insights = analysis_result.get('content', 'No insights generated by the AI.')
-            self.analysis_text.append(insights)
+            insights = analysis_result.get('content') or 'No insights generated by the AI.'
+            if not analysis_result.get('streamed'):
+                self.analysis_text.append(insights)
             
             # Add to history
-            history_item = f"Analysis {len(self.history) + 1}"
-            self.history.append((self.current_file, insights))
-            self.history_list.addItem(history_item)
+            self.add_history(analysis_result['file_path'], insights)
+
+    def add_history(self, file_path, insights):
+        self.history.add(file_path, insights)
+
+    def start_batch_analysis(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder to Analyze")
+        if not folder:
+            return
+        files = collect_media([folder])
+        if not files:
+            QMessageBox.warning(self, "No Media Found", "The selected folder contains no images or videos.")
+            return
+
+        self.analysis_text.append(f"Batch analysis of {len(files)} files in {folder}...")
+        self.batch_btn.setEnabled(False)
+        self.batch_job = BatchAnalysisJob(self.engine, files, self.batch_workers_spin.value())
+        self.batch_job.item_complete.connect(self.display_batch_item)
+        self.batch_job.batch_complete.connect(self.finish_batch_analysis)
+        self.batch_job.start()
+
+    def display_batch_item(self, file_path, analysis_result, stats):
+        self.batch_stats_label.setText(f"{format_stats(stats)}\n{format_scheduler_stats(get_scheduler().stats())}")
+        name = os.path.basename(file_path)
+        if 'error' in analysis_result:
+            self.analysis_text.append(f"Batch: {name} failed: {analysis_result['error']}")
+        else:
+            self.analysis_text.append(f"Batch: {name} analyzed in {analysis_result['latency']:.1f} s")
+            self.add_history(file_path, analysis_result['content'])
+
+    def finish_batch_analysis(self, stats):
+        self.batch_btn.setEnabled(True)
+        self.batch_stats_label.setText(f"{format_stats(stats)}\n{format_scheduler_stats(get_scheduler().stats())}")
+        self.analysis_text.append(f"Batch analysis finished: {format_stats(stats)}")
 
     def save_report(self):
         report_text = self.analysis_text.toPlainText()
@@ -253,93 +389,12 @@ class SEFDemoApp(QMainWindow):
             dlg_layout.addWidget(button_box)
             dlg.exec()
 
-    def load_history_item(self, item):
-        index = self.history_list.row(item)
-        file_path, analysis = self.history[index]
+    def load_history_item(self, index):
+        file_path, analysis = self.history.entry(index.row())
         if file_path:
             self.display_file(file_path)
         self.analysis_text.setText(analysis)
 
-class AnalysisThread(QThread):
-    progress_update = pyqtSignal(int)
-    analysis_complete = pyqtSignal(dict)
-
-    def __init__(self, file_path):
-        super().__init__()
-        self.file_path = file_path
-
-    def run(self):
-        for i in range(1, 101):
-            self.msleep(20)
-            self.progress_update.emit(i)
-
-        analysis_result = self.perform_analysis(self.file_path)
-        self.analysis_complete.emit(analysis_result)
-
-    def perform_analysis(self, file_path):
-        headers = {'Content-Type': 'application/json'}
-        
-        with open(file_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
-
-        payload = {
-            "contents": [{
-                "parts": [
-                    {"text": "Analyze this image for safety and security concerns. Provide a detailed assessment of potential risks and recommended actions."},
-                    {"inline_data": {
-                        "mime_type": "image/jpeg",
-                        "data": image_data
-                    }}
-                ]
-            }]
-        }
-
-        try:
-            response = requests.post(f'{API_URL}?key={API_KEY}', headers=headers, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            content = response_data['candidates'][0]['content']['parts'][0]['text']
-            return {"content": content}
-        except requests.exceptions.RequestException as e:
-            return {"error": f"API request failed: {str(e)}"}
-
-class ScenarioAnalysisThread(QThread):
-    progress_update = pyqtSignal(int)
-    analysis_complete = pyqtSignal(dict)
-
-    def __init__(self, scenario, description):
-        super().__init__()
-        self.scenario = scenario
-        self.description = description
-
-    def run(self):
-        for i in range(1, 101):
-            self.msleep(20)
-            self.progress_update.emit(i)
-
-        analysis_result = self.perform_analysis()
-        self.analysis_complete.emit(analysis_result)
-
-    def perform_analysis(self):
-        headers = {'Content-Type': 'application/json'}
-        
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": f"Analyze the following safety and security scenario: {self.scenario}\n\nDescription: {self.description}\n\nProvide a detailed assessment of potential risks, recommended actions, and preventive measures."
-                }]
-            }]
-        }
-
-        try:
-            response = requests.post(f'{API_URL}?key={API_KEY}', headers=headers, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            content = response_data['candidates'][0]['content']['parts'][0]['text']
-            return {"content": content}
-        except requests.exceptions.RequestException as e:
-            return {"error": f"API request failed: {str(e)}"}
-
 class RealTimeThreatDetectionThread(QThread):
     threat_detected = pyqtSignal(str)
 
@@ -1,26 +1,39 @@
 import sys
 import os
-import requests
-import base64
 import json
 import random
-from datetime import datetime, timedelta
+from datetime import date, datetime, time
+import numpy as np
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QPushButton, QLabel, QFileDialog, 
                              QVBoxLayout, QHBoxLayout, QWidget, QComboBox, QProgressBar, QTextEdit, 
                              QMessageBox, QTabWidget, QListWidget, QSplitter, QDialog, QDialogButtonBox, 
                              QTreeWidget, QTreeWidgetItem, QLineEdit, QFormLayout, QStackedWidget, 
-                             QScrollArea, QFrame, QSlider, QCheckBox, QCalendarWidget)
+                             QScrollArea, QFrame, QSlider, QCheckBox, QCalendarWidget, QSpinBox)
 from PyQt6.QtGui import QPixmap, QFont, QIcon, QColor, QPalette, QPainter
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QUrl, QTimer, QPointF
+from PyQt6.QtCore import Qt, QThread, pyqtSignal, QSize, QUrl, QTimer, QPointF, QDateTime
 from PyQt6.QtMultimedia import QMediaPlayer
 from PyQt6.QtMultimediaWidgets import QVideoWidget
-from PyQt6.QtCharts import QChart, QChartView, QPieSeries, QLineSeries, QScatterSeries
+from PyQt6.QtCharts import QChart, QChartView, QLineSeries, QDateTimeAxis, QValueAxis
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-import folium
-from folium.plugins import HeatMap
+
+from sef.batch import BATCH_WORKERS, collect_media, format_stats
+from sef.client import has_api_key
+from sef.engine import AnalysisEngine
+from sef.history import HistoryModel, HistoryView
+from sef.images import ImageLoader
+from sef.incident_map import IncidentMap
+from sef.incidents import TREND_WINDOWS, IncidentStore
+from sef.logview import AnalysisLog
+from sef.jobs import QueueFull
+from sef.qt import AnalysisJob, BatchAnalysisJob, ScenarioAnalysisJob
+from sef.refresh import RefreshScheduler
+from sef.scheduler import format_scheduler_stats, get_scheduler
+from sef.timeseries import CHART_POINTS, RollingSeries
 
 API_KEY = ''  # Replace with your actual API key
 API_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash-latest:generateContent'
+DASHBOARD_WINDOWS = [("Last hour", 3600), ("Last 24 hours", 86400)] + [
+    (f"Last {days} days", days * 86400) for days in TREND_WINDOWS]
 
 class DarkPalette(QPalette):
     def __init__(self):
@@ -49,12 +62,28 @@ class SEFDemoApp(QMainWindow):
             "Medical Emergency": "A scenario where an individual is experiencing a critical health issue that requires immediate attention.",
             "Suspicious Package": "A scenario where an unattended package is found in a public place, raising concerns about its contents."
         }
+        self.engine = AnalysisEngine(API_URL, API_KEY)
+        # Both the media pool and the network loop reach the API host warm.
+        self.engine.prewarm()
         self.current_file = None
-        self.history = []
+        self.streaming_response = False
+        self.analysis_job = None
+        self.history = HistoryModel(parent=self)
+        self.displayed_file = None
+        self.image_loader = ImageLoader(parent=self)
+        self.image_loader.image_loaded.connect(self.show_image)
         self.threat_level = 0
-        self.incidents = []
+        self.incidents = IncidentStore()
+        self.threat_history = RollingSeries('gauge')
+        self.incident_rate = RollingSeries('counter')
+        self.dashboard_window = DASHBOARD_WINDOWS[0][1]
+        self.refresh = RefreshScheduler(parent=self)
         self.initUI()
 
+        # Precompute the predefined scenarios so switching between them is instant
+        if has_api_key(API_KEY):
+            self.engine.warm_up_scenarios(self.scenarios)
+
     def initUI(self):
         self.setWindowTitle("Advanced SEF Interactive Demo")
         self.setGeometry(100, 100, 1800, 1000)
@@ -83,6 +112,33 @@ class SEFDemoApp(QMainWindow):
         self.analyze_btn.clicked.connect(self.start_analysis)
         left_layout.addWidget(self.analyze_btn)
 
+        # Stream AI answers into the Analysis tab as they are generated
+        self.stream_checkbox = QCheckBox("Stream Results", self)
+        self.stream_checkbox.setChecked(True)
+        left_layout.addWidget(self.stream_checkbox)
+
+        # Analyze long videos as concurrently processed time segments
+        self.segment_checkbox = QCheckBox("Split Long Videos Into Segments", self)
+        self.segment_checkbox.setChecked(True)
+        left_layout.addWidget(self.segment_checkbox)
+
+        # Batch analysis of a whole folder
+        self.batch_btn = QPushButton("Analyze Folder", self)
+        self.batch_btn.clicked.connect(self.start_batch_analysis)
+        left_layout.addWidget(self.batch_btn)
+
+        batch_workers_layout = QHBoxLayout()
+        batch_workers_layout.addWidget(QLabel("Batch Concurrency:"))
+        self.batch_workers_spin = QSpinBox(self)
+        self.batch_workers_spin.setRange(1, 128)
+        self.batch_workers_spin.setValue(BATCH_WORKERS)
+        batch_workers_layout.addWidget(self.batch_workers_spin)
+        left_layout.addLayout(batch_workers_layout)
+
+        self.batch_stats_label = QLabel("", self)
+        self.batch_stats_label.setWordWrap(True)
+        left_layout.addWidget(self.batch_stats_label)
+
         # Real-time threat detection button
         self.threat_detection_btn = QPushButton("Start Real-Time Threat Detection", self)
         self.threat_detection_btn.clicked.connect(self.toggle_real_time_threat_detection)
@@ -157,6 +213,11 @@ class SEFDemoApp(QMainWindow):
         self.update_timer.timeout.connect(self.periodic_update)
         self.update_timer.start(5000)  # Update every 5 seconds
 
+        # Views are redrawn when their data changes, and only while showing
+        self.refresh.register('threat_label', self.threat_level_label, self.update_threat_level_display)
+        self.refresh.register('threat_chart', self.threat_chart, self.update_threat_level_chart)
+        self.refresh.register('trend_chart', self.incident_trend_chart, self.update_incident_trend_chart)
+
         # Initialize real-time threat detection
         self.real_time_detection_active = False
         self.threat_detection_thread = None
@@ -165,6 +226,10 @@ class SEFDemoApp(QMainWindow):
         dashboard = QWidget()
         layout = QVBoxLayout(dashboard)
 
+        dashboard_window = QComboBox()
+        dashboard_window.addItems([label for label, _ in DASHBOARD_WINDOWS])
+        layout.addWidget(dashboard_window)
+
         # Threat level chart
         self.threat_chart = self.create_threat_level_chart()
         layout.addWidget(self.threat_chart)
@@ -172,6 +237,7 @@ class SEFDemoApp(QMainWindow):
         # Incident trend chart
         self.incident_trend_chart = self.create_incident_trend_chart()
         layout.addWidget(self.incident_trend_chart)
+        dashboard_window.currentIndexChanged.connect(self.set_dashboard_window)
 
         # Recent incidents list
         self.recent_incidents = QListWidget()
@@ -201,8 +267,7 @@ class SEFDemoApp(QMainWindow):
         analysis_tab = QWidget()
         layout = QVBoxLayout(analysis_tab)
 
-        self.analysis_text = QTextEdit(self)
-        self.analysis_text.setReadOnly(True)
+        self.analysis_text = AnalysisLog(self)
         layout.addWidget(self.analysis_text)
 
         return analysis_tab
@@ -211,8 +276,13 @@ class SEFDemoApp(QMainWindow):
         history_tab = QWidget()
         layout = QVBoxLayout(history_tab)
 
-        self.history_list = QListWidget()
-        self.history_list.itemClicked.connect(self.load_history_item)
+        self.history_search = QLineEdit()
+        self.history_search.setPlaceholderText("Search past analyses...")
+        self.history_search.textChanged.connect(self.history.set_search)
+        layout.addWidget(self.history_search)
+        self.history_list = HistoryView()
+        self.history_list.setModel(self.history)
+        self.history_list.clicked.connect(self.load_history_item)
         layout.addWidget(self.history_list)
 
         return history_tab
@@ -223,8 +293,7 @@ class SEFDemoApp(QMainWindow):
 
         self.map_view = QWebEngineView()
         layout.addWidget(self.map_view)
-
-        self.update_map()
+        self.incident_map = IncidentMap(self.map_view, self.incidents, parent=self)
 
         return map_tab
 
@@ -255,33 +324,28 @@ class SEFDemoApp(QMainWindow):
         return incident_tab
 
     def create_threat_level_chart(self):
-        series = QPieSeries()
-        series.append("Low", 60)
-        series.append("Medium", 30)
-        series.append("High", 10)
-
-        chart = QChart()
-        chart.addSeries(series)
-        chart.setTitle("Current Threat Level Distribution")
-        chart.setAnimationOptions(QChart.AnimationOption.SeriesAnimations)
-
-        chart_view = QChartView(chart)
-        chart_view.setRenderHint(QPainter.RenderHint.Antialiasing)
-
+        chart_view = self.create_time_chart("Threat Level")
+        chart_view.chart().axes(Qt.Orientation.Vertical)[0].setRange(0, 100)
         return chart_view
 
     def create_incident_trend_chart(self):
+        return self.create_time_chart("Incident Trend")
+
+    def create_time_chart(self, title):
         series = QLineSeries()
-        
-        # Sample data - replace with actual historical data in a real application
-        for i in range(7):
-            date = QPointF(i, random.randint(5, 20))
-            series.append(date)
 
         chart = QChart()
         chart.addSeries(series)
-        chart.createDefaultAxes()
-        chart.setTitle("7-Day Incident Trend")
+        chart.legend().hide()
+        chart.setTitle(title)
+        time_axis = QDateTimeAxis()
+        time_axis.setFormat("MMM d hh:mm")
+        chart.addAxis(time_axis, Qt.AlignmentFlag.AlignBottom)
+        series.attachAxis(time_axis)
+        value_axis = QValueAxis()
+        value_axis.setLabelFormat("%d")
+        chart.addAxis(value_axis, Qt.AlignmentFlag.AlignLeft)
+        series.attachAxis(value_axis)
 
         chart_view = QChartView(chart)
         chart_view.setRenderHint(QPainter.RenderHint.Antialiasing)
@@ -303,9 +367,10 @@ class SEFDemoApp(QMainWindow):
             self.display_file(file_path)
 
     def display_file(self, file_path):
+        self.displayed_file = file_path
         if file_path.lower().endswith(('.png', '.jpg', '.jpeg')):
-            pixmap = QPixmap(file_path)
-            self.media_label.setPixmap(pixmap.scaled(800, 600, Qt.AspectRatioMode.KeepAspectRatio))
+            # Decoded at display size off the GUI thread; show_image puts it up.
+            self.image_loader.load(file_path)
             self.video_widget.hide()
             self.media_label.show()
         elif file_path.lower().endswith(('.mp4', '.avi', '.mov')):
@@ -314,6 +379,11 @@ class SEFDemoApp(QMainWindow):
             self.media_label.hide()
         self.media_label.setText("")
 
+    def show_image(self, file_path, image):
+        # A slower decode of a file no longer on display is dropped.
+        if file_path == self.displayed_file:
+            self.media_label.setPixmap(QPixmap.fromImage(image))
+
     def start_analysis(self):
         if self.current_file:
             self.analyze_content(self.current_file)
@@ -322,21 +392,42 @@ class SEFDemoApp(QMainWindow):
 
     def analyze_content(self, file_path):
         self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p%")
+        self.streaming_response = False
         self.analysis_text.append("Analyzing content...")
 
-        self.analysis_thread = AnalysisThread(file_path)
-        self.analysis_thread.progress_update.connect(self.update_progress)
-        self.analysis_thread.analysis_complete.connect(self.display_analysis)
-        self.analysis_thread.start()
+        self.start_analysis_job(AnalysisJob(self.engine, file_path, self.stream_checkbox.isChecked(), self.segment_checkbox.isChecked()))
 
     def analyze_scenario(self, scenario):
         self.progress_bar.setValue(0)
+        self.progress_bar.setFormat("%p%")
+        self.streaming_response = False
         self.analysis_text.append(f"Analyzing scenario: {scenario}")
 
-        self.analysis_thread = ScenarioAnalysisThread(scenario, self.scenarios[scenario])
-        self.analysis_thread.progress_update.connect(self.update_progress)
-        self.analysis_thread.analysis_complete.connect(self.display_analysis)
-        self.analysis_thread.start()
+        self.start_analysis_job(ScenarioAnalysisJob(self.engine, scenario, self.scenarios[scenario], self.stream_checkbox.isChecked()))
+
+    def start_analysis_job(self, job):
+        job.progress_update.connect(self.update_progress)
+        job.stage_update.connect(self.update_stage)
+        job.partial_result.connect(self.display_partial_analysis)
+        job.analysis_complete.connect(self.display_analysis)
+        try:
+            job.start()
+        except QueueFull:
+            job.deleteLater()
+            self.analysis_text.append("Too many analyses are queued; please try again shortly.")
+            return
+        # Only the newest request is shown: the one it replaces is cancelled,
+        # which also aborts its HTTP call.  It may report synchronously, so
+        # the new job must already be current.
+        previous, self.analysis_job = self.analysis_job, job
+        if previous is not None:
+            previous.cancel()
+
+    def is_current_request(self):
+        # Signals a superseded job queued before it was cancelled can still
+        # arrive; they are recognised by their sender.
+        return self.sender() is self.analysis_job
 
     def toggle_real_time_threat_detection(self):
         if not self.real_time_detection_active:
@@ -360,24 +451,81 @@ class SEFDemoApp(QMainWindow):
             self.threat_detection_thread = None
 
     def notify_threat_detected(self, threat_info):
-        self.threat_level = min(self.threat_level + 20, 100)
-        self.update_threat_level_display()
+        self.set_threat_level(min(self.threat_level + 20, 100))
         self.analysis_text.append(f"Real-Time Threat Detected: {threat_info}")
         self.add_incident(threat_info)
 
     def update_progress(self, value):
+        if not self.is_current_request():
+            return
         self.progress_bar.setValue(value)
 
+    def update_stage(self, stage):
+        if not self.is_current_request():
+            return
+        self.progress_bar.setFormat(f"{stage}: %p%")
+
+    def display_partial_analysis(self, text):
+        if not self.is_current_request():
+            return
+        if not self.streaming_response:
+            self.analysis_text.append("")
+            self.streaming_response = True
+        self.analysis_text.insert_text(text)
+
     def display_analysis(self, analysis_result):
+        if analysis_result.get('request_id') != self.analysis_job.request_id:
+            return
+        self.progress_bar.setFormat("%p%")
+        preprocess = analysis_result.get('preprocess')
+        if preprocess:
+            self.statusBar().showMessage(f"Image optimized for upload: {preprocess['original_bytes'] // 1024} KB -> "
+                                         f"{preprocess['bytes'] // 1024} KB ({preprocess['saved_bytes'] // 1024} KB saved)")
+        elif 'keyframes' in analysis_result:
+            self.statusBar().showMessage(f"Video analyzed from {analysis_result['keyframes']} keyframes")
+        elif 'segments' in analysis_result:
+            self.statusBar().showMessage(f"Video analyzed in {analysis_result['segments']} segments")
         if 'error' in analysis_result:
             self.analysis_text.append(f"Error: {analysis_result['error']}")
         else:
-            insights = analysis_result.get('content', 'No insights generated by the AI.')
-            self.analysis_text.append(insights)
+            insights = analysis_result.get('content') or 'No insights generated by the AI.'
+            if not analysis_result.get('streamed'):
+                self.analysis_text.append(insights)
             
-            history_item = f"Analysis {len(self.history) + 1}"
-            self.history.append((self.current_file, insights))
-            self.history_list.addItem(history_item)
+            self.add_history(analysis_result['file_path'], insights)
+
+    def add_history(self, file_path, insights):
+        self.history.add(file_path, insights)
+
+    def start_batch_analysis(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder to Analyze")
+        if not folder:
+            return
+        files = collect_media([folder])
+        if not files:
+            QMessageBox.warning(self, "No Media Found", "The selected folder contains no images or videos.")
+            return
+
+        self.analysis_text.append(f"Batch analysis of {len(files)} files in {folder}...")
+        self.batch_btn.setEnabled(False)
+        self.batch_job = BatchAnalysisJob(self.engine, files, self.batch_workers_spin.value())
+        self.batch_job.item_complete.connect(self.display_batch_item)
+        self.batch_job.batch_complete.connect(self.finish_batch_analysis)
+        self.batch_job.start()
+
+    def display_batch_item(self, file_path, analysis_result, stats):
+        self.batch_stats_label.setText(f"{format_stats(stats)}\n{format_scheduler_stats(get_scheduler().stats())}")
+        name = os.path.basename(file_path)
+        if 'error' in analysis_result:
+            self.analysis_text.append(f"Batch: {name} failed: {analysis_result['error']}")
+        else:
+            self.analysis_text.append(f"Batch: {name} analyzed in {analysis_result['latency']:.1f} s")
+            self.add_history(file_path, analysis_result['content'])
+
+    def finish_batch_analysis(self, stats):
+        self.batch_btn.setEnabled(True)
+        self.batch_stats_label.setText(f"{format_stats(stats)}\n{format_scheduler_stats(get_scheduler().stats())}")
+        self.analysis_text.append(f"Batch analysis finished: {format_stats(stats)}")
 
     def save_report(self):
         report_text = self.analysis_text.toPlainText()
@@ -467,61 +615,49 @@ class SEFDemoApp(QMainWindow):
         self.threat_level_label.setStyleSheet(f"color: {'green' if level == 'Low' else 'orange' if level == 'Medium' else 'red'}; font-weight: bold;")
 
     def periodic_update(self):
-        # Simulate changing threat levels
-        self.threat_level = max(0, min(self.threat_level + random.randint(-10, 10), 100))
-        self.update_threat_level_display()
-
-        # Update threat level chart
-        self.update_threat_level_chart()
+        # Simulate changing threat levels; the views follow via the refresh scheduler
+        self.set_threat_level(max(0, min(self.threat_level + random.randint(-10, 10), 100)))
 
-        # Update incident trend chart
-        self.update_incident_trend_chart()
-
-        # Update map
-        self.update_map()
+    def set_threat_level(self, level):
+        if level != self.threat_level:
+            self.refresh.mark_dirty('threat_label')
+        self.threat_level = level
+        self.threat_history.record(level)
+        self.refresh.mark_dirty('threat_chart')
 
     def update_threat_level_chart(self):
-        chart = self.threat_chart.chart()
-        if chart:
-            series = chart.series()[0]
-            series.clear()
-            series.append("Low", max(0, 100 - self.threat_level))
-            series.append("Medium", min(self.threat_level, 50))
-            series.append("High", max(0, self.threat_level - 50))
+        now = datetime.now().timestamp()
+        timestamps, levels = self.threat_history.window(self.dashboard_window, now, CHART_POINTS)
+        self.plot_time_chart(self.threat_chart, timestamps, levels, now)
 
     def update_incident_trend_chart(self):
-        chart = self.incident_trend_chart.chart()
+        now = datetime.now().timestamp()
+        days = self.dashboard_window // 86400
+        if days > 1:
+            # Per-day counts are kept by the store (by report date): one
+            # lookup per day shown, however many incidents there are.
+            midnight = datetime.combine(date.today(), time()).timestamp()
+            counts = np.array(self.incidents.daily_counts(days))
+            timestamps = midnight - 86400 * np.arange(days - 1, -1, -1)
+        else:
+            # Summed into CHART_POINTS buckets, so this plots a rate.
+            timestamps, counts = self.incident_rate.window(self.dashboard_window, now, CHART_POINTS)
+        self.plot_time_chart(self.incident_trend_chart, timestamps, counts, now)
+        self.incident_trend_chart.chart().axes(Qt.Orientation.Vertical)[0].setRange(0, max(counts.max(), 1))
+
+    def plot_time_chart(self, chart_view, timestamps, values, now):
+        chart = chart_view.chart()
         if chart:
-            series = chart.series()[0]
-            series.clear()
-            for i in range(7):
-                date = QPointF(i, len([inc for inc in self.incidents if inc['date'] == (datetime.now() - timedelta(days=i)).date()]))
-                series.append(date)
-
-    def update_map(self):
-        m = folium.Map(location=[40.7128, -74.0060], zoom_start=10)
-        
-        # Add markers for incidents
-        for incident in self.incidents:
-            folium.Marker(
-                location=incident['location'],
-                popup=incident['description'],
-                tooltip=incident['type']
-            ).add_to(m)
-
-        # Add heatmap layer
-        heat_data = [[inc['location'][0], inc['location'][1]] for inc in self.incidents]
-        HeatMap(heat_data).add_to(m)
-
-        # Save map to HTML file
-        m.save("incident_map.html")
-
-        # Load the HTML file into the QWebEngineView
-        self.map_view.setUrl(QUrl.fromLocalFile(os.path.abspath("incident_map.html")))
-
-    def load_history_item(self, item):
-        index = self.history_list.row(item)
-        file_path, analysis = self.history[index]
+            chart.series()[0].replace([QPointF(x * 1000, y) for x, y in zip(timestamps.tolist(), values.tolist())])
+            chart.axes(Qt.Orientation.Horizontal)[0].setRange(
+                QDateTime.fromSecsSinceEpoch(int(now - self.dashboard_window)), QDateTime.fromSecsSinceEpoch(int(now)))
+
+    def set_dashboard_window(self, index):
+        self.dashboard_window = DASHBOARD_WINDOWS[index][1]
+        self.refresh.mark_dirty('threat_chart', 'trend_chart')
+
+    def load_history_item(self, index):
+        file_path, analysis = self.history.entry(index.row())
         if file_path:
             self.display_file(file_path)
         self.analysis_text.setText(analysis)
@@ -552,91 +688,16 @@ class SEFDemoApp(QMainWindow):
         QMessageBox.information(self, "Report Submitted", "Incident report has been submitted successfully.")
 
     def add_incident(self, incident):
-        self.incidents.append(incident)
-        self.recent_incidents.insertItem(0, f"{incident['type']} - {incident['date']}")
+        lat, lon = incident['location']
+        incident['id'] = self.incidents.add(incident['type'], lat, lon, incident['date'], incident['description'])
+        # Counted when it happened, so a back-dated report lands on its own day.
+        self.incident_rate.record(1, self.incidents.timestamps[incident['id'] - 1])
+        self.refresh.mark_dirty('trend_chart')
+        self.recent_incidents.insertItem(0, f"{incident['type']} - {incident['date']:%Y-%m-%d}")
         if self.recent_incidents.count() > 5:
             self.recent_incidents.takeItem(self.recent_incidents.count() - 1)
-        self.update_map()
-
-class AnalysisThread(QThread):
-    progress_update = pyqtSignal(int)
-    analysis_complete = pyqtSignal(dict)
-
-    def __init__(self, file_path):
-        super().__init__()
-        self.file_path = file_path
-
-    def run(self):
-        for i in range(1, 101):
-            self.msleep(20)
-            self.progress_update.emit(i)
-
-        analysis_result = self.perform_analysis(self.file_path)
-        self.analysis_complete.emit(analysis_result)
-
-    def perform_analysis(self, file_path):
-        headers = {'Content-Type': 'application/json'}
-        
-        with open(file_path, "rb") as image_file:
-            image_data = base64.b64encode(image_file.read()).decode('utf-8')
-
-        payload = {
-            "contents": [{
-                "parts": [
-                    {"text": "Analyze this image for safety and security concerns. Provide a detailed assessment of potential risks and recommended actions."},
-                    {"inline_data": {
-                        "mime_type": "image/jpeg",
-                        "data": image_data
-                    }}
-                ]
-            }]
-        }
-
-        try:
-            response = requests.post(f'{API_URL}?key={API_KEY}', headers=headers, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            content = response_data['candidates'][0]['content']['parts'][0]['text']
-            return {"content": content}
-        except requests.exceptions.RequestException as e:
-            return {"error": f"API request failed: {str(e)}"}
-
-class ScenarioAnalysisThread(QThread):
-    progress_update = pyqtSignal(int)
-    analysis_complete = pyqtSignal(dict)
-
-    def __init__(self, scenario, description):
-        super().__init__()
-        self.scenario = scenario
-        self.description = description
-
-    def run(self):
-        for i in range(1, 101):
-            self.msleep(20)
-            self.progress_update.emit(i)
-
-        analysis_result = self.perform_analysis()
-        self.analysis_complete.emit(analysis_result)
-
-    def perform_analysis(self):
-        headers = {'Content-Type': 'application/json'}
-        
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": f"Analyze the following safety and security scenario: {self.scenario}\n\nDescription: {self.description}\n\nProvide a detailed assessment of potential risks, recommended actions, and preventive measures."
-                }]
-            }]
-        }
-
-        try:
-            response = requests.post(f'{API_URL}?key={API_KEY}', headers=headers, json=payload)
-            response.raise_for_status()
-            response_data = response.json()
-            content = response_data['candidates'][0]['content']['parts'][0]['text']
-            return {"content": content}
-        except requests.exceptions.RequestException as e:
-            return {"error": f"API request failed: {str(e)}"}
+        # The map receives just this incident, not a re-render.
+        self.incident_map.add(incident['id'])
 
 class RealTimeThreatDetectionThread(QThread):
     threat_detected = pyqtSignal(dict)
@@ -656,7 +717,7 @@ class RealTimeThreatDetectionThread(QThread):
                 self.threat_detected.emit({
                     'type': threat,
                     'location': [lat, lon],
-                    'date': datetime.now().date(),
+                    'date': datetime.now(),
                     'description': f"Potential {threat.lower()} detected."
                 })
 
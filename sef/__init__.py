@@ -0,0 +1 @@
+"""Shared, Qt-free building blocks used by the SEF demo applications."""
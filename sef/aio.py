@@ -0,0 +1,422 @@
+"""Asyncio network core: one event loop thread multiplexing every request."""
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp is optional; requests then run on the blocking client in threads.
+    aiohttp = None
+
+from sef import analysis
+from sef.body import JsonBody
+from sef.cache import get_result_cache, get_scenario_cache
+from sef.client import (CHUNK_SIZE, CONNECT_TIMEOUT, READ_TIMEOUT, SSEParser, api_origin, candidate_texts,
+                        get_client)
+from sef.inflight import CancelToken
+from sef.video import VideoUnavailable
+from sef.scheduler import get_scheduler
+
+if aiohttp is not None:
+    # Failures that happen before the server has the request; safe to resend.
+    RESEND_ERRORS = (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError,
+                     getattr(aiohttp, 'ConnectionTimeoutError', aiohttp.ClientConnectorError))
+
+MAX_CONNECTIONS = 100
+# Hashing, image decoding and keyframe sampling run here, off the loop.
+CPU_WORKERS = min(4, os.cpu_count() or 1)
+
+
+async def _iter_body(body):
+    while True:
+        chunk = body.read(CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+class AsyncGeminiClient:
+    """Coroutine counterpart of ``GeminiClient`` built on aiohttp.
+
+    Requests share one connection pool of up to ``max_connections`` sockets
+    and go through the same quota scheduler.  ``timeout`` caps a whole call,
+    retries included; cancelling the calling task aborts the HTTP request.
+    Results have the same shape as the blocking client's.
+    """
+
+    def __init__(self, max_connections=MAX_CONNECTIONS, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 scheduler=None):
+        self.max_connections = max_connections
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.scheduler = scheduler
+        self._session = None
+        self._requests = 0
+        self._total_time = 0.0
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._connections_opened = 0
+        self._connections_reused = 0
+
+    def _get_session(self):
+        # Sessions belong to the loop they are created on, so this is only
+        # called from coroutines running on the network loop.
+        if self._session is None:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self._connection_opened)
+            trace.on_connection_reuseconn.append(self._connection_reused)
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.max_connections),
+                                                  headers={'Content-Type': 'application/json'},
+                                                  trace_configs=[trace])
+        return self._session
+
+    async def _connection_opened(self, session, context, params):
+        self._connections_opened += 1
+
+    async def _connection_reused(self, session, context, params):
+        self._connections_reused += 1
+
+    async def prewarm(self, url, connections=1):
+        """Open ``connections`` pooled connections to the host of ``url``."""
+        if aiohttp is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, functools.partial(get_client().prewarm, url, connections, True))
+        session = self._get_session()
+        timeout = aiohttp.ClientTimeout(connect=self.connect_timeout, sock_read=self.read_timeout)
+
+        async def warm():
+            try:
+                async with session.head(api_origin(url), timeout=timeout) as response:
+                    await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                pass
+
+        # Started together, so each opens a socket of its own instead of
+        # waiting to reuse another's.
+        await asyncio.gather(*(warm() for _ in range(min(connections, self.max_connections))))
+
+    async def generate(self, url, api_key, payload, progress=None, on_text=None, timeout=None):
+        if on_text:
+            return await self.stream_generate_content(url, api_key, payload, on_text, progress, timeout)
+        return await self.generate_content(url, api_key, payload, progress, timeout)
+
+    async def generate_content(self, url, api_key, payload, progress=None, timeout=None):
+        if aiohttp is None:
+            request = _blocking(get_client().generate_content, url, api_key, payload, progress)
+        else:
+            request = self._generate_content(url, api_key, payload, progress)
+        try:
+            return await asyncio.wait_for(request, timeout)
+        except _client_errors() as e:
+            return {"error": f"API request failed: {str(e)}"}
+        except asyncio.TimeoutError:
+            return {"error": f"API request failed: no response within {timeout} s"}
+
+    async def _generate_content(self, url, api_key, payload, progress):
+        response, stats = await self._post(url, api_key, payload, progress)
+        async with response:
+            response.raise_for_status()
+            total = response.content_length or 0
+            chunks = []
+            received = 0
+            if progress:
+                progress.stage('download')
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                chunks.append(chunk)
+                received += len(chunk)
+                if progress and total:
+                    progress.update('download', received, total)
+        if progress:
+            progress.stage('parse')
+        response_data = json.loads(b''.join(chunks))
+        self._settle(stats, response_data.get('usageMetadata'))
+        content = response_data['candidates'][0]['content']['parts'][0]['text']
+        if progress:
+            progress.finish()
+        return {"content": content, "stats": stats}
+
+    async def stream_generate_content(self, url, api_key, payload, on_text, progress=None, timeout=None):
+        parts = []
+
+        def collect(text):
+            parts.append(text)
+            on_text(text)
+
+        if aiohttp is None:
+            request = _blocking(get_client().stream_generate_content, url, api_key, payload, collect, progress)
+        else:
+            request = self._stream_generate_content(url, api_key, payload, collect, progress)
+        try:
+            result = await asyncio.wait_for(request, timeout)
+        except _client_errors() as e:
+            return {"error": f"API request failed: {str(e)}", "streamed": bool(parts)}
+        except asyncio.TimeoutError:
+            return {"error": f"API request failed: no response within {timeout} s", "streamed": bool(parts)}
+        if 'error' in result:
+            return result
+        return dict(result, content=''.join(parts), streamed=True)
+
+    async def _stream_generate_content(self, url, api_key, payload, on_text, progress):
+        stream_url = url.replace(':generateContent', ':streamGenerateContent')
+        response, stats = await self._post(stream_url, api_key, payload, progress, {'alt': 'sse'})
+        parser = SSEParser()
+        usage = None
+
+        def handle(events):
+            nonlocal usage
+            for event in events:
+                usage = event.get('usageMetadata', usage)
+                for text in candidate_texts(event):
+                    on_text(text)
+
+        async with response:
+            response.raise_for_status()
+            if progress:
+                progress.stage('download')
+            async for chunk in response.content.iter_any():
+                handle(parser.feed(chunk))
+            handle(parser.close())
+        self._settle(stats, usage)
+        if progress:
+            progress.finish()
+        return {"stats": stats}
+
+    async def _post(self, url, api_key, payload, progress, params=None):
+        if progress:
+            progress.stage('encode')
+        body = payload if isinstance(payload, JsonBody) else JsonBody(payload)
+        body.progress = progress
+        scheduler = self.scheduler or get_scheduler()
+        tokens = body.estimated_tokens()
+        session = self._get_session()
+        timeout = aiohttp.ClientTimeout(connect=self.connect_timeout, sock_read=self.read_timeout)
+        waited = 0.0
+        attempt = 0
+        while True:
+            waited += await scheduler.acquire_async(tokens)
+            body.seek(0)
+            start = time.monotonic()
+            try:
+                response = await session.post(f'{url}?key={api_key}', params=params, data=_iter_body(body),
+                                              headers={'Content-Length': str(len(body))}, timeout=timeout)
+            except RESEND_ERRORS:
+                if attempt >= scheduler.max_retries:
+                    raise
+                delay = scheduler.retry_delay(attempt)
+            else:
+                if not scheduler.should_retry(response.status, attempt):
+                    break
+                delay = scheduler.retry_delay(attempt, response.headers.get('Retry-After'))
+                response.release()
+            await asyncio.sleep(delay)
+            waited += delay
+            attempt += 1
+        elapsed = time.monotonic() - start
+        self._requests += 1
+        self._total_time += elapsed
+        stats = {"elapsed": elapsed, "wait": waited, "retries": attempt, "estimated_tokens": tokens}
+        return response, stats
+
+    def _settle(self, stats, usage):
+        (self.scheduler or get_scheduler()).settle(stats['estimated_tokens'], (usage or {}).get('totalTokenCount'))
+
+    def track(self, coroutine):
+        """Count ``coroutine`` as an in-flight request while it runs."""
+        async def tracked():
+            self._in_flight += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+            try:
+                return await coroutine
+            finally:
+                self._in_flight -= 1
+        return tracked()
+
+    def stats(self):
+        stats = {
+            "requests": self._requests,
+            "in_flight": self._in_flight,
+            "peak_in_flight": self._peak_in_flight,
+            "connections_opened": self._connections_opened,
+            "reused_connections": self._connections_reused,
+            "average_latency": self._total_time / self._requests if self._requests else 0.0,
+        }
+        if aiohttp is None:
+            # The requests went out on the blocking client; report its pool.
+            blocking = get_client().stats()
+            stats.update(requests=blocking['requests'], connections_opened=blocking['new_connections'],
+                         reused_connections=blocking['reused_connections'],
+                         average_latency=blocking['average_latency'])
+        return stats
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def _client_errors():
+    if aiohttp is None:
+        return ()
+    return (aiohttp.ClientError,)
+
+
+async def _blocking(method, *args):
+    # Without aiohttp each request falls back to the blocking client on a
+    # thread; cancelling the task still aborts it through a cancel token.
+    cancel = CancelToken()
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(None, functools.partial(method, *args, cancel=cancel))
+    except asyncio.CancelledError:
+        cancel.cancel()
+        raise
+
+
+class NetworkLoop:
+    """A daemon thread running the event loop that all async requests share.
+
+    ``submit`` schedules a coroutine from any thread and returns a
+    ``concurrent.futures.Future``; cancelling that future (or the optional
+    cancel token) cancels the coroutine and with it the HTTP request.
+    """
+
+    def __init__(self, client=None, cpu_workers=CPU_WORKERS):
+        self.loop = asyncio.new_event_loop()
+        self.client = client or AsyncGeminiClient()
+        self.cpu_executor = ThreadPoolExecutor(cpu_workers, thread_name_prefix='sef-cpu')
+        self.thread = threading.Thread(target=self._run, name='sef-network', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine, cancel=None):
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        if cancel is not None:
+            remove = cancel.add_callback(future.cancel)
+            future.add_done_callback(lambda _: remove())
+        return future
+
+    def run(self, coroutine, cancel=None, timeout=None):
+        return self.submit(coroutine, cancel).result(timeout)
+
+    async def run_cpu(self, function, *args, **kwargs):
+        return await self.loop.run_in_executor(self.cpu_executor, functools.partial(function, *args, **kwargs))
+
+    def close(self):
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.cpu_executor.shutdown()
+
+
+async def analyze_media_async(network, api_url, api_key, file_path, progress=None, on_text=None, cache=None,
+                              timeout=None, segment_long_videos=False, **options):
+    # ``timeout`` caps the whole file: preparation, every request and retries.
+    cache = cache or get_result_cache()
+    cancel = CancelToken()
+    try:
+        return await asyncio.wait_for(_analyze_media(network, api_url, api_key, file_path, progress, on_text, cache,
+                                                     cancel, segment_long_videos, options), timeout)
+    except asyncio.TimeoutError:
+        cancel.cancel()
+        return {"error": f"Analysis did not finish within {timeout} s"}
+    except asyncio.CancelledError:
+        cancel.cancel()
+        raise
+
+
+async def _analyze_media(network, api_url, api_key, file_path, progress, on_text, cache, cancel, segment_long_videos,
+                         options):
+    if segment_long_videos and await network.run_cpu(analysis.is_long_video, file_path):
+        return await analyze_long_video_async(network, api_url, api_key, file_path, progress, on_text, cache, cancel)
+    result, request = await network.run_cpu(analysis.prepare_media, api_url, file_path, progress, on_text, cache,
+                                            cancel=cancel, **options)
+    if result is not None:
+        return result
+    response = await network.client.track(
+        network.client.generate(api_url, api_key, request['body'], progress, on_text))
+    return analysis.finish_request(cache, request, response)
+
+
+async def analyze_long_video_async(network, api_url, api_key, file_path, progress=None, on_text=None, cache=None,
+                                   cancel=None, max_segments=analysis.SEGMENT_WORKERS):
+    # Segment requests are coroutines on this loop; only keyframe sampling
+    # goes to the CPU pool, at most ``max_segments`` at a time so one long
+    # video cannot monopolise it.
+    cache = cache or get_result_cache()
+    result, plan = await network.run_cpu(analysis.plan_long_video, api_url, file_path, progress, on_text, cache)
+    if result is not None:
+        return result
+    segments = plan['segments']
+    findings = [None] * len(segments)
+    finished = 0
+    limit = asyncio.Semaphore(max_segments)
+
+    async def analyze_segment(index, start, end):
+        nonlocal finished
+        try:
+            async with limit:
+                result, request = await network.run_cpu(analysis.prepare_segment, plan, file_path, start, end, cache,
+                                                        cancel)
+            if result is None:
+                response = await network.client.track(
+                    network.client.generate(api_url, api_key, request['body']))
+                result = analysis.finish_request(cache, request, response)
+        except VideoUnavailable as e:
+            result = {"error": str(e)}
+        findings[index] = analysis.report_segment((start, end), result, on_text)
+        finished += 1
+        if progress:
+            progress.update('segments', finished, len(segments))
+
+    if progress:
+        progress.stage('segments')
+    await asyncio.gather(*(analyze_segment(index, start, end) for index, (start, end) in enumerate(segments)))
+
+    findings = [text for text in findings if text]
+    if not findings:
+        return {"error": "Every segment of the video failed to analyze.", "streamed": bool(on_text)}
+    if on_text:
+        on_text("Overall assessment:\n")
+    response = await network.client.track(
+        network.client.generate(api_url, api_key, analysis.reduce_payload(findings), progress, on_text))
+    return analysis.finish_long_video(cache, plan, findings, response, on_text)
+
+
+async def analyze_scenario_async(network, api_url, api_key, scenario, description, progress=None, on_text=None,
+                                 cache=None, timeout=None):
+    cache = cache or get_scenario_cache()
+    result, request = analysis.prepare_scenario(api_url, scenario, description, progress, on_text, cache)
+    if result is not None:
+        return result
+    response = await network.client.track(
+        network.client.generate(api_url, api_key, request['body'], progress, on_text, timeout))
+    return analysis.finish_request(cache, request, response)
+
+
+async def warm_up_scenarios_async(analyze, scenarios, max_workers=analysis.SCENARIO_WARMUP_WORKERS):
+    pending = iter(scenarios.items())
+
+    async def worker():
+        for scenario, description in pending:
+            await analyze(scenario, description)
+
+    await asyncio.gather(*(worker() for _ in range(min(max_workers, len(scenarios)))))
+
+
+_network = None
+_network_lock = threading.Lock()
+
+
+def get_network_loop():
+    global _network
+    with _network_lock:
+        if _network is None:
+            _network = NetworkLoop()
+        return _network
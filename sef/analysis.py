@@ -0,0 +1,288 @@
+"""Qt-free analysis pipelines shared by the demo applications."""
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from sef.body import JsonBody, media_placeholder
+from sef.cache import get_result_cache, get_scenario_cache, model_from_url
+from sef.client import get_client
+from sef.inflight import check_cancelled
+from sef.media import IMAGE_FORMAT, IMAGE_QUALITY, MAX_EDGE, is_video, preprocess_image, sniff_file_mime
+from sef.progress import LONG_VIDEO_STAGES, VIDEO_STAGES
+from sef.video import FRAME_BUDGET, VideoUnavailable, format_timestamp, sample_keyframes, video_duration
+
+SCENARIO_WARMUP_WORKERS = 2
+# Long videos are split into segments that are analyzed concurrently (map)
+# and then summarized by one final request (reduce).
+LONG_VIDEO_SECONDS = 5 * 60
+SEGMENT_SECONDS = 2 * 60
+SEGMENT_WORKERS = 4
+SEGMENT_FRAME_BUDGET = 8
+
+MEDIA_PROMPT = "Analyze this image for safety and security concerns. Provide a detailed assessment of potential risks and recommended actions."
+SEGMENT_PROMPT = "The following frames are keyframes from the {start} to {end} segment of a longer surveillance video, in chronological order and labelled with their timestamps. List the safety and security relevant events in this segment with their timestamps. Be concise; reply 'No notable events.' if there are none."
+REDUCE_PROMPT = "Below are per-segment findings from a long surveillance recording, in chronological order. Combine them into a single detailed assessment of potential risks, when they occur, and recommended actions.\n\n{findings}"
+VIDEO_PROMPT = "The following frames are keyframes sampled from a surveillance video, in chronological order and labelled with their timestamps. Analyze the footage for safety and security concerns. Provide a detailed assessment of potential risks, when they occur, and recommended actions."
+
+
+def scenario_prompt(scenario, description):
+    return f"Analyze the following safety and security scenario: {scenario}\n\nDescription: {description}\n\nProvide a detailed assessment of potential risks, recommended actions, and preventive measures."
+
+
+def generate(api_url, api_key, payload, progress=None, on_text=None, cancel=None):
+    client = get_client()
+    if on_text:
+        return client.stream_generate_content(api_url, api_key, payload, on_text, progress, cancel)
+    return client.generate_content(api_url, api_key, payload, progress, cancel)
+
+
+def analyze_media(api_url, api_key, file_path, progress=None, on_text=None, cache=None,
+                  max_edge=MAX_EDGE, quality=IMAGE_QUALITY, image_format=IMAGE_FORMAT, frame_budget=FRAME_BUDGET,
+                  segment_long_videos=False, cancel=None):
+    cache = cache or get_result_cache()
+    if segment_long_videos and is_long_video(file_path):
+        return analyze_long_video(api_url, api_key, file_path, progress, on_text, cache, cancel=cancel)
+    result, request = prepare_media(api_url, file_path, progress, on_text, cache, max_edge, quality, image_format,
+                                    frame_budget, cancel)
+    if result is not None:
+        return result
+    return finish_request(cache, request, generate(api_url, api_key, request['body'], progress, on_text, cancel))
+
+
+def is_long_video(file_path):
+    return is_video(sniff_file_mime(file_path)) and _duration(file_path) > LONG_VIDEO_SECONDS
+
+
+def prepare_media(api_url, file_path, progress=None, on_text=None, cache=None, max_edge=MAX_EDGE,
+                  quality=IMAGE_QUALITY, image_format=IMAGE_FORMAT, frame_budget=FRAME_BUDGET, cancel=None):
+    """Do the disk and CPU work that comes before the request.
+
+    Returns ``(result, None)`` when there is nothing to send (a cache hit or
+    an error), otherwise ``(None, request)`` where ``request`` holds the
+    ``body`` to send, the cache ``key`` and ``extra`` result fields.
+    """
+    cache = cache or get_result_cache()
+    if is_video(sniff_file_mime(file_path)):
+        return prepare_video(api_url, file_path, progress, on_text, cache, frame_budget, cancel)
+
+    digest = cache.file_digest(file_path, progress)
+    variant = f'{max_edge}/{quality}/{image_format}'
+    key = cache.make_key(digest, MEDIA_PROMPT, model_from_url(api_url), variant)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached_result(cached, progress, on_text), None
+
+    # Images are re-encoded in memory (they shrink to a few hundred KB);
+    # anything passed through untouched stays on disk and is streamed from
+    # a memory map, so peak memory does not grow with the file size.
+    check_cancelled(cancel)
+    if progress:
+        progress.stage('preprocess')
+    source, mime_type, preprocess_info = preprocess_image(file_path, max_edge, quality, image_format)
+    if progress:
+        progress.stage('encode')
+    placeholder = media_placeholder(0)
+    payload = {
+        "contents": [{
+            "parts": [
+                {"text": MEDIA_PROMPT},
+                {"inline_data": {
+                    "mime_type": mime_type,
+                    "data": placeholder
+                }}
+            ]
+        }]
+    }
+    body = JsonBody(payload, {placeholder: source})
+    extra = {} if source is file_path else {"preprocess": preprocess_info}
+    return None, {"key": key, "body": body, "extra": extra}
+
+
+def finish_request(cache, request, result):
+    if 'error' not in result:
+        cache.put(request['key'], {"content": result['content']})
+    result.update(request['extra'])
+    return result
+
+
+def keyframe_body(prompt, keyframes):
+    parts = [{"text": prompt}]
+    media = {}
+    for index, (timestamp, frame) in enumerate(keyframes):
+        placeholder = media_placeholder(index)
+        media[placeholder] = frame
+        parts.append({"text": f"Frame at {format_timestamp(timestamp)}:"})
+        parts.append({"inline_data": {"mime_type": "image/jpeg", "data": placeholder}})
+    return JsonBody({"contents": [{"parts": parts}]}, media)
+
+
+def prepare_video(api_url, file_path, progress=None, on_text=None, cache=None, frame_budget=FRAME_BUDGET,
+                  cancel=None):
+    # Videos are never uploaded whole: a bounded set of keyframes chosen by
+    # scene-change scoring stands in for the footage.
+    cache = cache or get_result_cache()
+    if progress:
+        progress.set_stages(VIDEO_STAGES)
+        progress.stage('hash')
+    digest = cache.file_digest(file_path, progress, stage='hash')
+    key = cache.make_key(digest, VIDEO_PROMPT, model_from_url(api_url), f'keyframes/{frame_budget}')
+    cached = cache.get(key)
+    if cached is not None:
+        return cached_result(cached, progress, on_text), None
+
+    if progress:
+        progress.stage('decode')
+    try:
+        keyframes = sample_keyframes(file_path, frame_budget, progress=progress, cancel=cancel)
+    except VideoUnavailable as e:
+        return {"error": str(e)}, None
+    if not keyframes:
+        return {"error": f"No frames could be decoded from {os.path.basename(file_path)}."}, None
+
+    if progress:
+        progress.stage('encode')
+    body = keyframe_body(VIDEO_PROMPT, keyframes)
+    return None, {"key": key, "body": body, "extra": {"keyframes": len(keyframes)}}
+
+
+def analyze_long_video(api_url, api_key, file_path, progress=None, on_text=None, cache=None,
+                       segment_seconds=SEGMENT_SECONDS, max_workers=SEGMENT_WORKERS, frame_budget=SEGMENT_FRAME_BUDGET,
+                       cancel=None):
+    cache = cache or get_result_cache()
+    result, plan = plan_long_video(api_url, file_path, progress, on_text, cache, segment_seconds, frame_budget)
+    if result is not None:
+        return result
+    segments = plan['segments']
+
+    def analyze_segment(start, end):
+        result, request = prepare_segment(plan, file_path, start, end, cache, cancel)
+        if result is not None:
+            return result
+        return finish_request(cache, request, generate(api_url, api_key, request['body'], cancel=cancel))
+
+    # Map: segments are analyzed concurrently and reported as they finish,
+    # so wall-clock time tracks the worker count rather than the video length.
+    findings = [None] * len(segments)
+    if progress:
+        progress.stage('segments')
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sef-segment') as pool:
+        futures = {pool.submit(analyze_segment, start, end): index for index, (start, end) in enumerate(segments)}
+        for done, future in enumerate(as_completed(futures), 1):
+            index = futures[future]
+            try:
+                result = future.result()
+            except VideoUnavailable as e:
+                result = {"error": str(e)}
+            findings[index] = report_segment(segments[index], result, on_text)
+            if progress:
+                progress.update('segments', done, len(segments))
+
+    findings = [text for text in findings if text]
+    if not findings:
+        return {"error": "Every segment of the video failed to analyze.", "streamed": bool(on_text)}
+
+    # Reduce: one request summarizes the per-segment findings.
+    if on_text:
+        on_text("Overall assessment:\n")
+    result = generate(api_url, api_key, reduce_payload(findings), progress, on_text, cancel)
+    return finish_long_video(cache, plan, findings, result, on_text)
+
+
+def plan_long_video(api_url, file_path, progress=None, on_text=None, cache=None, segment_seconds=SEGMENT_SECONDS,
+                    frame_budget=SEGMENT_FRAME_BUDGET):
+    """Hash a long video and split it into segments.
+
+    Returns ``(result, None)`` for a cache hit or an error, otherwise
+    ``(None, plan)``; the plan is what ``prepare_segment`` and
+    ``finish_long_video`` need.
+    """
+    cache = cache or get_result_cache()
+    if progress:
+        progress.set_stages(LONG_VIDEO_STAGES)
+        progress.stage('hash')
+    digest = cache.file_digest(file_path, progress, stage='hash')
+    model = model_from_url(api_url)
+    key = cache.make_key(digest, REDUCE_PROMPT, model, f'segments/{segment_seconds}/{frame_budget}')
+    cached = cache.get(key)
+    if cached is not None:
+        return cached_result(cached, progress, on_text), None
+
+    try:
+        duration = video_duration(file_path)
+    except VideoUnavailable as e:
+        return {"error": str(e)}, None
+    segments = [(start, min(start + segment_seconds, duration))
+                for start in range(0, int(duration) + 1, segment_seconds) if start < duration]
+    return None, {"digest": digest, "model": model, "key": key, "segments": segments, "frame_budget": frame_budget}
+
+
+def prepare_segment(plan, file_path, start, end, cache, cancel=None):
+    """Like ``prepare_media`` for one segment of a planned long video."""
+    check_cancelled(cancel)
+    prompt = SEGMENT_PROMPT.format(start=format_timestamp(start), end=format_timestamp(end))
+    segment_key = cache.make_key(plan['digest'], prompt, plan['model'], f"keyframes/{plan['frame_budget']}")
+    cached_segment = cache.get(segment_key)
+    if cached_segment is not None:
+        return cached_segment, None
+    keyframes = sample_keyframes(file_path, plan['frame_budget'], start=start, end=end, cancel=cancel)
+    if not keyframes:
+        return {"content": "No frames could be decoded."}, None
+    return None, {"key": segment_key, "body": keyframe_body(prompt, keyframes), "extra": {}}
+
+
+def report_segment(segment, result, on_text=None):
+    """Stream a segment's outcome; returns its finding, or None if it failed."""
+    start, end = segment
+    label = f"[{format_timestamp(start)} - {format_timestamp(end)}]"
+    if 'error' in result:
+        text, finding = f"{label} Segment analysis failed: {result['error']}", None
+    else:
+        text = finding = f"{label} {result['content'].strip()}"
+    if on_text:
+        on_text(text + "\n\n")
+    return finding
+
+
+def reduce_payload(findings):
+    return {"contents": [{"parts": [{"text": REDUCE_PROMPT.format(findings="\n\n".join(findings))}]}]}
+
+
+def finish_long_video(cache, plan, findings, result, on_text=None):
+    if 'error' in result:
+        return result
+    content = "\n\n".join(findings) + "\n\nOverall assessment:\n" + result['content']
+    cache.put(plan['key'], {"content": content})
+    return {"content": content, "streamed": bool(on_text), "segments": len(plan['segments']),
+            "stats": result.get('stats')}
+
+
+def _duration(file_path):
+    try:
+        return video_duration(file_path)
+    except VideoUnavailable:
+        return 0
+
+
+def cached_result(cached, progress=None, on_text=None):
+    if on_text:
+        on_text(cached['content'])
+    if progress:
+        progress.finish()
+    return dict(cached, cached=True, streamed=bool(on_text))
+
+
+def prepare_scenario(api_url, scenario, description, progress=None, on_text=None, cache=None):
+    cache = cache or get_scenario_cache()
+    prompt = scenario_prompt(scenario, description)
+    key = (model_from_url(api_url), prompt)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached_result(cached, progress, on_text), None
+
+    payload = {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }]
+    }
+    return None, {"key": key, "body": payload, "extra": {}}
@@ -0,0 +1,97 @@
+"""Concurrent batch analysis with throughput and latency statistics."""
+import asyncio
+import bisect
+import math
+import os
+import threading
+import time
+
+MEDIA_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.mp4', '.avi', '.mov')
+BATCH_WORKERS = 4
+
+
+def collect_media(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                files.extend(os.path.join(root, name) for name in names if name.lower().endswith(MEDIA_EXTENSIONS))
+        elif os.path.isfile(path):
+            files.append(path)
+    return sorted(files)
+
+
+class BatchStats:
+    def __init__(self, total=0, clock=time.monotonic):
+        self.total = total
+        self.clock = clock
+        self.started = clock()
+        self.completed = 0
+        self.failed = 0
+        self._latencies = []
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok=True):
+        with self._lock:
+            self.completed += 1
+            self.failed += int(not ok)
+            bisect.insort(self._latencies, latency)
+
+    def percentile(self, fraction):
+        with self._lock:
+            return self._percentile(fraction)
+
+    def _percentile(self, fraction):
+        if not self._latencies:
+            return 0.0
+        # Nearest-rank percentile.
+        index = max(0, math.ceil(fraction * len(self._latencies)) - 1)
+        return self._latencies[index]
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = self.clock() - self.started
+            return {
+                "total": self.total,
+                "completed": self.completed,
+                "failed": self.failed,
+                "elapsed": elapsed,
+                "items_per_second": self.completed / elapsed if elapsed > 0 else 0.0,
+                "p50": self._percentile(0.50),
+                "p95": self._percentile(0.95),
+            }
+
+
+def format_stats(stats):
+    return (f"{stats['completed']}/{stats['total']} done ({stats['failed']} failed) | "
+            f"{stats['items_per_second']:.2f} items/s | p50 {stats['p50']:.2f} s | p95 {stats['p95']:.2f} s")
+
+
+async def run_batch_async(files, analyze, concurrency=BATCH_WORKERS, on_result=None, should_stop=None):
+    """Analyze ``files`` with at most ``concurrency`` in flight.
+
+    ``analyze(path)`` is awaited and returns a result dict;
+    ``on_result(path, result, stats)`` is called as each item finishes, in
+    completion order.  The ``concurrency`` tasks share one iterator over
+    ``files``, so stopping early leaves nothing queued.  Returns the final
+    stats snapshot.
+    """
+    stats = BatchStats(len(files))
+    pending = iter(files)
+
+    async def worker():
+        for path in pending:
+            if should_stop and should_stop():
+                return
+            start = time.monotonic()
+            try:
+                result = await analyze(path)
+            except Exception as e:
+                result = {"error": str(e)}
+            result['latency'] = time.monotonic() - start
+            stats.record(result['latency'], 'error' not in result)
+            if on_result:
+                on_result(path, result, stats.snapshot())
+
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, len(files)))))
+    return stats.snapshot()
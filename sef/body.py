@@ -0,0 +1,138 @@
+"""Streaming JSON request bodies with inline base64 media."""
+import base64
+import json
+import mmap
+import os
+
+from sef.scheduler import IMAGE_TOKENS, RESPONSE_TOKENS
+
+# A multiple of 3 so every chunk base64-encodes without padding and the
+# pieces concatenate into one valid base64 string.
+ENCODE_CHUNK = 3 * 16 * 1024
+RELEASE_EVERY = 8 * 1024 * 1024
+
+
+def media_placeholder(index):
+    return f'@@sef-media-{index}@@'
+
+
+class MediaSource:
+    """Base64 view of a file (memory-mapped) or bytes, encoded chunk by chunk."""
+
+    def __init__(self, source):
+        self.source = source
+        if isinstance(source, (str, os.PathLike)):
+            self.size = os.path.getsize(source)
+        else:
+            self.size = len(source)
+
+    def __len__(self):
+        return 4 * ((self.size + 2) // 3)
+
+    def chunks(self):
+        if not isinstance(self.source, (str, os.PathLike)):
+            yield from self._encode(memoryview(self.source))
+            return
+        if not self.size:
+            return
+        with open(self.source, 'rb') as media_file:
+            with mmap.mmap(media_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                    mapped.madvise(mmap.MADV_SEQUENTIAL)
+                view = memoryview(mapped)
+                try:
+                    yield from self._encode(view, mapped)
+                finally:
+                    view.release()
+
+    def _encode(self, view, mapped=None):
+        released = 0
+        for offset in range(0, len(view), ENCODE_CHUNK):
+            yield base64.b64encode(view[offset:offset + ENCODE_CHUNK])
+            # Drop pages that have already been sent so resident memory
+            # stays flat however large the mapped file is.
+            if mapped is not None and hasattr(mmap, 'MADV_DONTNEED') and offset - released >= RELEASE_EVERY:
+                mapped.madvise(mmap.MADV_DONTNEED, released, offset - released)
+                released = offset
+
+
+class JsonBody:
+    """File-like request body that never holds a whole encoded file.
+
+    ``payload`` is serialized once with placeholder strings standing in for
+    the media; the envelope text around them is sent as-is and each media
+    source is base64-encoded on the fly as the HTTP layer reads the body.
+    Because the total length is known up front the request is sent with a
+    Content-Length, and reads are reported to ``progress`` as upload bytes.
+    """
+
+    def __init__(self, payload, media=None, progress=None):
+        media = media or {}
+        text = json.dumps(payload)
+        self._pieces = []
+        for placeholder, source in sorted(media.items(), key=lambda item: text.index(item[0])):
+            before, text = text.split(placeholder, 1)
+            self._pieces.append(before.encode('utf-8'))
+            self._pieces.append(MediaSource(source))
+        self._pieces.append(text.encode('utf-8'))
+        self._length = sum(len(piece) for piece in self._pieces)
+        self.progress = progress
+        self.cancel = None
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def estimated_tokens(self):
+        # Rough request cost for rate limiting: ~4 characters per text token,
+        # a flat charge per inline media part, plus room for the answer.
+        text = sum(len(piece) for piece in self._pieces if not isinstance(piece, MediaSource))
+        media = sum(isinstance(piece, MediaSource) for piece in self._pieces)
+        return text // 4 + media * IMAGE_TOKENS + RESPONSE_TOKENS
+
+    def tell(self):
+        return self.sent
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        # Only rewinding is supported; that is all retries and redirects need.
+        if offset != 0 or whence != os.SEEK_SET:
+            raise OSError("JsonBody can only be rewound to the start")
+        self._chunks = self._iter_chunks()
+        self._chunk = b''
+        self._position = 0
+        self.sent = 0
+        return 0
+
+    def read(self, size=-1):
+        if self.cancel is not None:
+            self.cancel.raise_if_cancelled()
+        if size is None or size < 0:
+            size = self._length - self.sent
+        pieces = []
+        wanted = size
+        while wanted > 0:
+            if self._position >= len(self._chunk):
+                self._chunk = next(self._chunks, None)
+                self._position = 0
+                if self._chunk is None:
+                    self._chunk = b''
+                    break
+                continue
+            piece = self._chunk[self._position:self._position + wanted]
+            self._position += len(piece)
+            wanted -= len(piece)
+            pieces.append(piece)
+        data = b''.join(pieces)
+        self.sent += len(data)
+        if self.progress and data:
+            self.progress.update('upload', self.sent, self._length)
+            if self.sent >= self._length:
+                self.progress.stage('wait')
+        return data
+
+    def _iter_chunks(self):
+        for piece in self._pieces:
+            if isinstance(piece, MediaSource):
+                yield from piece.chunks()
+            elif piece:
+                yield piece
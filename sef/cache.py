@@ -0,0 +1,226 @@
+"""Content-addressed analysis result cache with memory and disk tiers."""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sef', 'results')
+MEMORY_ITEMS = 256
+MAX_DISK_BYTES = 64 * 1024 * 1024
+DIGEST_ITEMS = 4096
+SCENARIO_TTL = 60 * 60
+
+
+def model_from_url(api_url):
+    # .../models/gemini-1.5-flash-latest:generateContent -> gemini-1.5-flash-latest
+    return api_url.rsplit('/models/', 1)[-1].split(':', 1)[0]
+
+
+class ResultCache:
+    def __init__(self, directory=CACHE_DIR, memory_items=MEMORY_ITEMS, max_disk_bytes=MAX_DISK_BYTES):
+        self.directory = directory
+        self.memory_items = memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._digests = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # Disk index: key -> size, ordered from least to most recently used.
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                self.directory = None
+        if self.directory:
+            entries = []
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.json'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_bytes += size
+
+    @staticmethod
+    def make_key(digest, prompt, model, variant=''):
+        key = hashlib.sha256(digest.encode('ascii'))
+        key.update(b'\0' + prompt.encode('utf-8'))
+        key.update(b'\0' + model.encode('utf-8'))
+        key.update(b'\0' + variant.encode('utf-8'))
+        return key.hexdigest()
+
+    def known_digest(self, file_path):
+        # Unchanged files (same size and mtime) are not re-read or re-hashed.
+        with self._lock:
+            return self._digests.get(self._stat_key(file_path))
+
+    def file_digest(self, file_path, progress=None, stage='read', chunk_size=1024 * 1024):
+        # Files are hashed incrementally rather than loaded into memory.
+        digest = self.known_digest(file_path)
+        if digest is None:
+            total = os.path.getsize(file_path)
+            done = 0
+            sha = hashlib.sha256()
+            if progress:
+                progress.stage(stage)
+            with open(file_path, 'rb') as media_file:
+                for chunk in iter(lambda: media_file.read(chunk_size), b''):
+                    sha.update(chunk)
+                    done += len(chunk)
+                    if progress:
+                        progress.update(stage, done, total)
+            digest = self._store_digest(file_path, sha.hexdigest())
+        return digest
+
+    def _store_digest(self, file_path, digest):
+        with self._lock:
+            self._digests[self._stat_key(file_path)] = digest
+            while len(self._digests) > DIGEST_ITEMS:
+                self._digests.popitem(last=False)
+        return digest
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+            if key in self._disk:
+                value = self._read(key)
+                if value is not None:
+                    self._disk.move_to_end(key)
+                    self._remember(key, value)
+                    self.disk_hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+            if self.directory:
+                self._write(key, value)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _stat_key(self, file_path):
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.json')
+
+    def _read(self, key):
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as cache_file:
+                value = json.load(cache_file)
+            os.utime(self._path(key))
+            return value
+        except (OSError, ValueError):
+            self._forget(key)
+            return None
+
+    def _write(self, key, value):
+        data = json.dumps(value).encode('utf-8')
+        tmp_path = self._path(key) + '.tmp'
+        try:
+            with open(tmp_path, 'wb') as cache_file:
+                cache_file.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            return
+        self._forget(key, remove=False)
+        self._disk[key] = len(data)
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+            oldest = next(iter(self._disk))
+            self._forget(oldest)
+
+    def _forget(self, key, remove=True):
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+        if remove:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+
+class TTLCache:
+    def __init__(self, ttl=SCENARIO_TTL, clock=time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, value = entry
+                if self.clock() < expires:
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "expired": self.expired, "items": len(self._entries)}
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
+
+
+_scenario_cache = None
+
+
+def get_scenario_cache():
+    global _scenario_cache
+    with _result_cache_lock:
+        if _scenario_cache is None:
+            _scenario_cache = TTLCache()
+        return _scenario_cache
@@ -0,0 +1,97 @@
+"""Headless command line interface: python -m sef analyze <paths> ..."""
+import argparse
+import json
+import os
+import sys
+
+from sef import aio
+from sef.batch import BATCH_WORKERS, collect_media, format_stats
+from sef.cache import ResultCache, get_result_cache
+from sef.engine import AnalysisEngine, api_url_for_model
+from sef.media import IMAGE_FORMAT, IMAGE_QUALITY, MAX_EDGE
+from sef.scheduler import (MAX_RETRIES, REQUESTS_PER_MINUTE, TOKENS_PER_MINUTE, configure_scheduler,
+                           format_scheduler_stats)
+from sef.video import FRAME_BUDGET
+
+DEFAULT_MODEL = 'gemini-1.5-flash-latest'
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m sef', description="SEF safety and security media analysis.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    analyze = subparsers.add_parser('analyze', help="Analyze images and videos (files or directories).")
+    analyze.add_argument('paths', nargs='+', help="Media files or directories to scan.")
+    analyze.add_argument('-c', '--concurrency', type=int, default=BATCH_WORKERS,
+                         help=f"Analyses in flight at once (default: {BATCH_WORKERS}).")
+    analyze.add_argument('-o', '--out', default='-', help="JSONL output file, '-' for stdout (default).")
+    analyze.add_argument('--append', action='store_true', help="Append to --out instead of replacing it.")
+    analyze.add_argument('--api-key', default=os.environ.get('GEMINI_API_KEY', ''),
+                         help="Gemini API key (default: $GEMINI_API_KEY).")
+    analyze.add_argument('--model', default=DEFAULT_MODEL, help=f"Gemini model (default: {DEFAULT_MODEL}).")
+    analyze.add_argument('--api-url', help="Full generateContent URL; overrides --model (e.g. for a proxy).")
+    analyze.add_argument('--max-edge', type=int, default=MAX_EDGE, help="Longest image edge sent, in pixels.")
+    analyze.add_argument('--quality', type=int, default=IMAGE_QUALITY, help="Re-encoding quality for images.")
+    analyze.add_argument('--format', dest='image_format', choices=('JPEG', 'WEBP'), default=IMAGE_FORMAT,
+                         help="Re-encoding format for images.")
+    analyze.add_argument('--frame-budget', type=int, default=FRAME_BUDGET, help="Keyframes sent per video.")
+    analyze.add_argument('--segment-long-videos', action='store_true',
+                         help="Analyze long videos as concurrently processed segments.")
+    analyze.add_argument('--rpm', type=int, default=REQUESTS_PER_MINUTE,
+                         help=f"Requests-per-minute budget (default: {REQUESTS_PER_MINUTE}).")
+    analyze.add_argument('--tpm', type=int, default=TOKENS_PER_MINUTE,
+                         help=f"Tokens-per-minute budget (default: {TOKENS_PER_MINUTE}).")
+    analyze.add_argument('--max-retries', type=int, default=MAX_RETRIES,
+                         help=f"Retries for 429/5xx responses (default: {MAX_RETRIES}).")
+    analyze.add_argument('--timeout', type=float, help="Give up on a file after this many seconds, retries included.")
+    analyze.add_argument('--no-disk-cache', action='store_true', help="Do not read or write the on-disk result cache.")
+    return parser
+
+
+def analyze(args):
+    if not args.api_key:
+        print("No API key: pass --api-key or set GEMINI_API_KEY.", file=sys.stderr)
+        return 2
+    files = collect_media(args.paths)
+    if not files:
+        print("No media files found.", file=sys.stderr)
+        return 2
+
+    scheduler = configure_scheduler(requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+                                    max_retries=args.max_retries)
+    cache = ResultCache(directory=None) if args.no_disk_cache else get_result_cache()
+    engine = AnalysisEngine(args.api_url or api_url_for_model(args.model), args.api_key, cache=cache)
+    # Batches run entirely on the network loop; warm one socket per slot.
+    engine.prewarm(args.concurrency, blocking_client=False)
+    out = sys.stdout if args.out == '-' else open(args.out, 'a' if args.append else 'w', encoding='utf-8')
+
+    def write_result(file_path, result, stats):
+        # One line per finished file, flushed so results can be tailed.
+        out.write(json.dumps(dict(result, path=file_path), default=str) + '\n')
+        out.flush()
+        if sys.stderr.isatty():
+            print(f"\r{format_stats(stats)}", end='', file=sys.stderr, flush=True)
+
+    try:
+        stats = engine.submit_batch(files, args.concurrency, write_result, timeout=args.timeout,
+                                    max_edge=args.max_edge, quality=args.quality, image_format=args.image_format,
+                                    frame_budget=args.frame_budget,
+                                    segment_long_videos=args.segment_long_videos).result()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    network_stats = aio.get_network_loop().client.stats()
+    print(f"\r{format_stats(stats)}", file=sys.stderr)
+    print(f"elapsed {stats['elapsed']:.1f} s | connections reused {network_stats['reused_connections']}"
+          f"/{network_stats['requests']} | peak in flight {network_stats['peak_in_flight']}"
+          f" | cache {cache.stats()['hit_rate']:.0%} hits", file=sys.stderr)
+    print(f"scheduler: {format_scheduler_stats(scheduler.stats())}", file=sys.stderr)
+    return 1 if stats['failed'] else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'analyze':
+        return analyze(args)
+    return 2
@@ -0,0 +1,341 @@
+"""Process-wide pooled HTTP client for the Gemini API."""
+import contextlib
+import json
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from sef.body import JsonBody
+from sef.inflight import Cancelled, check_cancelled
+from sef.scheduler import get_scheduler
+
+API_HOST = 'https://generativelanguage.googleapis.com'
+DEFAULT_API_URL = f'{API_HOST}/v1beta/models/gemini-1.5-flash-latest:generateContent'
+PLACEHOLDER_API_KEY = 'YOUR_API_KEY'
+
+POOL_SIZE = 8
+CHUNK_SIZE = 64 * 1024
+CONNECT_TIMEOUT = 5.0
+READ_TIMEOUT = 120.0
+
+def api_origin(url):
+    """``scheme://host[:port]`` of ``url``: where its connections go."""
+    parts = urlsplit(url)
+    return f'{parts.scheme}://{parts.netloc}'
+
+
+def has_api_key(api_key):
+    """False for an empty key or the placeholder the demos ship with."""
+    return bool(api_key) and api_key != PLACEHOLDER_API_KEY
+
+
+# Connections opened by the current thread's in-progress request.  urllib3
+# creates connections lazily in the calling thread, so a thread-local counter
+# tells us exactly whether a given request reused a pooled socket.
+_local = threading.local()
+
+
+def _count_new_connection():
+    _local.new_connections = getattr(_local, 'new_connections', 0) + 1
+
+
+def _watch_connection(connection):
+    # Connections are checked out in the requesting thread too, so this is
+    # where a cancellable request learns which socket to abort.
+    cancel = getattr(_local, 'cancel', None)
+    if cancel is not None:
+        _local.unwatch.append(cancel.add_callback(lambda: _abort(connection)))
+
+
+def _abort(connection):
+    # Shutting the socket down wakes the thread blocked on it; urllib3 then
+    # discards the connection instead of returning it to the pool.
+    sock = getattr(connection, 'sock', None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+@contextlib.contextmanager
+def _abortable(cancel):
+    _local.cancel = cancel
+    _local.unwatch = []
+    try:
+        yield
+    finally:
+        _local.cancel = None
+        for unwatch in _local.unwatch:
+            unwatch()
+
+
+class _TrackingHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        _count_new_connection()
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        _watch_connection(connection)
+        return connection
+
+
+class _TrackingHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        _count_new_connection()
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        connection = super()._get_conn(timeout)
+        _watch_connection(connection)
+        return connection
+
+
+class TrackingAdapter(HTTPAdapter):
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TrackingHTTPConnectionPool,
+            'https': _TrackingHTTPSConnectionPool,
+        }
+
+    def send(self, request, **kwargs):
+        _local.new_connections = 0
+        response = super().send(request, **kwargs)
+        response.connection_reused = _local.new_connections == 0
+        return response
+
+
+class SSEParser:
+    """Incremental server-sent events parser yielding each event's JSON data."""
+
+    def __init__(self):
+        self._buffer = b''
+        self._data_lines = []
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        *lines, self._buffer = self._buffer.split(b'\n')
+        for line in lines:
+            line = line.rstrip(b'\r')
+            if line.startswith(b'data:'):
+                self._data_lines.append(line[5:].strip())
+            elif not line and self._data_lines:
+                yield json.loads(b'\n'.join(self._data_lines))
+                self._data_lines = []
+
+    def close(self):
+        # A stream may end without a newline after its last line.
+        yield from self.feed(b'\n')
+        if self._data_lines:
+            yield json.loads(b'\n'.join(self._data_lines))
+            self._data_lines = []
+
+
+def iter_sse_events(response):
+    # chunk_size=None hands us each chunk as soon as it arrives instead of
+    # waiting for a fixed-size buffer to fill.
+    parser = SSEParser()
+    for chunk in response.iter_content(chunk_size=None):
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def candidate_texts(event):
+    for candidate in event.get('candidates', [])[:1]:
+        for part in candidate.get('content', {}).get('parts', []):
+            text = part.get('text')
+            if text:
+                yield text
+
+
+class GeminiClient:
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 scheduler=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.pool_size = pool_size
+        # None means the process-wide scheduler, looked up per request so it
+        # can be reconfigured after the client exists.
+        self.scheduler = scheduler
+        self.session = requests.Session()
+        self.session.headers.update({'Content-Type': 'application/json'})
+        adapter = TrackingAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._reused = 0
+        self._total_time = 0.0
+        self.last_request = None
+
+    def post(self, url, api_key, payload, progress=None, cancel=None, **kwargs):
+        # payload is either a plain JSON-able dict or a prepared JsonBody
+        # that streams large media instead of holding it in memory.
+        if progress:
+            progress.stage('encode')
+        body = payload if isinstance(payload, JsonBody) else JsonBody(payload)
+        body.progress = progress
+        body.cancel = cancel
+        scheduler = self.scheduler or get_scheduler()
+        tokens = body.estimated_tokens()
+        waited = 0.0
+        attempt = 0
+        while True:
+            # Every attempt, retries included, is charged against the budget.
+            waited += scheduler.acquire(tokens, cancel)
+            check_cancelled(cancel)
+            body.seek(0)
+            start = time.monotonic()
+            try:
+                response = self.session.post(f'{url}?key={api_key}', data=body, timeout=self.timeout, **kwargs)
+            except requests.exceptions.ConnectionError:
+                if attempt >= scheduler.max_retries or (cancel is not None and cancel.cancelled):
+                    raise
+                waited += scheduler.backoff(attempt, cancel=cancel)
+                attempt += 1
+                continue
+            if not scheduler.should_retry(response.status_code, attempt):
+                break
+            retry_after = response.headers.get('Retry-After')
+            response.close()
+            waited += scheduler.backoff(attempt, retry_after, cancel)
+            attempt += 1
+        stats = self._record(response, time.monotonic() - start)
+        response.request_stats = dict(stats, wait=waited, retries=attempt, estimated_tokens=tokens)
+        response.estimated_tokens = tokens
+        return response
+
+    def generate_content(self, url, api_key, payload, progress=None, cancel=None):
+        try:
+            with _abortable(cancel), self.post(url, api_key, payload, progress, cancel, stream=True) as response:
+                response.raise_for_status()
+                data = self._read_body(response, progress)
+            check_cancelled(cancel)
+            if progress:
+                progress.stage('parse')
+            response_data = json.loads(data)
+            self._settle(response, response_data)
+            content = response_data['candidates'][0]['content']['parts'][0]['text']
+            if progress:
+                progress.finish()
+            return {"content": content, "stats": response.request_stats}
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+            if cancel is not None and cancel.cancelled:
+                raise Cancelled() from e
+            return {"error": f"API request failed: {str(e)}"}
+
+    def stream_generate_content(self, url, api_key, payload, on_text, progress=None, cancel=None):
+        # Server-sent events: each event carries the next slice of the answer.
+        stream_url = url.replace(':generateContent', ':streamGenerateContent')
+        parts = []
+        usage = None
+        try:
+            with _abortable(cancel), self.post(stream_url, api_key, payload, progress, cancel,
+                                               stream=True, params={'alt': 'sse'}) as response:
+                response.raise_for_status()
+                if progress:
+                    progress.stage('download')
+                for event in iter_sse_events(response):
+                    usage = event.get('usageMetadata', usage)
+                    for text in candidate_texts(event):
+                        parts.append(text)
+                        on_text(text)
+            check_cancelled(cancel)
+            self._settle(response, {'usageMetadata': usage or {}})
+            if progress:
+                progress.finish()
+            return {"content": ''.join(parts), "streamed": True, "stats": response.request_stats}
+        except (requests.exceptions.RequestException, urllib3.exceptions.HTTPError) as e:
+            if cancel is not None and cancel.cancelled:
+                raise Cancelled() from e
+            return {"error": f"API request failed: {str(e)}", "streamed": bool(parts)}
+
+    def _settle(self, response, response_data):
+        used = response_data.get('usageMetadata', {}).get('totalTokenCount')
+        (self.scheduler or get_scheduler()).settle(response.estimated_tokens, used)
+
+    def _read_body(self, response, progress):
+        total = int(response.headers.get('Content-Length') or 0)
+        chunks = []
+        if progress:
+            progress.stage('download')
+        for chunk in response.raw.stream(CHUNK_SIZE, decode_content=True):
+            chunks.append(chunk)
+            if progress and total:
+                progress.update('download', response.raw.tell(), total)
+        return b''.join(chunks)
+
+    def prewarm(self, url=None, connections=1, block=False):
+        # Open (and return to the pool) connections to the host of ``url``
+        # (the Gemini API by default) ahead of the first analysis so it
+        # does not pay for DNS, TCP and TLS setup.  Each
+        # connection is opened on its own thread and held until all are
+        # open, so they are set up at once and none reuses another's socket.
+        origin = api_origin(url or API_HOST)
+        connections = min(connections, self.pool_size)
+        if connections < 1:
+            return None if block else []
+        opened = threading.Barrier(connections)
+
+        def warm():
+            try:
+                response = self.session.head(origin, timeout=self.timeout, stream=True)
+            except requests.exceptions.RequestException:
+                opened.abort()
+                return
+            try:
+                opened.wait(self.timeout[0])
+            except threading.BrokenBarrierError:
+                pass
+            # Reading the (empty) body hands the connection back to the pool.
+            response.content
+
+        threads = [threading.Thread(target=warm, name='sef-prewarm', daemon=True) for _ in range(connections)]
+        for thread in threads:
+            thread.start()
+        if block:
+            for thread in threads:
+                thread.join()
+            return None
+        return threads
+
+    def _record(self, response, elapsed):
+        reused = getattr(response, 'connection_reused', False)
+        with self._stats_lock:
+            self._requests += 1
+            self._reused += int(reused)
+            self._total_time += elapsed
+            self.last_request = {"connection_reused": reused, "elapsed": elapsed}
+            return self.last_request
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "requests": self._requests,
+                "reused_connections": self._reused,
+                "new_connections": self._requests - self._reused,
+                "average_latency": self._total_time / self._requests if self._requests else 0.0,
+            }
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GeminiClient()
+        return _client
@@ -0,0 +1,94 @@
+"""Qt-free analysis engine shared by the GUIs and the command line."""
+import os
+
+from sef import aio, analysis
+from sef.batch import BATCH_WORKERS, collect_media, run_batch_async
+from sef.client import API_HOST, DEFAULT_API_URL, get_client
+from sef.inflight import AsyncInFlightRequests, InFlightRequests
+
+
+def api_url_for_model(model):
+    return f'{API_HOST}/v1beta/models/{model}:generateContent'
+
+
+class AnalysisEngine:
+    def __init__(self, api_url=DEFAULT_API_URL, api_key='', cache=None, scenario_cache=None):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.cache = cache
+        self.scenario_cache = scenario_cache
+        # Identical analyses requested while one is running share its result.
+        self.in_flight = InFlightRequests()
+        self.async_in_flight = AsyncInFlightRequests()
+
+    def media_key(self, file_path, options):
+        return ('media', self.api_url, os.path.abspath(file_path), tuple(sorted(options.items())))
+
+    def hold_media(self, file_path, **options):
+        """Keep an identical running analysis alive; call the result to let go."""
+        return self.in_flight.hold(self.media_key(file_path, options))
+
+    def analyze_media(self, file_path, progress=None, on_text=None, cancel=None, **options):
+        key = self.media_key(file_path, options)
+
+        def work(progress, on_text, cancel):
+            return analysis.analyze_media(self.api_url, self.api_key, file_path, progress, on_text,
+                                          cache=self.cache, cancel=cancel, **options)
+
+        return self.in_flight.run(key, work, progress, on_text, cancel)
+
+    # The submit_* methods run on the shared asyncio network loop instead of
+    # a thread per request.  They return concurrent.futures.Future objects;
+    # cancelling one (or its cancel token) aborts the underlying request.
+
+    def submit_scenario(self, scenario, description, progress=None, on_text=None, cancel=None, timeout=None):
+        network = aio.get_network_loop()
+        return network.submit(self._scenario_request(network, scenario, description, progress, on_text, timeout),
+                              cancel)
+
+    def submit_batch(self, paths, concurrency=BATCH_WORKERS, on_result=None, should_stop=None, cancel=None,
+                     timeout=None, **options):
+        network = aio.get_network_loop()
+        files = collect_media(paths)
+        return network.submit(run_batch_async(
+            files, lambda file_path: self._media_request(network, file_path, None, None, timeout, options),
+            concurrency, on_result, should_stop), cancel)
+
+    def warm_up_scenarios(self, scenarios, max_workers=analysis.SCENARIO_WARMUP_WORKERS):
+        # Warm-up goes through the engine so picking a scenario that is still
+        # being precomputed joins that request instead of sending another.
+        network = aio.get_network_loop()
+        return network.submit(aio.warm_up_scenarios_async(
+            lambda scenario, description: self._scenario_request(network, scenario, description),
+            scenarios, max_workers))
+
+    def _media_request(self, network, file_path, progress=None, on_text=None, timeout=None, options=None):
+        options = options or {}
+        key = self.media_key(file_path, options)
+
+        async def work(progress, on_text):
+            return await aio.analyze_media_async(network, self.api_url, self.api_key, file_path, progress, on_text,
+                                                 self.cache, timeout, **options)
+
+        return self.async_in_flight.run(key, work, progress, on_text)
+
+    def _scenario_request(self, network, scenario, description, progress=None, on_text=None, timeout=None):
+        key = ('scenario', self.api_url, scenario, description)
+
+        async def work(progress, on_text):
+            return await aio.analyze_scenario_async(network, self.api_url, self.api_key, scenario, description,
+                                                    progress, on_text, self.scenario_cache, timeout)
+
+        return self.async_in_flight.run(key, work, progress, on_text)
+
+    def prewarm(self, connections=1, blocking_client=True):
+        """Open connections to the API host before the first analysis needs them.
+
+        The network loop's pool is always warmed; ``blocking_client`` also
+        warms the pool ``analyze_media`` uses.  Returns the network loop's
+        future.
+        """
+        if blocking_client:
+            get_client().prewarm(self.api_url, connections)
+        network = aio.get_network_loop()
+        return network.submit(network.client.prewarm(self.api_url, connections))
@@ -0,0 +1,75 @@
+"""Incident density binned at several map resolutions."""
+import math
+
+import numpy as np  # a folium dependency, so present wherever the map is
+
+from sef.spatial import cluster_size
+
+HEAT_LEVELS = (6, 8, 10, 12, 14, 16)
+HEAT_PIXELS = 16
+
+
+class HeatGrid:
+    """Sparse 2-D histograms of incident positions, one per zoom level.
+
+    Bins are about ``pixels`` screen pixels wide at their zoom level.
+    Points are added and removed incrementally, so the grids are always
+    current; ``points`` returns the bins in a viewport at the level
+    nearest the requested zoom as ``[lat, lon, weight]`` with weights
+    scaled to 0..1.  What reaches the map is bounded by the screen size,
+    not by the number of incidents.
+    """
+
+    def __init__(self, levels=HEAT_LEVELS, pixels=HEAT_PIXELS):
+        self.levels = tuple(sorted(levels))
+        self.sizes = {zoom: cluster_size(zoom, pixels) for zoom in self.levels}
+        self._bins = {zoom: {} for zoom in self.levels}
+
+    def add(self, lats, lons, sign=1):
+        """Bin one point or arrays of points (``sign=-1`` removes them)."""
+        if np.isscalar(lats):
+            # The common case, one new incident, skips the array round trip.
+            for zoom, size in self.sizes.items():
+                self._bump(self._bins[zoom], (math.floor(lats / size), math.floor(lons / size)), sign)
+            return
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        for zoom, size in self.sizes.items():
+            cells = np.stack([np.floor(lats / size), np.floor(lons / size)], axis=1).astype(np.int64)
+            cells, counts = np.unique(cells, axis=0, return_counts=True)
+            bins = self._bins[zoom]
+            for cell, count in zip(map(tuple, cells.tolist()), counts.tolist()):
+                self._bump(bins, cell, sign * count)
+
+    def remove(self, lats, lons):
+        self.add(lats, lons, sign=-1)
+
+    def level(self, zoom):
+        return min(self.levels, key=lambda level: abs(level - zoom))
+
+    def points(self, south, west, north, east, zoom):
+        level = self.level(zoom)
+        size = self.sizes[level]
+        bins = self._bins[level]
+        first_row, last_row = int(np.floor(south / size)), int(np.floor(north / size))
+        first_col, last_col = int(np.floor(west / size)), int(np.floor(east / size))
+        if (last_row - first_row + 1) * (last_col - first_col + 1) > len(bins):
+            cells = [(cell, count) for cell, count in bins.items()
+                     if first_row <= cell[0] <= last_row and first_col <= cell[1] <= last_col]
+        else:
+            cells = [((row, col), bins[(row, col)]) for row in range(first_row, last_row + 1)
+                     for col in range(first_col, last_col + 1) if (row, col) in bins]
+        if not cells:
+            return []
+        grid = np.array([(row, col, count) for (row, col), count in cells], dtype=float)
+        grid[:, :2] = (grid[:, :2] + 0.5) * size
+        grid[:, 2] /= grid[:, 2].max()
+        return np.round(grid, 5).tolist()
+
+    @staticmethod
+    def _bump(bins, cell, count):
+        total = bins.get(cell, 0) + count
+        if total > 0:
+            bins[cell] = total
+        else:
+            bins.pop(cell, None)
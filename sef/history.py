@@ -0,0 +1,114 @@
+"""The History tab: stored analyses as a paged, lazily loaded thumbnail grid."""
+import os
+import time
+from collections import OrderedDict
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QSize, Qt
+from PyQt6.QtWidgets import QListView
+
+from sef.images import THUMBNAIL_EDGE, ThumbnailCache
+from sef.store import get_history_store
+
+PAGE_SIZE = 256
+CACHED_PAGES = 8
+
+
+class HistoryModel(QAbstractListModel):
+    """Past analyses from a ``HistoryStore``, read a page at a time.
+
+    Only the few most recently used pages of ``(id, created, file_path)``
+    are held, so memory stays flat however long the history grows; the
+    insights text is fetched when an entry is opened.  ``set_search``
+    narrows the rows to analyses whose insights match.
+
+    Views only ask for the decoration of rows they paint, so a thumbnail is
+    requested when its row first scrolls into view and the row repaints
+    once it is ready.  Scenario analyses have no file and no thumbnail.
+    """
+
+    def __init__(self, store=None, thumbnails=None, parent=None):
+        super().__init__(parent)
+        self.store = store or get_history_store()
+        self.thumbnails = thumbnails or ThumbnailCache(parent=self)
+        self.thumbnails.thumbnail_ready.connect(self._thumbnail_ready)
+        self.search = ''
+        self._count = self.store.count()
+        self._pages = OrderedDict()
+
+    def __len__(self):
+        return self._count
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        analysis_id, created, file_path = self._row(index.row())
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"Analysis {analysis_id}"
+        if role == Qt.ItemDataRole.ToolTipRole:
+            when = time.strftime('%Y-%m-%d %H:%M', time.localtime(created))
+            return f"{os.path.basename(file_path)}\n{when}" if file_path else when
+        if role == Qt.ItemDataRole.DecorationRole and file_path:
+            return self.thumbnails.thumbnail(file_path)
+        return None
+
+    def add(self, file_path, insights):
+        self.store.add(file_path, insights)
+        if file_path:
+            self.thumbnails.generate(file_path)
+        if self.search:
+            # Whether it matches is the index's call; requery.
+            self.set_search(self.search)
+            return
+        row = self._count
+        self.beginInsertRows(QModelIndex(), row, row)
+        self._count += 1
+        self._pages.pop(row // PAGE_SIZE, None)
+        self.endInsertRows()
+
+    def entry(self, row):
+        """``(file_path, insights)`` of the analysis at ``row``."""
+        analysis_id, _, file_path = self._row(row)
+        return file_path, self.store.insights(analysis_id)
+
+    def set_search(self, text):
+        self.beginResetModel()
+        self.search = text.strip()
+        self._pages.clear()
+        self._count = self.store.count(self.search)
+        self.endResetModel()
+
+    def _row(self, row):
+        number, offset = divmod(row, PAGE_SIZE)
+        page = self._pages.get(number)
+        if page is None:
+            page = self._pages[number] = self.store.page(number * PAGE_SIZE, PAGE_SIZE, self.search)
+            while len(self._pages) > CACHED_PAGES:
+                self._pages.popitem(last=False)
+        else:
+            self._pages.move_to_end(number)
+        return page[offset]
+
+    def _thumbnail_ready(self, file_path, image):
+        # Rows that are on screen are in a cached page.
+        for number, page in self._pages.items():
+            for offset, (_, _, path) in enumerate(page):
+                if path == file_path:
+                    index = self.index(number * PAGE_SIZE + offset)
+                    self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+
+class HistoryView(QListView):
+    """Icon grid for a ``HistoryModel`` that lays out and paints only what is visible."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setIconSize(QSize(THUMBNAIL_EDGE, THUMBNAIL_EDGE))
+        self.setGridSize(QSize(THUMBNAIL_EDGE + 24, THUMBNAIL_EDGE + 32))
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setMovement(QListView.Movement.Static)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
@@ -0,0 +1,239 @@
+"""Image decoding and thumbnails, produced off the GUI thread."""
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import QObject, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QImageReader
+
+from sef.cache import get_result_cache
+from sef.jobs import PRIORITY_HIGH, PRIORITY_LOW, JobExecutor, QueueFull
+from sef.media import VIDEO_EXTENSIONS
+from sef.video import VideoUnavailable, poster_frame
+
+DISPLAY_SIZE = QSize(800, 600)
+IMAGE_CACHE_ITEMS = 16
+IMAGE_WORKERS = 2
+
+THUMBNAIL_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'sef', 'thumbnails')
+THUMBNAIL_EDGE = 128
+THUMBNAIL_QUALITY = 80
+THUMBNAIL_ITEMS = 1024
+MAX_THUMBNAIL_BYTES = 32 * 1024 * 1024
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_QUEUE = 1024
+
+
+def read_scaled_image(file_path, size):
+    """Decode ``file_path`` straight to the largest size fitting ``size``.
+
+    The reader scales while decoding (JPEGs are decoded at a reduced DCT
+    size), so a full-resolution copy is never held in memory.
+    """
+    reader = QImageReader(file_path)
+    source = reader.size()
+    if source.isValid():
+        reader.setScaledSize(source.scaled(size, Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+
+def _image_key(file_path, size):
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, size.width(), size.height())
+
+
+class ImageCache:
+    """LRU of decoded images, keyed by path, size, mtime and display size."""
+
+    def __init__(self, max_items=IMAGE_CACHE_ITEMS):
+        self.max_items = max_items
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+    def put(self, key, image):
+        with self._lock:
+            self._images[key] = image
+            self._images.move_to_end(key)
+            while len(self._images) > self.max_items:
+                self._images.popitem(last=False)
+
+
+class ImageLoader(QObject):
+    """Loads stills for display without blocking the GUI thread.
+
+    ``load()`` answers from the cache at once, otherwise decodes on a small
+    worker pool and emits ``image_loaded`` when done.  Starting a new load
+    drops a queued one, so scrolling through history decodes only what is
+    eventually shown.  A file that cannot be read yields a null ``QImage``.
+    """
+    image_loaded = pyqtSignal(str, QImage)
+
+    def __init__(self, size=DISPLAY_SIZE, cache=None, executor=None, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.cache = cache or ImageCache()
+        self.executor = executor or JobExecutor(IMAGE_WORKERS, name='sef-image')
+        self._pending = None
+
+    def load(self, file_path):
+        try:
+            key = _image_key(file_path, self.size)
+        except OSError:
+            self.image_loaded.emit(file_path, QImage())
+            return
+        image = self.cache.get(key)
+        if image is not None:
+            self.image_loaded.emit(file_path, image)
+            return
+        if self._pending is not None:
+            self._pending.cancel()
+        self._pending = self.executor.submit(lambda cancel: self._decode(file_path, key, cancel), PRIORITY_HIGH)
+
+    def _decode(self, file_path, key, cancel):
+        image = read_scaled_image(file_path, self.size)
+        if not image.isNull():
+            self.cache.put(key, image)
+        if not cancel.cancelled:
+            self.image_loaded.emit(file_path, image)
+
+
+class ThumbnailCache(QObject):
+    """Small previews of analysed media, generated in the background.
+
+    Thumbnails are stored on disk under the file's content hash, so they
+    survive restarts and renames, and recently used ones stay in memory.
+    The directory is kept under ``max_disk_bytes`` by removing the least
+    recently used thumbnails.  ``thumbnail()`` never blocks: it returns what is cached, otherwise it
+    queues the work and ``thumbnail_ready`` follows.  Media that cannot be
+    previewed gets a null ``QImage`` and is not retried.
+    """
+    thumbnail_ready = pyqtSignal(str, QImage)
+
+    def __init__(self, directory=THUMBNAIL_DIR, edge=THUMBNAIL_EDGE, digests=None, executor=None,
+                 max_disk_bytes=MAX_THUMBNAIL_BYTES, parent=None):
+        super().__init__(parent)
+        self.directory = directory
+        self.edge = edge
+        self.max_disk_bytes = max_disk_bytes
+        # Content hashes come from the result cache, which has usually
+        # computed them already while analysing the file.
+        self.digests = digests or get_result_cache()
+        self.executor = executor or JobExecutor(THUMBNAIL_WORKERS, THUMBNAIL_QUEUE, name='sef-thumbnail')
+        self.memory = ImageCache(THUMBNAIL_ITEMS)
+        self._pending = set()
+        self._lock = threading.Lock()
+        # Disk index: file name -> size, least recently used first.
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        if directory:
+            try:
+                os.makedirs(directory, exist_ok=True)
+            except OSError:
+                self.directory = None
+        if self.directory:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.jpg'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+            for _, name, size in sorted(entries):
+                self._disk[name] = size
+                self._disk_bytes += size
+
+    def thumbnail(self, file_path):
+        key = self._key(file_path)
+        if key is None:
+            return None
+        image = self.memory.get(key)
+        if image is None:
+            self._schedule(file_path, key, PRIORITY_HIGH)
+            return None
+        return None if image.isNull() else image
+
+    def generate(self, file_path):
+        """Queue a thumbnail for a newly analysed file."""
+        key = self._key(file_path)
+        if key is not None and self.memory.get(key) is None:
+            self._schedule(file_path, key, PRIORITY_LOW)
+
+    def _key(self, file_path):
+        try:
+            return _image_key(file_path, QSize(self.edge, self.edge))
+        except OSError:
+            return None
+
+    def _schedule(self, file_path, key, priority):
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        try:
+            self.executor.submit(lambda cancel: self._load(file_path, key), priority)
+        except QueueFull:
+            # Asked for again the next time the item is painted.
+            with self._lock:
+                self._pending.discard(key)
+
+    def _load(self, file_path, key):
+        try:
+            image = self._read_or_create(file_path)
+        except OSError:
+            image = QImage()
+        self.memory.put(key, image)
+        with self._lock:
+            self._pending.discard(key)
+        self.thumbnail_ready.emit(file_path, image)
+
+    def _read_or_create(self, file_path):
+        path = None
+        if self.directory:
+            name = f'{self.digests.file_digest(file_path)}-{self.edge}.jpg'
+            path = os.path.join(self.directory, name)
+            image = QImage(path)
+            if not image.isNull():
+                self._touch(name)
+                return image
+        image = self._create(file_path)
+        if path and not image.isNull() and image.save(path + '.tmp', 'JPEG', THUMBNAIL_QUALITY):
+            os.replace(path + '.tmp', path)
+            self._stored(name, os.path.getsize(path))
+        return image
+
+    def _touch(self, name):
+        try:
+            os.utime(os.path.join(self.directory, name))
+        except OSError:
+            pass
+        with self._lock:
+            if name in self._disk:
+                self._disk.move_to_end(name)
+
+    def _stored(self, name, size):
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(name, 0)
+            self._disk[name] = size
+            evicted = []
+            while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+                oldest, oldest_size = self._disk.popitem(last=False)
+                self._disk_bytes -= oldest_size
+                evicted.append(oldest)
+        for oldest in evicted:
+            try:
+                os.remove(os.path.join(self.directory, oldest))
+            except OSError:
+                pass
+
+    def _create(self, file_path):
+        if file_path.lower().endswith(VIDEO_EXTENSIONS):
+            try:
+                return QImage.fromData(poster_frame(file_path, self.edge))
+            except VideoUnavailable:
+                return QImage()
+        return read_scaled_image(file_path, QSize(self.edge, self.edge))
@@ -0,0 +1,212 @@
+"""Live incident map: the folium page is loaded once and updated in place."""
+import json
+import os
+
+import folium
+from branca.element import MacroElement
+from folium.plugins import HeatMap
+from jinja2 import Template
+from PyQt6.QtCore import QEvent, QObject, QTimer, QUrl, pyqtSlot
+from PyQt6.QtWebChannel import QWebChannel
+
+from sef.heatmap import HeatGrid
+from sef.refresh import is_showing
+from sef.spatial import GridIndex
+
+MAP_FILE = 'incident_map.html'
+MAP_CENTER = [40.7128, -74.0060]
+MAP_ZOOM = 10
+FLUSH_INTERVAL = 200
+
+
+class _Bridge(MacroElement):
+    # Exposes window.sefMap.apply(delta) to the host and reports the
+    # viewport back over the web channel whenever the map settles.
+    _template = Template("""
+        {% macro header(this, kwargs) %}
+        <script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+        {% endmacro %}
+        {% macro script(this, kwargs) %}
+        (function (map, markers, heat) {
+            var byKey = {};
+            function text(value) {
+                var element = document.createElement('div');
+                element.textContent = value;
+                return element;
+            }
+            function marker(item) {
+                if (item.count > 1) {
+                    var icon = L.divIcon({
+                        className: '',
+                        iconSize: [36, 36],
+                        html: '<div style="width:36px;height:36px;line-height:36px;border-radius:18px;'
+                            + 'background:rgba(231,76,60,0.8);color:white;text-align:center;font-weight:bold">'
+                            + item.count + '</div>'
+                    });
+                    return L.marker([item.lat, item.lon], {icon: icon}).on('click', function () {
+                        map.setView(this.getLatLng(), map.getZoom() + 2);
+                    });
+                }
+                return L.marker([item.lat, item.lon]).bindPopup(text(item.description)).bindTooltip(text(item.type));
+            }
+            window.sefMap = {
+                apply: function (delta) {
+                    delta.remove.concat(delta.add.map(function (item) { return item.key; })).forEach(function (key) {
+                        if (byKey[key]) {
+                            markers.removeLayer(byKey[key]);
+                            delete byKey[key];
+                        }
+                    });
+                    delta.add.forEach(function (item) {
+                        byKey[item.key] = marker(item);
+                        markers.addLayer(byKey[item.key]);
+                    });
+                    if (delta.heat) {
+                        heat.setLatLngs(delta.heat);
+                    }
+                }
+            };
+            if (typeof qt !== 'undefined') {
+                new QWebChannel(qt.webChannelTransport, function (channel) {
+                    var bridge = channel.objects.sefBridge;
+                    function report() {
+                        var bounds = map.getBounds();
+                        bridge.viewport_changed(bounds.getSouth(), bounds.getWest(), bounds.getNorth(),
+                                                bounds.getEast(), map.getZoom());
+                    }
+                    map.on('moveend', report);
+                    report();
+                });
+            }
+        })({{ this._parent.get_name() }}, {{ this.markers.get_name() }}, {{ this.heat.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, markers, heat):
+        super().__init__()
+        self._name = 'SefBridge'
+        self.markers = markers
+        self.heat = heat
+
+
+def build_map_page(path=MAP_FILE, center=MAP_CENTER, zoom=MAP_ZOOM):
+    """Write the empty map page with its marker layer, heatmap and bridge."""
+    folium_map = folium.Map(location=center, zoom_start=zoom)
+    markers = folium.FeatureGroup(name='Incidents').add_to(folium_map)
+    # Bins arrive pre-weighted per zoom level; max_zoom=0 stops leaflet.heat
+    # from fading them further when zoomed out.
+    heat = HeatMap([], max_zoom=0).add_to(folium_map)
+    _Bridge(markers, heat).add_to(folium_map)
+    folium_map.save(path)
+    return path
+
+
+class IncidentMap(QObject):
+    """Keeps a ``QWebEngineView`` showing a set of incidents.
+
+    The page is built and loaded once.  Incidents live in a ``GridIndex``;
+    the page reports its viewport and zoom over a web channel and gets
+    back only the clusters in view (single incidents keep their popup)
+    and the ``HeatGrid`` bins covering it.
+    ``add`` and ``remove`` mark the view stale only when they fall inside
+    it, and changes are sent as one ``runJavaScript`` delta at most every
+    ``flush_interval`` ms, so a refresh costs in proportion to what
+    changed on screen and never reloads the page.  While the view is not
+    showing (another tab, minimized window) changes only accumulate and
+    go out when it is shown again.  Incidents are added and removed by
+    their id in ``incidents``, an ``IncidentStore``, which the popups
+    are read from.
+    """
+
+    def __init__(self, view, incidents, path=MAP_FILE, flush_interval=FLUSH_INTERVAL, parent=None):
+        super().__init__(parent)
+        self.view = view
+        self.incidents = incidents
+        self.index = GridIndex()
+        self.heat = HeatGrid()
+        self.viewport = None
+        self._shown = {}
+        self._stale = False
+        self._loaded = False
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_interval)
+        self._timer.timeout.connect(self.flush)
+        self._channel = QWebChannel(self)
+        self._channel.registerObject('sefBridge', self)
+        view.page().setWebChannel(self._channel)
+        view.loadFinished.connect(self._page_loaded)
+        view.installEventFilter(self)
+        view.setUrl(QUrl.fromLocalFile(os.path.abspath(build_map_page(path))))
+
+    def __len__(self):
+        return len(self.index)
+
+    def add(self, incident_id):
+        if incident_id in self.index:
+            return
+        lat, lon = self.incidents.get(incident_id)['location']
+        self.index.insert(incident_id, lat, lon)
+        self.heat.add(lat, lon)
+        self._stale = self._stale or self._in_view(lat, lon)
+        self._schedule()
+
+    def remove(self, incident_id):
+        if incident_id not in self.index:
+            return
+        lat, lon = self.incidents.get(incident_id)['location']
+        self.index.remove(incident_id)
+        self.heat.remove(lat, lon)
+        self._stale = self._stale or self._in_view(lat, lon)
+        self._schedule()
+
+    @pyqtSlot(float, float, float, float, int)
+    def viewport_changed(self, south, west, north, east, zoom):
+        self.viewport = (south, west, north, east, zoom)
+        self._stale = True
+        self.flush()
+
+    def flush(self):
+        self._timer.stop()
+        if not self._loaded or not self._stale or self.viewport is None or not is_showing(self.view):
+            return
+        self._stale = False
+        added, removed = self._diff(self.index.cluster(*self.viewport))
+        delta = {'add': added, 'remove': removed, 'heat': self.heat.points(*self.viewport)}
+        self.view.page().runJavaScript(f'window.sefMap && sefMap.apply({json.dumps(delta)});')
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Type.Show and self._stale:
+            self._schedule()
+        return False
+
+    def _diff(self, clusters):
+        shown = {}
+        added = []
+        for cluster in clusters:
+            if 'id' in cluster:
+                incident = self.incidents.get(cluster['id'])
+                cluster.update(type=incident['type'], description=incident['description'])
+            shown[cluster['key']] = cluster
+            if self._shown.get(cluster['key']) != cluster:
+                added.append(cluster)
+        removed = [key for key in self._shown if key not in shown]
+        self._shown = shown
+        return added, removed
+
+    def _in_view(self, lat, lon):
+        if self.viewport is None:
+            return False
+        south, west, north, east, _ = self.viewport
+        return south <= lat <= north and west <= lon <= east
+
+    def _schedule(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def _page_loaded(self, ok):
+        self._loaded = ok
+        if ok:
+            # A fresh page has nothing on it; the viewport report that
+            # follows brings everything in view.
+            self._shown = {}
@@ -0,0 +1,90 @@
+"""Columnar incident store with running per-day and per-type counts."""
+import threading
+from array import array
+from collections import Counter
+from datetime import date, datetime, time
+
+TREND_WINDOWS = (7, 30, 365)
+
+
+def _timestamp(when):
+    if when is None:
+        return datetime.now().timestamp()
+    if isinstance(when, datetime):
+        return when.timestamp()
+    if isinstance(when, date):
+        return datetime.combine(when, time()).timestamp()
+    return float(when)
+
+
+class IncidentStore:
+    """Incidents as parallel typed arrays: type code, lat, lon, timestamp.
+
+    Types are interned to small integer codes.  Counts per day, per type
+    and per (day, type) are kept up to date on every ``add``, so a trend
+    over the last ``days`` days costs ``days`` lookups however many
+    incidents there are.  Ids are row numbers starting at 1.
+    """
+
+    def __init__(self):
+        self.types = []
+        self._codes = {}
+        self.type_codes = array('H')
+        self.lats = array('d')
+        self.lons = array('d')
+        self.timestamps = array('d')
+        self.descriptions = []
+        self._daily = Counter()
+        self._daily_by_type = Counter()
+        self._by_type = Counter()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def add(self, incident_type, lat, lon, when=None, description=''):
+        """Record an incident and return its id; ``when`` is a date, datetime or epoch seconds."""
+        timestamp = _timestamp(when)
+        day = date.fromtimestamp(timestamp).toordinal()
+        with self._lock:
+            code = self._codes.get(incident_type)
+            if code is None:
+                code = self._codes[incident_type] = len(self.types)
+                self.types.append(incident_type)
+            self.type_codes.append(code)
+            self.lats.append(lat)
+            self.lons.append(lon)
+            self.timestamps.append(timestamp)
+            self.descriptions.append(description)
+            self._daily[day] += 1
+            self._daily_by_type[day, code] += 1
+            self._by_type[code] += 1
+            return len(self.timestamps)
+
+    def get(self, incident_id):
+        row = incident_id - 1
+        timestamp = self.timestamps[row]
+        return {
+            'id': incident_id,
+            'type': self.types[self.type_codes[row]],
+            'location': [self.lats[row], self.lons[row]],
+            'date': date.fromtimestamp(timestamp),
+            'timestamp': timestamp,
+            'description': self.descriptions[row],
+        }
+
+    def count(self, incident_type=None):
+        if incident_type is None:
+            return len(self)
+        code = self._codes.get(incident_type)
+        return 0 if code is None else self._by_type[code]
+
+    def daily_counts(self, days, incident_type=None, today=None):
+        """Incidents per day for the last ``days`` days, oldest first, ending ``today``."""
+        last = (today or date.today()).toordinal()
+        if incident_type is None:
+            return [self._daily[day] for day in range(last - days + 1, last + 1)]
+        code = self._codes.get(incident_type)
+        if code is None:
+            return [0] * days
+        return [self._daily_by_type[day, code] for day in range(last - days + 1, last + 1)]
@@ -0,0 +1,264 @@
+"""Cancellation tokens and coalescing of identical in-flight analyses."""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class Cancelled(Exception):
+    pass
+
+
+def cancelled_result():
+    return {"error": "Analysis cancelled.", "cancelled": True}
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_callback(self, callback):
+        """Run ``callback`` on cancellation (now, if already cancelled).
+
+        Returns a function that unregisters it again.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise Cancelled()
+
+
+def check_cancelled(cancel):
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+
+
+class _Job:
+    """One running analysis and the callers waiting on it."""
+
+    def __init__(self):
+        self.future = Future()
+        self.cancel = CancelToken()
+        self.subscribers = 0
+        self._progress = []
+        self._listeners = []
+        self._text = []
+        self._stages = None
+        self._lock = threading.Lock()
+
+    def join(self, progress, on_text):
+        # Late joiners catch up on the stage table and the text so far.
+        with self._lock:
+            self.subscribers += 1
+            if progress:
+                if self._stages is not None:
+                    progress.set_stages(self._stages)
+                self._progress.append(progress)
+            if on_text:
+                if self._text:
+                    on_text(''.join(self._text))
+                self._listeners.append(on_text)
+
+    def leave(self, progress, on_text):
+        with self._lock:
+            self.subscribers -= 1
+            if progress in self._progress:
+                self._progress.remove(progress)
+            if on_text in self._listeners:
+                self._listeners.remove(on_text)
+            return self.subscribers
+
+    def on_text(self, text):
+        with self._lock:
+            self._text.append(text)
+            for listener in self._listeners:
+                listener(text)
+
+    # The job itself is the progress object handed to the analysis and fans
+    # every call out to the subscribers' trackers.
+    def set_stages(self, stages):
+        with self._lock:
+            self._stages = stages
+            for progress in self._progress:
+                progress.set_stages(stages)
+
+    def stage(self, key):
+        with self._lock:
+            for progress in self._progress:
+                progress.stage(key)
+
+    def update(self, key, done, total):
+        with self._lock:
+            for progress in self._progress:
+                progress.update(key, done, total)
+
+    def finish(self):
+        with self._lock:
+            for progress in self._progress:
+                progress.finish()
+
+
+class InFlightRequests:
+    """Runs each distinct analysis once, however many callers ask for it.
+
+    Callers passing the same ``key`` while a job is running wait on that
+    job instead of starting another; each gets its own copy of the result.
+    The job streams if the caller that started it asked for text; callers
+    that did not are told the result was not streamed so they show it whole.
+    A caller that is cancelled stops waiting at once, and the job itself is
+    cancelled when its last caller has gone.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def hold(self, key):
+        """Keep a running ``key`` alive until the returned function is called.
+
+        A caller that will ``run`` the key later, on another thread, holds
+        it first so that the job is not aborted when its other callers are
+        cancelled in the meantime.  Holding a key that is not running does
+        nothing.
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return lambda: None
+            job.join(None, None)
+        released = threading.Event()
+
+        def release():
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+                if not job.leave(None, None) and self._jobs.get(key) is job:
+                    del self._jobs[key]
+                    job.cancel.cancel()
+
+        return release
+
+    def run(self, key, work, progress=None, on_text=None, cancel=None):
+        """Call ``work(progress, on_text, cancel)`` or join an identical call."""
+        with self._lock:
+            job = self._jobs.get(key)
+            leader = job is None
+            if leader:
+                job = self._jobs[key] = _Job()
+            job.join(progress, on_text)
+
+        done = threading.Event()
+        job.future.add_done_callback(lambda _: done.set())
+
+        def abandon():
+            with self._lock:
+                if not job.leave(progress, on_text) and self._jobs.get(key) is job:
+                    # Nobody is waiting any more: new callers start afresh.
+                    del self._jobs[key]
+                    job.cancel.cancel()
+            done.set()
+
+        remove = cancel.add_callback(abandon) if cancel is not None else (lambda: None)
+        try:
+            if leader:
+                self._execute(key, job, work, bool(on_text))
+            else:
+                done.wait()
+        finally:
+            remove()
+        if cancel is not None and cancel.cancelled:
+            return cancelled_result()
+        return _subscriber_result(job.future.result(), on_text)
+
+    def _execute(self, key, job, work, stream):
+        try:
+            result = work(job, job.on_text if stream else None, job.cancel)
+        except Cancelled:
+            result = cancelled_result()
+        except BaseException as e:
+            self._release(key, job)
+            job.future.set_exception(e)
+            raise
+        self._release(key, job)
+        job.future.set_result(result)
+
+    def _release(self, key, job):
+        with self._lock:
+            if self._jobs.get(key) is job:
+                del self._jobs[key]
+
+
+def _subscriber_result(result, on_text):
+    result = dict(result)
+    if on_text is None and result.get('streamed'):
+        result['streamed'] = False
+    return result
+
+
+class AsyncInFlightRequests:
+    """``InFlightRequests`` for coroutines running on one event loop.
+
+    ``work(progress, on_text)`` is awaited once per key; cancelling a
+    caller's task detaches it, and the work is cancelled with the last one.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+
+    def __len__(self):
+        return len(self._jobs)
+
+    async def run(self, key, work, progress=None, on_text=None):
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = _Job()
+            job.task = asyncio.ensure_future(self._execute(key, job, work, bool(on_text)))
+        job.join(progress, on_text)
+        try:
+            result = await asyncio.shield(job.task)
+        except asyncio.CancelledError:
+            if not job.leave(progress, on_text) and self._jobs.get(key) is job:
+                del self._jobs[key]
+                job.task.cancel()
+            raise
+        return _subscriber_result(result, on_text)
+
+    async def _execute(self, key, job, work, stream):
+        try:
+            return await work(job, job.on_text if stream else None)
+        finally:
+            if self._jobs.get(key) is job:
+                del self._jobs[key]
@@ -0,0 +1,183 @@
+"""Shared worker pool with a bounded priority queue for analysis jobs."""
+import heapq
+import itertools
+import threading
+from concurrent.futures import Future
+
+from sef.inflight import CancelToken
+
+MAX_WORKERS = 4
+QUEUE_LIMIT = 32
+# Idle workers exit after this long, so a quiet application holds no threads.
+IDLE_TIMEOUT = 30.0
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+_job_ids = itertools.count(1)
+
+
+class QueueFull(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, work, priority=PRIORITY_NORMAL):
+        self.id = next(_job_ids)
+        self.work = work
+        self.priority = priority
+        self.future = Future()
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        # A queued job is dropped; a running one is asked to stop.
+        self.future.cancel()
+        self.cancel_token.cancel()
+
+    def cancelled(self):
+        return self.cancel_token.cancelled
+
+    def done(self):
+        return self.future.done()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+    def add_done_callback(self, callback):
+        self.future.add_done_callback(lambda _: callback(self))
+
+
+class JobExecutor:
+    """Runs ``work(cancel_token)`` callables on a capped set of threads.
+
+    Jobs wait in a queue of at most ``queue_limit`` entries and are started
+    in priority order (lowest value first), first come first served within
+    a priority.  Work ``admit``-ted to run elsewhere counts against the same
+    limit.  Threads are started on demand up to ``max_workers`` and reused
+    until they have been idle for ``idle_timeout`` seconds.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, queue_limit=QUEUE_LIMIT, idle_timeout=IDLE_TIMEOUT,
+                 name='sef-job'):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.idle_timeout = idle_timeout
+        self.name = name
+        self._queue = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self._workers = 0
+        self._idle = 0
+        self._running = 0
+        self._admitted = 0
+        self._shutdown = False
+
+    def submit(self, work, priority=PRIORITY_NORMAL):
+        job = Job(work, priority)
+        with self._cond:
+            self._reserve()
+            heapq.heappush(self._queue, (priority, next(self._order), job))
+            if len(self._queue) > self._idle and self._workers < self.max_workers:
+                self._workers += 1
+                threading.Thread(target=self._worker, name=f'{self.name}-{self._workers}', daemon=True).start()
+            else:
+                self._cond.notify()
+        return job
+
+    def admit(self):
+        """Hold a queue slot for work that runs outside the pool.
+
+        Analyses on the network loop take no worker, but they are admitted
+        under the same ``queue_limit`` so a busy application turns them away
+        with ``QueueFull`` too.  Returns a function that frees the slot.
+        """
+        with self._cond:
+            self._reserve()
+            self._admitted += 1
+        released = []
+
+        def release():
+            with self._cond:
+                if not released:
+                    released.append(True)
+                    self._admitted -= 1
+
+        return release
+
+    def _reserve(self):
+        if self._shutdown:
+            raise RuntimeError("Executor has been shut down")
+        if len(self._queue) + self._admitted >= self.queue_limit:
+            self._drop_cancelled()
+        if len(self._queue) + self._admitted >= self.queue_limit:
+            raise QueueFull(f"{len(self._queue) + self._admitted} analyses are already waiting or running elsewhere")
+
+    def _drop_cancelled(self):
+        self._queue = [entry for entry in self._queue if not entry[2].future.cancelled()]
+        heapq.heapify(self._queue)
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._shutdown:
+                    self._idle += 1
+                    woken = self._cond.wait(self.idle_timeout)
+                    self._idle -= 1
+                    if not woken and not self._queue:
+                        break
+                if not self._queue:
+                    self._workers -= 1
+                    return
+                _, _, job = heapq.heappop(self._queue)
+                self._running += 1
+            try:
+                if job.future.set_running_or_notify_cancel():
+                    try:
+                        job.future.set_result(job.work(job.cancel_token))
+                    except BaseException as e:
+                        job.future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._running -= 1
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self._workers,
+                "running": self._running,
+                "queued": sum(1 for entry in self._queue if not entry[2].future.cancelled()),
+                "admitted": self._admitted,
+                "max_workers": self.max_workers,
+                "queue_limit": self.queue_limit,
+            }
+
+    def shutdown(self, cancel_pending=True):
+        with self._cond:
+            self._shutdown = True
+            if cancel_pending:
+                for _, _, job in self._queue:
+                    job.cancel()
+                self._queue = []
+            self._cond.notify_all()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
+
+
+def configure_executor(**options):
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_pending=False)
+        _executor = JobExecutor(**options)
+        return _executor
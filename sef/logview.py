@@ -0,0 +1,131 @@
+"""Bounded analysis log view backed by a per-session log file."""
+import os
+import tempfile
+import time
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtGui import QTextCursor
+from PyQt6.QtWidgets import QPlainTextEdit
+
+LOG_DIR = os.path.join(os.path.expanduser('~'), '.local', 'share', 'sef', 'logs')
+LOG_BLOCKS = 5000
+FLUSH_INTERVAL = 50
+LOG_MAX_BYTES = 8 * 1024 * 1024
+LOG_MAX_AGE = 14 * 86400
+
+
+class SessionLog:
+    """Append-only log of one session under ``directory``.
+
+    Past ``max_bytes`` the file is rolled over to ``<name>.1`` (replacing
+    the previous one), so a session keeps at most twice that on disk.
+    Session logs older than ``max_age`` seconds are deleted on open.
+    """
+
+    def __init__(self, directory=LOG_DIR, max_bytes=LOG_MAX_BYTES, max_age=LOG_MAX_AGE):
+        self.max_bytes = max_bytes
+        self.path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._prune(directory, max_age)
+            name = time.strftime('analysis-%Y%m%d-%H%M%S') + f'-{os.getpid()}.log'
+            self.path = os.path.join(directory, name)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        except OSError:
+            # Nowhere to keep it: an anonymous file still spares the widget.
+            self.path = None
+            self._file = tempfile.TemporaryFile('w', encoding='utf-8')
+
+    def write(self, text):
+        self._file.write(text)
+        if self._file.tell() > self.max_bytes:
+            self._rotate()
+
+    def close(self):
+        self._file.close()
+
+    def _rotate(self):
+        if self.path is None:
+            self._file.seek(0)
+            self._file.truncate()
+            return
+        self._file.close()
+        try:
+            os.replace(self.path, self.path + '.1')
+            self._file = open(self.path, 'a', encoding='utf-8')
+        except OSError:
+            self.path = None
+            self._file = tempfile.TemporaryFile('w', encoding='utf-8')
+
+    @staticmethod
+    def _prune(directory, max_age):
+        cutoff = time.time() - max_age
+        for entry in os.scandir(directory):
+            try:
+                if entry.name.startswith('analysis-') and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+
+class AnalysisLog(QPlainTextEdit):
+    """Read-only log that shows the last ``max_blocks`` lines.
+
+    ``append`` adds a line and ``insert_text`` continues the last one (for
+    streamed answers).  Text is buffered and added at most every
+    ``flush_interval`` ms in one edit, and Qt drops the oldest blocks past
+    the cap, so an append costs the same after a day as after a minute.
+    Everything is also written to a ``SessionLog``, so trimmed lines
+    are kept on disk rather than lost.
+    """
+
+    def __init__(self, parent=None, max_blocks=LOG_BLOCKS, flush_interval=FLUSH_INTERVAL, session_log=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_blocks)
+        self.session_log = session_log or SessionLog()
+        self._pending = []
+        self._empty = True
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(flush_interval)
+        self._timer.timeout.connect(self.flush)
+
+    def append(self, text):
+        self._add(text if self._empty else '\n' + text)
+
+    def insert_text(self, text):
+        self._add(text)
+
+    def setText(self, text):
+        # Replaces what is shown; the session log keeps what came before.
+        self.flush()
+        self.session_log.write(text if self._empty else '\n' + text)
+        self.setPlainText(text)
+        self._empty = False
+
+    def flush(self):
+        self._timer.stop()
+        if not self._pending:
+            return
+        text = ''.join(self._pending)
+        self._pending.clear()
+        self.session_log.write(text)
+        scroll_bar = self.verticalScrollBar()
+        at_bottom = scroll_bar.value() == scroll_bar.maximum()
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        if at_bottom:
+            scroll_bar.setValue(scroll_bar.maximum())
+
+    def toPlainText(self):
+        """What is shown, including text still waiting to be flushed."""
+        self.flush()
+        return super().toPlainText()
+
+    def _add(self, text):
+        self._pending.append(text)
+        self._empty = False
+        if not self._timer.isActive():
+            self._timer.start()
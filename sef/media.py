@@ -0,0 +1,204 @@
+"""Media type detection and client-side image preprocessing."""
+import io
+import os
+import struct
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are sent as-is.
+    Image = None
+
+MAX_EDGE = 1600
+IMAGE_QUALITY = 85
+IMAGE_FORMAT = 'JPEG'
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov')
+
+IMAGE_MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp', 'PNG': 'image/png'}
+ORIENTATION_TAG = 0x0112
+
+# Segments and chunks that carry metadata rather than pixels: JPEG APP1
+# (EXIF, XMP), APP13 (IPTC) and comments; PNG text, EXIF and time chunks;
+# WebP EXIF and XMP chunks.
+JPEG_METADATA_MARKERS = frozenset({0xE1, 0xED, 0xFE})
+PNG_METADATA_CHUNKS = frozenset({b'eXIf', b'tEXt', b'zTXt', b'iTXt', b'tIME'})
+WEBP_METADATA_CHUNKS = frozenset({b'EXIF', b'XMP '})
+WEBP_METADATA_FLAGS = 0x08 | 0x04
+
+
+def sniff_mime(data, default='application/octet-stream'):
+    head = bytes(data[:16])
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head.startswith(b'RIFF') and head[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    if head.startswith(b'BM'):
+        return 'image/bmp'
+    if head[4:8] == b'ftyp':
+        return 'video/quicktime' if head[8:10] == b'qt' else 'video/mp4'
+    if head[4:8] in (b'moov', b'mdat', b'wide', b'free'):
+        return 'video/quicktime'
+    return default
+
+
+def sniff_file_mime(file_path, default='application/octet-stream'):
+    with open(file_path, 'rb') as media_file:
+        mime_type = sniff_mime(media_file.read(16), default)
+    if mime_type == default and file_path.lower().endswith(VIDEO_EXTENSIONS):
+        return 'video/mp4'
+    return mime_type
+
+
+def is_image(mime_type):
+    return mime_type.startswith('image/')
+
+
+def is_video(mime_type):
+    return mime_type.startswith('video/')
+
+
+def strip_metadata(data, mime_type):
+    """``data`` with its metadata removed and the image data untouched.
+
+    Returns ``None`` for formats it does not handle or data it cannot parse.
+    """
+    try:
+        if mime_type == 'image/jpeg':
+            return _strip_jpeg(data)
+        if mime_type == 'image/png':
+            return _strip_png(data)
+        if mime_type == 'image/webp':
+            return _strip_webp(data)
+    except (IndexError, struct.error, ValueError):
+        return None
+    return None
+
+
+def _strip_jpeg(data):
+    if data[:2] != b'\xff\xd8':
+        raise ValueError("not a JPEG")
+    kept = [data[:2]]
+    offset = 2
+    while True:
+        if data[offset] != 0xFF:
+            raise ValueError("bad JPEG marker")
+        marker = data[offset + 1]
+        if marker == 0xFF:
+            offset += 1
+            continue
+        if marker == 0xDA:
+            # Start of scan: the entropy-coded image data runs to the end.
+            kept.append(data[offset:])
+            return b''.join(kept)
+        length, = struct.unpack('>H', data[offset + 2:offset + 4])
+        if marker not in JPEG_METADATA_MARKERS:
+            kept.append(data[offset:offset + 2 + length])
+        offset += 2 + length
+
+
+def _strip_png(data):
+    if data[:8] != b'\x89PNG\r\n\x1a\n':
+        raise ValueError("not a PNG")
+    kept = [data[:8]]
+    offset = 8
+    while offset < len(data):
+        length, = struct.unpack('>I', data[offset:offset + 4])
+        end = offset + 12 + length
+        if end > len(data):
+            raise ValueError("truncated PNG chunk")
+        if data[offset + 4:offset + 8] not in PNG_METADATA_CHUNKS:
+            kept.append(data[offset:end])
+        offset = end
+    return b''.join(kept)
+
+
+def _strip_webp(data):
+    if data[:4] != b'RIFF' or data[8:12] != b'WEBP':
+        raise ValueError("not a WebP")
+    kept = []
+    offset = 12
+    while offset < len(data):
+        length, = struct.unpack('<I', data[offset + 4:offset + 8])
+        end = offset + 8 + length + (length & 1)
+        chunk = bytearray(data[offset:end])
+        if bytes(chunk[:4]) == b'VP8X':
+            chunk[8] &= ~WEBP_METADATA_FLAGS & 0xFF
+        if bytes(chunk[:4]) not in WEBP_METADATA_CHUNKS:
+            kept.append(bytes(chunk))
+        offset = end
+    body = b'WEBP' + b''.join(kept)
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def preprocess_image(source, max_edge=MAX_EDGE, quality=IMAGE_QUALITY, image_format=IMAGE_FORMAT):
+    """Downscale and re-encode an image, dropping its metadata.
+
+    ``source`` is a file path or bytes.  Returns ``(data, mime_type, info)``
+    where ``info`` reports the original and uploaded sizes.  Images already
+    within ``max_edge`` whose re-encoding would not be smaller are sent as
+    the original bytes with only their metadata stripped (``strip_metadata``).
+    Images that Pillow cannot decode are passed through unchanged (``data``
+    is then the original ``source``) with their sniffed MIME type.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        mime_type = sniff_file_mime(source, default='image/jpeg')
+        original_bytes = os.path.getsize(source)
+        image_input = source
+    else:
+        mime_type = sniff_mime(source, default='image/jpeg')
+        original_bytes = len(source)
+        image_input = io.BytesIO(source)
+    info = {"original_bytes": original_bytes, "bytes": original_bytes, "saved_bytes": 0, "mime_type": mime_type}
+    if Image is None or not is_image(mime_type):
+        return source, mime_type, info
+
+    try:
+        with Image.open(image_input) as image:
+            original_size = image.size
+            upright = image.getexif().get(ORIENTATION_TAG, 1) == 1
+            # JPEGs can be decoded straight at (close to) the target size.
+            image.draft('RGB', (max_edge, max_edge))
+            # Bake the EXIF orientation into the pixels before the metadata
+            # that carries it is dropped.
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                if image.mode in ('RGBA', 'LA', 'P'):
+                    image = image.convert('RGBA')
+                    background = Image.new('RGB', image.size, (255, 255, 255))
+                    background.paste(image, mask=image.getchannel('A'))
+                    image = background
+                else:
+                    image = image.convert('RGB')
+            output = io.BytesIO()
+            image.save(output, format=image_format, quality=quality, optimize=True)
+            size = image.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return source, mime_type, info
+
+    processed = output.getvalue()
+    if upright and max(original_size) <= max_edge and len(processed) >= original_bytes:
+        # Re-encoding an image that needed no downscaling only made it
+        # bigger: send the original pixels without their metadata instead.
+        stripped = strip_metadata(_read_bytes(source), mime_type)
+        if stripped is not None and len(stripped) < len(processed):
+            info.update({"bytes": len(stripped), "saved_bytes": original_bytes - len(stripped),
+                         "size": original_size})
+            return stripped, mime_type, info
+    mime_type = IMAGE_MIME_TYPES.get(image_format, mime_type)
+    info.update({"bytes": len(processed), "saved_bytes": max(0, original_bytes - len(processed)),
+                 "mime_type": mime_type, "size": size})
+    return processed, mime_type, info
+
+
+def _read_bytes(source):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as media_file:
+            return media_file.read()
+    return bytes(source)
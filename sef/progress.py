@@ -0,0 +1,89 @@
+"""Stage- and byte-driven progress reporting for analysis requests."""
+
+# (key, label, weight) - weights are relative shares of the progress bar.
+MEDIA_STAGES = (
+    ('read', 'Reading file', 5),
+    ('preprocess', 'Optimizing image', 10),
+    ('encode', 'Encoding', 5),
+    ('upload', 'Uploading', 45),
+    ('wait', 'Waiting for server', 15),
+    ('download', 'Downloading response', 15),
+    ('parse', 'Parsing response', 5),
+)
+
+VIDEO_STAGES = (
+    ('hash', 'Fingerprinting video', 5),
+    ('decode', 'Extracting keyframes', 35),
+    ('encode', 'Encoding', 5),
+    ('upload', 'Uploading', 20),
+    ('wait', 'Waiting for server', 15),
+    ('download', 'Downloading response', 15),
+    ('parse', 'Parsing response', 5),
+)
+
+LONG_VIDEO_STAGES = (
+    ('hash', 'Fingerprinting video', 5),
+    ('segments', 'Analyzing segments', 70),
+    ('upload', 'Summarizing', 5),
+    ('wait', 'Waiting for summary', 10),
+    ('download', 'Downloading summary', 8),
+    ('parse', 'Parsing response', 2),
+)
+
+SCENARIO_STAGES = (
+    ('encode', 'Preparing request', 5),
+    ('upload', 'Uploading', 10),
+    ('wait', 'Waiting for server', 50),
+    ('download', 'Downloading response', 30),
+    ('parse', 'Parsing response', 5),
+)
+
+
+class ProgressTracker:
+    def __init__(self, on_progress=None, on_stage=None, stages=MEDIA_STAGES):
+        self.on_progress = on_progress
+        self.on_stage = on_stage
+        self.current = None
+        self.percent = 0
+        self.set_stages(stages)
+
+    def set_stages(self, stages):
+        # Pipelines that branch (e.g. image vs video) switch stage tables
+        # before reporting any progress.
+        self._spans = {}
+        self._labels = {}
+        total = sum(weight for _, _, weight in stages)
+        start = 0.0
+        for key, label, weight in stages:
+            span = 100.0 * weight / total
+            self._spans[key] = (start, span)
+            self._labels[key] = label
+            start += span
+
+    def stage(self, key):
+        if key == self.current or key not in self._spans:
+            return
+        self.current = key
+        if self.on_stage:
+            self.on_stage(self._labels[key])
+        self._emit(self._spans[key][0])
+
+    def update(self, key, done, total):
+        self.stage(key)
+        if key not in self._spans:
+            return
+        start, span = self._spans[key]
+        fraction = min(done / total, 1.0) if total else 1.0
+        self._emit(start + span * fraction)
+
+    def finish(self):
+        self._emit(100)
+
+    def _emit(self, value):
+        # Only report whole-percent increases so byte-level callbacks do not
+        # flood the receiving (UI) thread.
+        value = int(value)
+        if value > self.percent:
+            self.percent = value
+            if self.on_progress:
+                self.on_progress(value)
@@ -0,0 +1,219 @@
+"""Qt bridges that run the analysis engine off the GUI thread."""
+import itertools
+
+from PyQt6.QtCore import QCoreApplication, QObject, pyqtSignal
+
+from sef.batch import BATCH_WORKERS
+from sef.inflight import CancelToken, cancelled_result
+from sef.jobs import PRIORITY_HIGH, get_executor
+from sef.progress import MEDIA_STAGES, SCENARIO_STAGES, ProgressTracker
+
+_request_ids = itertools.count(1)
+
+
+class AnalysisJobBase(QObject):
+    """An analysis run off the GUI thread and reported via signals.
+
+    The work runs on a pool worker or the network loop, so every signal
+    reaches its slots queued.  Every result dict gets ``request_id`` so a
+    window can drop results of analyses it has since superseded, and the
+    ``file_path`` analysed (``None`` if there was no file).  Once the job
+    is cancelled its progress and partial text are no longer emitted, but
+    ``analysis_complete`` still is, with the cancelled result, so slots
+    that clean up always run; only a pooled job cancelled while still
+    queued never runs and just deletes itself.  Connect the signals before
+    ``start()``: the job deletes itself once it has reported.  It is
+    parented to the application rather than a window so a closing window
+    cannot delete it under a running worker.
+    """
+    progress_update = pyqtSignal(int)
+    stage_update = pyqtSignal(str)
+    partial_result = pyqtSignal(str)
+    analysis_complete = pyqtSignal(dict)
+
+    stages = MEDIA_STAGES
+    file_path = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent or QCoreApplication.instance())
+        self.request_id = next(_request_ids)
+        self.cancel_token = CancelToken()
+        self.job = None
+
+    def start(self):
+        # Qt drops queued calls from a deleted sender, so the deletion is
+        # connected last and runs after every other slot has had the result.
+        self.analysis_complete.connect(self.deleteLater)
+        self.job = self.submit()
+        return self.job
+
+    def submit(self):
+        raise NotImplementedError
+
+    def cancel(self):
+        self.cancel_token.cancel()
+        if self.job is not None:
+            self.job.cancel()
+
+    def progress_tracker(self):
+        return ProgressTracker(self._unless_cancelled(self.progress_update.emit),
+                               self._unless_cancelled(self.stage_update.emit), self.stages)
+
+    def text_listener(self, stream):
+        return self._unless_cancelled(self.partial_result.emit) if stream else None
+
+    def complete(self, analysis_result):
+        analysis_result['request_id'] = self.request_id
+        analysis_result['file_path'] = self.file_path
+        self.analysis_complete.emit(analysis_result)
+        return analysis_result
+
+    def _unless_cancelled(self, emit):
+        def guarded(value):
+            if not self.cancel_token.cancelled:
+                emit(value)
+        return guarded
+
+
+class PooledAnalysisJob(AnalysisJobBase):
+    """Runs ``perform_analysis`` on the shared job executor."""
+
+    def __init__(self, priority=PRIORITY_HIGH, executor=None, parent=None):
+        super().__init__(parent)
+        self.priority = priority
+        self.executor = executor or get_executor()
+
+    def submit(self):
+        """Queue the analysis; raises ``QueueFull`` when the queue is at its limit."""
+        job = self.executor.submit(self.run, self.priority)
+        # A job cancelled before it started never reports, so clean up here.
+        job.add_done_callback(lambda job: job.future.cancelled() and self.deleteLater())
+        return job
+
+    def run(self, cancel):
+        try:
+            analysis_result = self.perform_analysis(self.progress_tracker(), cancel)
+        except Exception as e:
+            analysis_result = {"error": str(e)}
+        return self.complete(analysis_result)
+
+    def perform_analysis(self, progress, cancel):
+        raise NotImplementedError
+
+
+class NetworkAnalysisJob(AnalysisJobBase):
+    """Runs on the asyncio network loop; ``perform_analysis`` returns its future.
+
+    It takes no worker, but holds one of the shared executor's queue slots
+    while it runs, so it is admitted under the same limit as pooled jobs.
+    """
+
+    def __init__(self, executor=None, parent=None):
+        super().__init__(parent)
+        self.executor = executor or get_executor()
+
+    def submit(self):
+        """Start the analysis; raises ``QueueFull`` when the queue is at its limit."""
+        release = self.executor.admit()
+        try:
+            future = self.perform_analysis(self.progress_tracker())
+        except BaseException:
+            release()
+            raise
+        future.add_done_callback(lambda _: release())
+        future.add_done_callback(self._finished)
+        return future
+
+    def perform_analysis(self, progress):
+        raise NotImplementedError
+
+    def _finished(self, future):
+        if future.cancelled():
+            analysis_result = cancelled_result()
+        elif future.exception() is not None:
+            analysis_result = {"error": str(future.exception())}
+        else:
+            analysis_result = future.result()
+        self.complete(analysis_result)
+
+
+class AnalysisJob(PooledAnalysisJob):
+    def __init__(self, engine, file_path, stream=False, segment_long_videos=False, **kwargs):
+        super().__init__(**kwargs)
+        self.engine = engine
+        self.file_path = file_path
+        self.stream = stream
+        self.segment_long_videos = segment_long_videos
+
+    def submit(self):
+        # Runs on the caller's thread before it cancels the job this one
+        # replaces: if that job is analysing the same file, it must not be
+        # aborted before this one joins it on a worker.
+        release = self.engine.hold_media(self.file_path, segment_long_videos=self.segment_long_videos)
+        try:
+            job = super().submit()
+        except BaseException:
+            release()
+            raise
+        job.add_done_callback(lambda _: release())
+        return job
+
+    def perform_analysis(self, progress, cancel):
+        # Segment findings are always shown as they arrive, so segmented
+        # analyses stream even when result streaming is switched off.
+        on_text = self.text_listener(self.stream or self.segment_long_videos)
+        return self.engine.analyze_media(self.file_path, progress, on_text, cancel,
+                                         segment_long_videos=self.segment_long_videos)
+
+
+class ScenarioAnalysisJob(NetworkAnalysisJob):
+    stages = SCENARIO_STAGES
+
+    def __init__(self, engine, scenario, description, stream=False, **kwargs):
+        super().__init__(**kwargs)
+        self.engine = engine
+        self.scenario = scenario
+        self.description = description
+        self.stream = stream
+
+    def perform_analysis(self, progress):
+        return self.engine.submit_scenario(self.scenario, self.description, progress,
+                                           self.text_listener(self.stream), self.cancel_token)
+
+
+class BatchAnalysisJob(QObject):
+    """A folder analysis multiplexed over the network loop.
+
+    ``concurrency`` files are in flight at once without a thread apiece;
+    ``cancel()`` aborts the outstanding requests and reports what finished.
+    """
+    item_complete = pyqtSignal(str, dict, dict)
+    batch_complete = pyqtSignal(dict)
+
+    def __init__(self, engine, files, concurrency=BATCH_WORKERS, parent=None):
+        super().__init__(parent or QCoreApplication.instance())
+        self.engine = engine
+        self.files = files
+        self.concurrency = concurrency
+        self.stats = {}
+        self.future = None
+
+    def start(self):
+        self.batch_complete.connect(self.deleteLater)
+        self.future = self.engine.submit_batch(self.files, self.concurrency, self._item_complete)
+        self.future.add_done_callback(self._finished)
+        return self.future
+
+    def cancel(self):
+        if self.future is not None:
+            self.future.cancel()
+
+    def _item_complete(self, file_path, analysis_result, stats):
+        self.stats = stats
+        self.item_complete.emit(file_path, analysis_result, stats)
+
+    def _finished(self, future):
+        if future.cancelled() or future.exception() is not None:
+            self.batch_complete.emit(self.stats)
+        else:
+            self.batch_complete.emit(future.result())
@@ -0,0 +1,52 @@
+"""Dashboard refresh: repaint what changed, once per frame, only when seen."""
+from PyQt6.QtCore import QEvent, QObject, QTimer
+
+FRAME_INTERVAL = 16
+
+
+def is_showing(widget):
+    """True if ``widget`` is on screen: shown, on the current tab, window not minimized."""
+    return widget.isVisible() and not widget.window().isMinimized()
+
+
+class RefreshScheduler(QObject):
+    """Runs view refreshes only for views that are dirty and showing.
+
+    Each view is registered under a name with the widget it draws into
+    and a callback that redraws it.  ``mark_dirty`` only records the
+    name; one frame later every dirty view that is showing is redrawn
+    once, however many changes arrived in between.  Views on hidden tabs
+    or in a minimized window stay dirty and are redrawn when they are
+    shown again, so nothing runs while nothing is seen.
+    """
+
+    def __init__(self, frame_interval=FRAME_INTERVAL, parent=None):
+        super().__init__(parent)
+        self._views = {}
+        self._dirty = set()
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(frame_interval)
+        self._timer.timeout.connect(self.flush)
+
+    def register(self, name, widget, refresh):
+        self._views[name] = (widget, refresh)
+        widget.installEventFilter(self)
+        self.mark_dirty(name)
+
+    def mark_dirty(self, *names):
+        self._dirty.update(names)
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        self._timer.stop()
+        for name in [name for name in self._dirty if is_showing(self._views[name][0])]:
+            self._dirty.discard(name)
+            self._views[name][1]()
+
+    def eventFilter(self, watched, event):
+        # Showing covers tab switches and restoring a minimized window.
+        if event.type() == QEvent.Type.Show and self._dirty and not self._timer.isActive():
+            self._timer.start()
+        return False
@@ -0,0 +1,171 @@
+"""Quota-aware request scheduling: rate limits, retries and backoff."""
+import asyncio
+import email.utils
+import random
+import threading
+import time
+
+REQUESTS_PER_MINUTE = 60
+TOKENS_PER_MINUTE = 1000000
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Gemini bills every inline image at a fixed token count; text is roughly
+# four characters per token.  Estimates are corrected from usageMetadata.
+IMAGE_TOKENS = 258
+RESPONSE_TOKENS = 800
+
+
+class TokenBucket:
+    def __init__(self, per_minute, capacity=None, clock=time.monotonic):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.clock = clock
+        self.balance = float(self.capacity)
+        self.updated = clock()
+
+    def reserve(self, amount):
+        # The balance may go negative: callers are admitted in order and each
+        # waits until the debt ahead of it has been paid off.
+        now = self.clock()
+        self.balance = min(self.capacity, self.balance + (now - self.updated) * self.rate)
+        self.updated = now
+        self.balance -= min(amount, self.capacity)
+        return max(0.0, -self.balance / self.rate)
+
+    def credit(self, amount):
+        self.balance = min(self.capacity, self.balance + amount)
+
+
+class RequestScheduler:
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.requests = TokenBucket(requests_per_minute, clock=clock)
+        self.tokens = TokenBucket(tokens_per_minute, clock=clock)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.clock = clock
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self.queue_depth = 0
+        self.admitted = 0
+        self.retries = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self, tokens):
+        """Reserve budget for one request and return how long to wait first."""
+        with self._lock:
+            delay = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+            self.admitted += 1
+            self.total_wait += delay
+            self.max_wait = max(self.max_wait, delay)
+            return delay
+
+    def acquire(self, tokens, cancel=None):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            with self._lock:
+                self.queue_depth += 1
+            try:
+                self._pause(delay, cancel)
+            finally:
+                with self._lock:
+                    self.queue_depth -= 1
+        return delay
+
+    async def acquire_async(self, tokens):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            with self._lock:
+                self.queue_depth += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                with self._lock:
+                    self.queue_depth -= 1
+        return delay
+
+    def settle(self, estimated, actual):
+        # Return over-estimated tokens to the budget (or charge the shortfall).
+        if actual is None:
+            return
+        with self._lock:
+            self.tokens.credit(estimated - actual)
+
+    def should_retry(self, status_code, attempt):
+        return status_code in RETRY_STATUSES and attempt < self.max_retries
+
+    def retry_delay(self, attempt, retry_after=None):
+        with self._lock:
+            self.retries += 1
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            # "Full jitter" exponential backoff.
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return min(delay, self.backoff_max)
+
+    def backoff(self, attempt, retry_after=None, cancel=None):
+        delay = self.retry_delay(attempt, retry_after)
+        self._pause(delay, cancel)
+        return delay
+
+    def _pause(self, delay, cancel):
+        # A cancelled request stops waiting for its turn straight away.
+        if cancel is None:
+            self.sleep(delay)
+        else:
+            cancel.wait(delay)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "admitted": self.admitted,
+                "retries": self.retries,
+                "total_wait": self.total_wait,
+                "average_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+                "max_wait": self.max_wait,
+            }
+
+
+def parse_retry_after(value):
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def format_scheduler_stats(stats):
+    return (f"queue {stats['queue_depth']} | avg wait {stats['average_wait']:.2f} s | "
+            f"max wait {stats['max_wait']:.2f} s | retries {stats['retries']}")
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
+
+
+def configure_scheduler(**options):
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = RequestScheduler(**options)
+        return _scheduler
@@ -0,0 +1,143 @@
+"""Uniform-grid spatial index over incident coordinates, with clustering."""
+import math
+
+CELL_SIZE = 0.01  # degrees, about 1 km
+CLUSTER_PIXELS = 60
+TILE_SIZE = 256
+EARTH_RADIUS = 6371000.0
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def cluster_size(zoom, pixels=CLUSTER_PIXELS):
+    """Degrees of longitude covered by ``pixels`` at web-map ``zoom``."""
+    return pixels * 360.0 / (TILE_SIZE * 2 ** zoom)
+
+
+class GridIndex:
+    """Points bucketed into ``cell_size``-degree cells.
+
+    Lookups touch only the cells overlapping the query, and every cell
+    keeps its point count and coordinate sums so coarse clustering can
+    work from cells instead of points.
+    """
+
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = cell_size
+        self._points = {}
+        self._cells = {}
+        self._sums = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, item_id):
+        return item_id in self._points
+
+    def insert(self, item_id, lat, lon):
+        if item_id in self._points:
+            self.remove(item_id)
+        key = self._cell(lat, lon)
+        self._points[item_id] = (lat, lon)
+        self._cells.setdefault(key, {})[item_id] = (lat, lon)
+        sums = self._sums.setdefault(key, [0, 0.0, 0.0])
+        sums[0] += 1
+        sums[1] += lat
+        sums[2] += lon
+
+    def remove(self, item_id):
+        lat, lon = self._points.pop(item_id)
+        key = self._cell(lat, lon)
+        members = self._cells[key]
+        del members[item_id]
+        if members:
+            sums = self._sums[key]
+            sums[0] -= 1
+            sums[1] -= lat
+            sums[2] -= lon
+        else:
+            del self._cells[key]
+            del self._sums[key]
+
+    def bbox(self, south, west, north, east):
+        """``(id, lat, lon)`` of every point inside the box."""
+        for _, members in self._overlapping(south, west, north, east):
+            for item_id, (lat, lon) in members.items():
+                if south <= lat <= north and west <= lon <= east:
+                    yield item_id, lat, lon
+
+    def radius(self, lat, lon, meters):
+        """``(id, lat, lon, distance)`` of every point within ``meters``, nearest first."""
+        dlat = math.degrees(meters / EARTH_RADIUS)
+        dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+        found = []
+        for item_id, point_lat, point_lon in self.bbox(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+            distance = haversine(lat, lon, point_lat, point_lon)
+            if distance <= meters:
+                found.append((item_id, point_lat, point_lon, distance))
+        return sorted(found, key=lambda point: point[3])
+
+    def cluster(self, south, west, north, east, zoom, pixels=CLUSTER_PIXELS):
+        """Group the points in view into clusters about ``pixels`` apart.
+
+        Returns dicts with ``key``, ``lat``, ``lon`` (the members' mean),
+        ``count`` and, for single points, ``id``.  Once clusters span
+        several cells, whole cells are merged using their stored sums, so
+        the cost follows the number of occupied cells rather than points;
+        cells straddling the edge of the view then count in full.
+        """
+        size = cluster_size(zoom, pixels)
+        buckets = {}
+
+        def add(lat, lon, count, sum_lat, sum_lon, item_id):
+            bucket_key = (math.floor(lat / size), math.floor(lon / size))
+            bucket = buckets.get(bucket_key)
+            if bucket is None:
+                buckets[bucket_key] = [count, sum_lat, sum_lon, item_id]
+            else:
+                bucket[0] += count
+                bucket[1] += sum_lat
+                bucket[2] += sum_lon
+
+        if size >= 2 * self.cell_size:
+            for key, members in self._overlapping(south, west, north, east):
+                count, sum_lat, sum_lon = self._sums[key]
+                add(sum_lat / count, sum_lon / count, count, sum_lat, sum_lon,
+                    next(iter(members)) if count == 1 else None)
+        else:
+            for item_id, lat, lon in self.bbox(south, west, north, east):
+                add(lat, lon, 1, lat, lon, item_id)
+
+        clusters = []
+        for (row, col), (count, sum_lat, sum_lon, item_id) in buckets.items():
+            cluster = {'lat': sum_lat / count, 'lon': sum_lon / count, 'count': count}
+            if count == 1:
+                cluster.update(key=f'i{item_id}', id=item_id)
+            else:
+                cluster['key'] = f'c{zoom}:{row}:{col}'
+            clusters.append(cluster)
+        return clusters
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def _overlapping(self, south, west, north, east):
+        (first_row, first_col), (last_row, last_col) = self._cell(south, west), self._cell(north, east)
+        if (last_row - first_row + 1) * (last_col - first_col + 1) > len(self._cells):
+            # A wide view: scanning the occupied cells is cheaper.
+            for (row, col), members in self._cells.items():
+                if first_row <= row <= last_row and first_col <= col <= last_col:
+                    yield (row, col), members
+            return
+        for row in range(first_row, last_row + 1):
+            for col in range(first_col, last_col + 1):
+                members = self._cells.get((row, col))
+                if members:
+                    yield (row, col), members
@@ -0,0 +1,115 @@
+"""Persistent analysis history in SQLite with a full-text index."""
+import os
+import sqlite3
+import threading
+import time
+
+HISTORY_DB = os.path.join(os.path.expanduser('~'), '.local', 'share', 'sef', 'history.db')
+
+# The text lives in its own table so that counting and paging through
+# analyses only touches the narrow rows.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    file_path TEXT
+);
+CREATE TABLE IF NOT EXISTS insights (
+    id INTEGER PRIMARY KEY REFERENCES analyses (id),
+    text TEXT NOT NULL
+);
+"""
+
+# External-content FTS5 index over insights, kept in sync by triggers.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS insights_fts USING fts5(text, content='insights', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS insights_ai AFTER INSERT ON insights BEGIN
+    INSERT INTO insights_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS insights_ad AFTER DELETE ON insights BEGIN
+    INSERT INTO insights_fts (insights_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def fts_query(text):
+    # Every word must match, as a prefix; quoting keeps FTS syntax inert.
+    return ' '.join('"{}"*'.format(word.replace('"', '""')) for word in text.split())
+
+
+class HistoryStore:
+    """Past analyses, newest last, in a WAL-mode SQLite database.
+
+    Rows are read a page at a time by position (``page``) and searched by
+    word prefix through an FTS5 index over the insights.  SQLite builds
+    without FTS5 fall back to a substring scan.  ``path=':memory:'`` keeps
+    the history for the session only.
+    """
+
+    def __init__(self, path=HISTORY_DB):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.executescript(FTS_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+        self._db.commit()
+
+    def add(self, file_path, insights, created=None):
+        with self._lock, self._db:
+            analysis_id = self._db.execute('INSERT INTO analyses (created, file_path) VALUES (?, ?)',
+                                           (created or time.time(), file_path)).lastrowid
+            self._db.execute('INSERT INTO insights (id, text) VALUES (?, ?)', (analysis_id, insights))
+            return analysis_id
+
+    def count(self, search=None):
+        where, params = self._where(search)
+        with self._lock:
+            return self._db.execute(f'SELECT count(*) FROM analyses {where}', params).fetchone()[0]
+
+    def page(self, offset, limit, search=None):
+        """``(id, created, file_path)`` for rows ``offset`` to ``offset + limit``."""
+        where, params = self._where(search)
+        with self._lock:
+            return self._db.execute(f'SELECT id, created, file_path FROM analyses {where} '
+                                    'ORDER BY id LIMIT ? OFFSET ?', params + (limit, offset)).fetchall()
+
+    def insights(self, analysis_id):
+        with self._lock:
+            row = self._db.execute('SELECT text FROM insights WHERE id = ?', (analysis_id,)).fetchone()
+        return row[0] if row else None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _where(self, search):
+        if not search or not search.split():
+            return '', ()
+        if self.full_text:
+            return 'WHERE id IN (SELECT rowid FROM insights_fts WHERE insights_fts MATCH ?)', (fts_query(search),)
+        return "WHERE id IN (SELECT id FROM insights WHERE text LIKE ? ESCAPE '\\')", ('%{}%'.format(
+            search.strip().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')),)
+
+
+_history_store = None
+_history_store_lock = threading.Lock()
+
+
+def get_history_store():
+    global _history_store
+    with _history_store_lock:
+        if _history_store is None:
+            try:
+                _history_store = HistoryStore()
+            except (OSError, sqlite3.Error):
+                # No writable data directory: keep history for this session.
+                _history_store = HistoryStore(':memory:')
+        return _history_store
@@ -0,0 +1,143 @@
+"""Rolling time series kept at several resolutions, and LTTB downsampling."""
+import time
+
+import numpy as np
+
+# (interval in seconds, intervals kept): a week of seconds, a month of
+# minutes, a year of hours and ten years of days.
+RESOLUTIONS = ((1, 7 * 86400), (60, 30 * 1440), (3600, 366 * 24), (86400, 3660))
+CHART_POINTS = 300
+
+
+def lttb(xs, ys, threshold=CHART_POINTS):
+    """Largest-Triangle-Three-Buckets: ``threshold`` points that keep the shape.
+
+    The first and last points are kept; every bucket in between contributes
+    the point forming the largest triangle with the previous pick and the
+    mean of the next bucket, so peaks and dips survive the reduction.
+    """
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    length = len(xs)
+    if threshold >= length or threshold < 3:
+        return xs, ys
+    edges = np.linspace(1, length - 1, threshold - 1).astype(int)
+    # Bucket means do not depend on the picks, so they are computed in one
+    # pass; the last point stands in for the bucket after the last.
+    sizes = np.diff(np.append(edges, length))
+    mean_xs = np.add.reduceat(xs, edges) / sizes
+    mean_ys = np.add.reduceat(ys, edges) / sizes
+    picked = np.empty(threshold, dtype=int)
+    picked[0], picked[-1] = 0, length - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        mean_x, mean_y = mean_xs[bucket + 1], mean_ys[bucket + 1]
+        px, py = xs[previous], ys[previous]
+        areas = np.abs((px - mean_x) * (ys[start:end] - py) - (px - xs[start:end]) * (mean_y - py))
+        previous = picked[bucket + 1] = start + int(areas.argmax())
+    return xs[picked], ys[picked]
+
+
+class _Ring:
+    # Per-interval sums (and sample counts) for the last ``capacity``
+    # intervals of ``step`` seconds, indexed by interval number modulo
+    # the capacity.
+
+    def __init__(self, step, capacity, counted):
+        self.step = step
+        self.capacity = capacity
+        self.sums = np.zeros(capacity)
+        self.counts = np.zeros(capacity, dtype=np.int32) if counted else None
+        self.last = None
+
+    def add(self, timestamp, value):
+        interval = int(timestamp // self.step)
+        if self.last is None:
+            self.last = interval
+        elif interval > self.last:
+            self._clear(self.last + 1, interval)
+            self.last = interval
+        elif interval <= self.last - self.capacity:
+            return
+        slot = interval % self.capacity
+        self.sums[slot] += value
+        if self.counts is not None:
+            self.counts[slot] += 1
+
+    def window(self, first, last):
+        sums = np.zeros(last - first + 1)
+        counts = np.zeros(last - first + 1, dtype=np.int32)
+        if self.last is not None:
+            low, high = max(first, self.last - self.capacity + 1), min(last, self.last)
+            # The held intervals are contiguous, so at most two slices of
+            # the ring (either side of the wrap) cover them.
+            while low <= high:
+                slot = low % self.capacity
+                size = min(high - low + 1, self.capacity - slot)
+                sums[low - first:low - first + size] = self.sums[slot:slot + size]
+                if self.counts is not None:
+                    counts[low - first:low - first + size] = self.counts[slot:slot + size]
+                low += size
+        return sums, counts
+
+    def _clear(self, first, last):
+        if last - first + 1 >= self.capacity:
+            slots = slice(None)
+        else:
+            slots = np.arange(first, last + 1) % self.capacity
+        self.sums[slots] = 0
+        if self.counts is not None:
+            self.counts[slots] = 0
+
+
+class RollingSeries:
+    """A value recorded over time, held at second, minute, hour and day resolution.
+
+    Every ``record`` lands in one slot of each fixed-size ring, so memory
+    is bounded and recording costs the same forever.  A ``'gauge'`` (such
+    as the threat level) reads back as the mean of each interval and
+    leaves out intervals with no samples; a ``'counter'`` (such as
+    incidents) reads back as the total per interval.  ``window`` answers
+    from the finest resolution that still covers the span.
+    """
+
+    def __init__(self, kind='gauge', resolutions=RESOLUTIONS):
+        if kind not in ('gauge', 'counter'):
+            raise ValueError(f"Unknown series kind: {kind}")
+        self.kind = kind
+        self._rings = [_Ring(step, capacity, kind == 'gauge') for step, capacity in sorted(resolutions)]
+
+    def record(self, value=1, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        for ring in self._rings:
+            ring.add(timestamp, value)
+
+    def window(self, seconds, now=None, max_points=None):
+        """``(timestamps, values)`` arrays for the last ``seconds``, oldest first.
+
+        Timestamps are interval starts in epoch seconds.  With
+        ``max_points`` a gauge is reduced with ``lttb``; a counter is summed
+        into at most that many equal buckets instead, so it still reads as
+        a rate and nothing is dropped.
+        """
+        now = time.time() if now is None else now
+        ring = next((ring for ring in self._rings if ring.step * ring.capacity >= seconds), self._rings[-1])
+        last = int(now // ring.step)
+        first = max(last - int(np.ceil(seconds / ring.step)) + 1, last - ring.capacity + 1)
+        sums, counts = ring.window(first, last)
+        if self.kind == 'counter':
+            size = 1
+            if max_points and len(sums) > max_points:
+                size = -(-len(sums) // max_points)
+                # Padding goes at the old end so the last bucket ends now.
+                padding = -len(sums) % size
+                sums = np.concatenate([np.zeros(padding), sums]).reshape(-1, size).sum(axis=1)
+                first -= padding
+            return (np.arange(len(sums)) * size + first) * float(ring.step), sums
+        sampled = np.flatnonzero(counts)
+        timestamps = (sampled + first) * float(ring.step)
+        sums = sums[sampled] / counts[sampled]
+        if max_points:
+            return lttb(timestamps, sums, max_points)
+        return timestamps, sums
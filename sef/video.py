@@ -0,0 +1,125 @@
+"""Keyframe sampling for video analysis."""
+import heapq
+
+try:
+    import cv2
+except ImportError:  # OpenCV is optional; video analysis reports an error without it.
+    cv2 = None
+
+from sef.inflight import check_cancelled
+
+FRAME_BUDGET = 12
+SAMPLE_FPS = 2.0
+FRAME_EDGE = 768
+FRAME_QUALITY = 70
+# Scene-change scores are computed on tiny grayscale thumbnails.
+SCORE_SIZE = (64, 36)
+# Posters skip the first second, which is often black or a fade-in.
+POSTER_AT = 1.0
+
+
+class VideoUnavailable(Exception):
+    pass
+
+
+def format_timestamp(seconds):
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def video_duration(file_path):
+    capture = _open(file_path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        return capture.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    finally:
+        capture.release()
+
+
+def sample_keyframes(file_path, frame_budget=FRAME_BUDGET, sample_fps=SAMPLE_FPS, start=0.0, end=None,
+                     frame_edge=FRAME_EDGE, quality=FRAME_QUALITY, progress=None, cancel=None):
+    """Pick up to ``frame_budget`` representative frames from a video.
+
+    Frames are sampled at ``sample_fps`` and scored by how much they differ
+    from the previous sample, so scene changes win over static footage.
+    Returns a time-ordered list of ``(timestamp_seconds, jpeg_bytes)``.
+    """
+    capture = _open(file_path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        first = int(start * fps)
+        last = min(frame_count, int(end * fps)) if end is not None else frame_count
+        step = max(1, round(fps / sample_fps))
+        if first:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, first)
+
+        # Min-heap of (score, frame_index, frame) holding the best candidates.
+        best = []
+        previous = None
+        index = first
+        while index < last or last <= 0:
+            if not capture.grab():
+                break
+            if (index - first) % step == 0:
+                check_cancelled(cancel)
+                ok, frame = capture.retrieve()
+                if not ok:
+                    break
+                small = cv2.cvtColor(cv2.resize(frame, SCORE_SIZE, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+                # The first frame always makes the cut so static clips still
+                # produce something to analyze.
+                score = float('inf') if previous is None else float(cv2.absdiff(small, previous).mean())
+                previous = small
+                candidate = (score, index, _shrink(frame, frame_edge))
+                if len(best) < frame_budget:
+                    heapq.heappush(best, candidate)
+                elif score > best[0][0]:
+                    heapq.heapreplace(best, candidate)
+                if progress and last > first:
+                    progress.update('decode', index - first, last - first)
+            index += 1
+    finally:
+        capture.release()
+
+    keyframes = []
+    for _, frame_index, frame in sorted(best, key=lambda item: item[1]):
+        ok, encoded = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            keyframes.append((frame_index / fps, encoded.tobytes()))
+    return keyframes
+
+
+def poster_frame(file_path, frame_edge=FRAME_EDGE, quality=FRAME_QUALITY, at=POSTER_AT):
+    """JPEG bytes of the frame ``at`` seconds in (or the first, for short clips)."""
+    capture = _open(file_path)
+    try:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        if capture.get(cv2.CAP_PROP_FRAME_COUNT) > at * fps:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(at * fps))
+        ok, frame = capture.read()
+    finally:
+        capture.release()
+    if not ok:
+        raise VideoUnavailable(f"Could not decode video: {file_path}")
+    ok, encoded = cv2.imencode('.jpg', _shrink(frame, frame_edge), [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes()
+
+
+def _open(file_path):
+    if cv2 is None:
+        raise VideoUnavailable("Video analysis requires OpenCV (pip install opencv-python).")
+    capture = cv2.VideoCapture(file_path)
+    if not capture.isOpened():
+        capture.release()
+        raise VideoUnavailable(f"Could not decode video: {file_path}")
+    return capture
+
+
+def _shrink(frame, frame_edge):
+    height, width = frame.shape[:2]
+    scale = frame_edge / max(height, width)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,8 @@
+import pytest
+
+
+@pytest.fixture(scope='session')
+def qt_app():
+    QtCore = pytest.importorskip('PyQt6.QtCore')
+    # Jobs are parented to the application, so it outlives every test.
+    yield QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
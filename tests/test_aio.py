@@ -0,0 +1,55 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sef import aio
+
+
+def serve(peers):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_HEAD(self):
+            peers.append((self.client_address, self.path))
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.mark.skipif(aio.aiohttp is None, reason="aiohttp is not installed")
+def test_prewarm_opens_connections_to_the_configured_host():
+    peers = []
+    server = serve(peers)
+    client = aio.AsyncGeminiClient()
+
+    async def main():
+        try:
+            await client.prewarm(f'http://127.0.0.1:{server.server_port}/v1beta/models/m:generateContent', 4)
+        finally:
+            await client.close()
+
+    asyncio.run(main())
+    server.shutdown()
+    assert len({address for address, _ in peers}) == 4
+    assert {path for _, path in peers} == {'/'}
+    assert client.stats()['connections_opened'] == 4
+
+
+def test_without_aiohttp_stats_come_from_the_blocking_client(monkeypatch):
+    class BlockingClient:
+        def stats(self):
+            return {"requests": 5, "reused_connections": 4, "new_connections": 1, "average_latency": 0.2}
+
+    monkeypatch.setattr(aio, 'aiohttp', None)
+    monkeypatch.setattr(aio, 'get_client', BlockingClient)
+    stats = aio.AsyncGeminiClient().stats()
+    assert (stats['requests'], stats['reused_connections'], stats['connections_opened']) == (5, 4, 1)
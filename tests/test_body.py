@@ -0,0 +1,91 @@
+import base64
+import json
+
+import pytest
+
+from sef.body import ENCODE_CHUNK, JsonBody, media_placeholder
+from sef.inflight import Cancelled, CancelToken
+from sef.scheduler import IMAGE_TOKENS, RESPONSE_TOKENS
+
+
+def payload_with(placeholders):
+    return {"contents": [{"parts": [{"text": "Describe"}] + [
+        {"inline_data": {"mime_type": "image/jpeg", "data": placeholder}} for placeholder in placeholders]}]}
+
+
+def read_all(body, size):
+    chunks = []
+    while True:
+        chunk = body.read(size)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+class Progress:
+    def __init__(self):
+        self.updates = []
+        self.stages = []
+
+    def update(self, key, done, total):
+        self.updates.append((key, done, total))
+
+    def stage(self, key):
+        self.stages.append(key)
+
+
+@pytest.mark.parametrize('size', [1, 1000, ENCODE_CHUNK + 1, -1])
+def test_streamed_body_is_the_json_with_media_inlined(tmp_path, size):
+    image = bytes(range(256)) * (ENCODE_CHUNK // 100)
+    video = b'\x00\xff' * 1001
+    video_path = tmp_path / 'clip.mp4'
+    video_path.write_bytes(video)
+    body = JsonBody(payload_with([media_placeholder(0), media_placeholder(1)]),
+                    {media_placeholder(1): str(video_path), media_placeholder(0): image})
+
+    data = read_all(body, size)
+    expected = json.dumps(payload_with([base64.b64encode(image).decode(), base64.b64encode(video).decode()]))
+    assert data == expected.encode()
+    assert len(body) == len(data)
+
+
+def test_empty_media_file(tmp_path):
+    empty = tmp_path / 'empty.jpg'
+    empty.write_bytes(b'')
+    body = JsonBody(payload_with([media_placeholder(0)]), {media_placeholder(0): str(empty)})
+    assert read_all(body, 100) == json.dumps(payload_with([''])).encode()
+
+
+def test_rewinding_replays_the_body():
+    body = JsonBody(payload_with([media_placeholder(0)]), {media_placeholder(0): b'abc' * 5000})
+    first = body.read()
+    assert body.read() == b''
+    body.seek(0)
+    assert body.tell() == 0
+    assert body.read() == first
+    with pytest.raises(OSError):
+        body.seek(10)
+
+
+def test_reads_report_upload_progress():
+    progress = Progress()
+    body = JsonBody({"text": "x" * 100}, progress=progress)
+    read_all(body, 40)
+    assert [done for _, done, _ in progress.updates] == [40, 80, len(body)]
+    assert progress.stages == ['wait']
+
+
+def test_cancelled_body_stops_reading():
+    body = JsonBody({"text": "x" * 100})
+    body.cancel = CancelToken()
+    body.read(10)
+    body.cancel.cancel()
+    with pytest.raises(Cancelled):
+        body.read(10)
+
+
+def test_estimated_tokens_charge_media_flat():
+    payload = payload_with([media_placeholder(0)])
+    body = JsonBody(payload, {media_placeholder(0): b'x' * 10 ** 6})
+    envelope = len(json.dumps(payload)) - len(media_placeholder(0))
+    assert body.estimated_tokens() == envelope // 4 + IMAGE_TOKENS + RESPONSE_TOKENS
@@ -0,0 +1,95 @@
+import os
+
+from sef.cache import ResultCache, TTLCache, model_from_url
+
+
+def result(name):
+    return {"content": "x" * 100, "name": name}
+
+
+def entry_size(cache, key):
+    return os.path.getsize(os.path.join(cache.directory, f'{key}.json'))
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    probe = ResultCache(str(tmp_path / 'probe'))
+    probe.put('probe', result('p'))
+    size = entry_size(probe, 'probe')
+    cache = ResultCache(str(tmp_path / 'results'), memory_items=1, max_disk_bytes=3 * size)
+    for key in 'abc':
+        cache.put(key, result(key))
+    # Reading 'a' back from disk makes it the most recently used.
+    assert cache.get('a') == result('a')
+    cache.put('d', result('d'))
+    assert sorted(name[:-5] for name in os.listdir(cache.directory)) == ['a', 'c', 'd']
+    assert cache.stats()['disk_bytes'] == 3 * size
+
+
+def test_disk_tier_survives_a_restart_in_lru_order(tmp_path):
+    directory = str(tmp_path / 'results')
+    cache = ResultCache(directory, memory_items=1)
+    size = None
+    for number, key in enumerate('abc'):
+        cache.put(key, result(key))
+        path = os.path.join(directory, f'{key}.json')
+        os.utime(path, (1000 + number, 1000 + number))
+        size = os.path.getsize(path)
+    restarted = ResultCache(directory, memory_items=1, max_disk_bytes=2 * size)
+    assert restarted.stats()['disk_items'] == 3
+    assert restarted.get('a') == result('a')
+    assert restarted.stats()['disk_hits'] == 1
+    restarted.put('d', result('d'))
+    # 'b' was the oldest on disk and 'c' next; 'a' was just read.
+    assert sorted(name[:-5] for name in os.listdir(directory)) == ['a', 'd']
+
+
+def test_memory_tier_and_hit_rate():
+    cache = ResultCache(directory=None, memory_items=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.stats()['hit_rate'] == 0.75
+
+
+def test_corrupt_entries_are_forgotten(tmp_path):
+    cache = ResultCache(str(tmp_path), memory_items=1)
+    cache.put('a', result('a'))
+    cache.put('b', result('b'))
+    with open(tmp_path / 'a.json', 'w') as cache_file:
+        cache_file.write('{')
+    assert cache.get('a') is None
+    assert not (tmp_path / 'a.json').exists()
+    assert cache.stats()['disk_items'] == 1
+
+
+def test_keys_depend_on_every_part():
+    key = ResultCache.make_key('digest', 'prompt', 'model')
+    assert len({key, ResultCache.make_key('digest', 'prompt', 'model', 'segments'),
+                ResultCache.make_key('digest', 'other', 'model'), ResultCache.make_key('other', 'prompt', 'model')}) == 4
+    assert model_from_url('https://host/v1beta/models/gemini-1.5-flash-latest:generateContent') == \
+        'gemini-1.5-flash-latest'
+
+
+def test_file_digest_is_reused_until_the_file_changes(tmp_path):
+    cache = ResultCache(directory=None)
+    path = tmp_path / 'image.jpg'
+    path.write_bytes(b'one')
+    digest = cache.file_digest(str(path))
+    assert cache.known_digest(str(path)) == digest
+    path.write_bytes(b'two!')
+    assert cache.known_digest(str(path)) is None
+    assert cache.file_digest(str(path)) != digest
+
+
+def test_ttl_cache_expires_entries():
+    now = [0.0]
+    cache = TTLCache(ttl=10, clock=lambda: now[0])
+    cache.put('scenario', {"content": "x"})
+    now[0] = 9.9
+    assert cache.get('scenario') == {"content": "x"}
+    now[0] = 10.0
+    assert cache.get('scenario') is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "expired": 1, "items": 0}
@@ -0,0 +1,41 @@
+import json
+from concurrent.futures import Future
+
+from sef import cli
+
+
+class StubEngine:
+    def __init__(self, api_url, api_key, cache=None):
+        pass
+
+    def prewarm(self, connections=1, blocking_client=True):
+        pass
+
+    def submit_batch(self, files, concurrency, on_result, **options):
+        stats = {"done": len(files), "total": len(files), "failed": 0, "elapsed": 0.1, "items_per_second": 1.0,
+                 "p50": 0.1, "p95": 0.1}
+        for file_path in files:
+            on_result(file_path, {"content": "ok"}, stats)
+        future = Future()
+        future.set_result(stats)
+        return future
+
+
+def run(tmp_path, monkeypatch, *extra):
+    monkeypatch.setattr(cli, 'AnalysisEngine', StubEngine)
+    monkeypatch.setattr(cli, 'format_stats', lambda stats: '')
+    image = tmp_path / 'image.jpg'
+    image.write_bytes(b'\xff\xd8\xff')
+    out = tmp_path / 'results.jsonl'
+    assert cli.main(['analyze', str(image), '--api-key', 'key', '--no-disk-cache', '--out', str(out), *extra]) == 0
+    return [json.loads(line) for line in out.read_text().splitlines()]
+
+
+def test_rerun_replaces_the_results(tmp_path, monkeypatch):
+    run(tmp_path, monkeypatch)
+    assert len(run(tmp_path, monkeypatch)) == 1
+
+
+def test_append_keeps_earlier_results(tmp_path, monkeypatch):
+    run(tmp_path, monkeypatch)
+    assert len(run(tmp_path, monkeypatch, '--append')) == 2
@@ -0,0 +1,83 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sef import client
+from sef.client import PLACEHOLDER_API_KEY, SSEParser, candidate_texts, has_api_key
+from sef.scheduler import RequestScheduler
+
+
+def test_placeholder_and_empty_keys_are_not_keys():
+    assert not has_api_key('')
+    assert not has_api_key(PLACEHOLDER_API_KEY)
+    assert has_api_key('AIza-real-key')
+
+
+def parse(chunks):
+    parser = SSEParser()
+    events = []
+    for chunk in chunks:
+        events.extend(parser.feed(chunk))
+    return events + list(parser.close())
+
+
+def test_sse_events_split_across_chunks():
+    stream = b'data: {"n": 1}\r\n\r\ndata: {"n": 2}\n\n: keep-alive\n\ndata: {"n": 3}\n\n'
+    expected = [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert parse([stream]) == expected
+    assert parse([stream[i:i + 1] for i in range(len(stream))]) == expected
+
+
+def test_sse_multiline_data_and_unterminated_last_event():
+    assert parse([b'event: message\ndata: {"text":\ndata: "hi"}\n\n', b'data: {"n": 4}']) == [
+        {"text": "hi"}, {"n": 4}]
+
+
+def test_candidate_texts_reads_the_first_candidate():
+    event = {"candidates": [{"content": {"parts": [{"text": "a"}, {"inline_data": {}}, {"text": "b"}]}},
+                            {"content": {"parts": [{"text": "other"}]}}]}
+    assert list(candidate_texts(event)) == ["a", "b"]
+    assert list(candidate_texts({"usageMetadata": {}})) == []
+
+
+def test_prewarm_opens_the_connections_at_once():
+    peers = set()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_HEAD(self):
+            peers.add(self.client_address)
+            self.send_response(200)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def do_POST(self):
+            peers.add(self.client_address)
+            self.rfile.read(int(self.headers['Content-Length']))
+            body = b'{"candidates": [{"content": {"parts": [{"text": "ok"}]}}]}'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f'http://127.0.0.1:{server.server_port}'
+    gemini = client.GeminiClient(scheduler=RequestScheduler(requests_per_minute=100000))
+    gemini.prewarm(f'{host}/v1beta/models/m:generateContent', connections=4, block=True)
+    assert len(peers) == 4
+    # The warmed connections went back to the pool.
+    gemini.post(f'{host}/generate', 'key', {"contents": []}).close()
+    assert len(peers) == 4
+    gemini.close()
+    server.shutdown()
+
+
+def test_prewarm_with_no_connections_does_nothing():
+    gemini = client.GeminiClient(scheduler=RequestScheduler(requests_per_minute=100000))
+    assert gemini.prewarm('http://127.0.0.1:9/', connections=0) == []
+    assert gemini.prewarm('http://127.0.0.1:9/', connections=0, block=True) is None
+    gemini.close()
@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from sef.heatmap import HeatGrid
+
+
+@pytest.fixture
+def coords():
+    rng = random.Random(5)
+    return ([40.7 + rng.gauss(0, 0.2) for _ in range(500)],
+            [-74.0 + rng.gauss(0, 0.2) for _ in range(500)])
+
+
+def test_bulk_add_matches_scalar_adds(coords):
+    lats, lons = coords
+    bulk, scalar = HeatGrid(), HeatGrid()
+    bulk.add(np.array(lats), np.array(lons))
+    for lat, lon in zip(lats, lons):
+        scalar.add(lat, lon)
+    assert bulk._bins == scalar._bins
+    assert sum(bulk._bins[6].values()) == len(lats)
+
+
+def test_remove_undoes_add_in_any_form(coords):
+    lats, lons = coords
+    grid = HeatGrid()
+    grid.add(lats, lons)
+    for lat, lon in zip(lats[:100], lons[:100]):
+        grid.remove(lat, lon)
+    grid.remove(lats[100:], lons[100:])
+    assert grid._bins == {zoom: {} for zoom in grid.levels}
+    assert grid.points(-90, -180, 90, 180, 10) == []
+
+
+def test_points_are_bin_centres_weighted_to_the_densest(coords):
+    lats, lons = coords
+    grid = HeatGrid()
+    grid.add(lats, lons)
+    points = grid.points(40.0, -74.5, 41.5, -73.5, 10)
+    weights = [weight for _, _, weight in points]
+    assert max(weights) == 1.0 and all(0 < weight <= 1 for weight in weights)
+    size = grid.sizes[10]
+    for lat, lon, _ in points:
+        assert 40.0 - size <= lat <= 41.5 + size and -74.5 - size <= lon <= -73.5 + size
+    assert len(points) == sum(1 for row, col in grid._bins[10]
+                              if np.floor(40.0 / size) <= row <= np.floor(41.5 / size)
+                              and np.floor(-74.5 / size) <= col <= np.floor(-73.5 / size))
+
+
+def test_level_is_the_nearest_zoom():
+    grid = HeatGrid()
+    assert [grid.level(zoom) for zoom in (1, 7, 9, 12, 18)] == [6, 6, 8, 12, 16]
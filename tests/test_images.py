@@ -0,0 +1,54 @@
+import os
+import random
+
+import pytest
+
+
+class StubDigests:
+    def file_digest(self, file_path):
+        return os.path.basename(file_path).split('.')[0]
+
+
+class NoExecutor:
+    def submit(self, job, priority):
+        raise AssertionError('not used')
+
+
+@pytest.fixture
+def images(qt_app, tmp_path):
+    from PyQt6.QtGui import QColor, QImage
+
+    rng = random.Random(2)
+    paths = {}
+    for name in 'abc':
+        image = QImage(200, 200, QImage.Format.Format_RGB32)
+        image.fill(QColor(255, 255, 255))
+        for _ in range(400):
+            image.setPixelColor(rng.randrange(200), rng.randrange(200), QColor(*rng.choices(range(256), k=3)))
+        paths[name] = str(tmp_path / f'{name}.png')
+        image.save(paths[name])
+    return paths
+
+
+def thumbnails(directory, max_disk_bytes):
+    from sef.images import ThumbnailCache
+
+    return ThumbnailCache(str(directory), digests=StubDigests(), executor=NoExecutor(), max_disk_bytes=max_disk_bytes)
+
+
+def test_thumbnail_directory_is_kept_under_its_cap(images, tmp_path):
+    directory = tmp_path / 'thumbnails'
+    cache = thumbnails(directory, 10 ** 9)
+    for name in 'ab':
+        assert not cache._read_or_create(images[name]).isNull()
+    # Room for two thumbnails but not three.
+    cache.max_disk_bytes = cache._disk_bytes * 3 // 2
+    # Reading a makes b the least recently used.
+    assert not cache._read_or_create(images['a']).isNull()
+    assert not cache._read_or_create(images['c']).isNull()
+    assert sorted(os.listdir(directory)) == ['a-128.jpg', 'c-128.jpg']
+    assert cache._disk_bytes == sum(os.path.getsize(directory / name) for name in os.listdir(directory))
+
+    reopened = thumbnails(directory, cache.max_disk_bytes)
+    assert sorted(reopened._disk) == ['a-128.jpg', 'c-128.jpg']
+    assert reopened._disk_bytes == cache._disk_bytes
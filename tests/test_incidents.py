@@ -0,0 +1,40 @@
+import random
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from sef.incidents import IncidentStore
+
+TODAY = date(2024, 3, 10)
+
+
+def test_daily_counts_match_a_recount():
+    rng = random.Random(9)
+    store = IncidentStore()
+    added = []
+    for _ in range(300):
+        day = TODAY - timedelta(days=rng.randrange(40))
+        kind = rng.choice(['Theft', 'Assault', 'Fraud'])
+        when = rng.choice([day, datetime.combine(day, datetime.min.time()) + timedelta(hours=13),
+                           datetime(day.year, day.month, day.day, 23, 59).timestamp()])
+        store.add(kind, 40.7, -74.0, when)
+        added.append((day, kind))
+
+    days = [TODAY - timedelta(days=offset) for offset in range(29, -1, -1)]
+    per_day = Counter(day for day, _ in added)
+    assert store.daily_counts(30, today=TODAY) == [per_day[day] for day in days]
+    per_theft = Counter(day for day, kind in added if kind == 'Theft')
+    assert store.daily_counts(30, 'Theft', today=TODAY) == [per_theft[day] for day in days]
+    assert store.daily_counts(5, 'Arson', today=TODAY) == [0] * 5
+    assert store.daily_counts(3, today=TODAY + timedelta(days=10)) == [0, 0, 0]
+
+
+def test_ids_rows_and_type_counts():
+    store = IncidentStore()
+    first = store.add('Theft', 40.7, -74.0, TODAY, 'bike')
+    second = store.add('Fraud', 40.8, -73.9, TODAY)
+    third = store.add('Theft', 40.9, -73.8, TODAY)
+    assert (first, second, third) == (1, 2, 3) and len(store) == 3
+    assert store.get(1) == {'id': 1, 'type': 'Theft', 'location': [40.7, -74.0], 'date': TODAY,
+                            'timestamp': datetime(2024, 3, 10).timestamp(), 'description': 'bike'}
+    assert store.count() == 3 and store.count('Theft') == 2 and store.count('Arson') == 0
+    assert store.types == ['Theft', 'Fraud']
@@ -0,0 +1,255 @@
+import asyncio
+import threading
+
+import pytest
+
+from sef import analysis
+from sef.engine import AnalysisEngine
+from sef.inflight import AsyncInFlightRequests, CancelToken, InFlightRequests
+from sef.jobs import JobExecutor
+
+
+def wait_for(condition, timeout=5.0):
+    done = threading.Event()
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        done.wait(0.01)
+    raise AssertionError("condition not met in time")
+
+
+class BlockingWork:
+    """Stands in for an analysis: counts calls and blocks until released."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, progress, on_text, cancel):
+        self.calls += 1
+        while not self.release.wait(0.01):
+            if cancel.cancelled:
+                return {"error": "aborted"}
+        return {"content": "done"}
+
+
+def run_in_thread(requests, key, work, cancel=None):
+    results = []
+    thread = threading.Thread(target=lambda: results.append(requests.run(key, work, cancel=cancel)))
+    thread.start()
+    return thread, results
+
+
+def test_identical_calls_share_one_run():
+    requests = InFlightRequests()
+    work = BlockingWork()
+    first, first_results = run_in_thread(requests, 'key', work)
+    wait_for(lambda: work.calls == 1)
+    second, second_results = run_in_thread(requests, 'key', work)
+    wait_for(lambda: requests._jobs['key'].subscribers == 2)
+    work.release.set()
+    first.join(5)
+    second.join(5)
+    assert work.calls == 1
+    assert first_results == second_results == [{"content": "done"}]
+    assert len(requests) == 0
+
+
+def test_late_joiners_catch_up_on_streamed_text():
+    requests = InFlightRequests()
+    started = threading.Event()
+    finish = threading.Event()
+
+    def work(progress, on_text, cancel):
+        on_text('Smoke ')
+        started.set()
+        finish.wait(5)
+        on_text('rising')
+        return {"content": "Smoke rising", "streamed": True}
+
+    leader = threading.Thread(target=lambda: requests.run('key', work, on_text=lambda text: None))
+    leader.start()
+    started.wait(5)
+    listener, listener_results = [], []
+    joiner = threading.Thread(
+        target=lambda: listener_results.append(requests.run('key', work, on_text=listener.append)))
+    joiner.start()
+    quiet, quiet_results = run_in_thread(requests, 'key', work)
+    wait_for(lambda: requests._jobs['key'].subscribers == 3)
+    finish.set()
+    for thread in (leader, joiner, quiet):
+        thread.join(5)
+    assert ''.join(listener) == 'Smoke rising'
+    assert listener_results[0]['streamed']
+    # A caller that asked for no text shows the result whole.
+    assert not quiet_results[0]['streamed']
+
+
+def test_different_keys_and_later_calls_run_separately():
+    requests = InFlightRequests()
+    calls = []
+
+    def work(progress, on_text, cancel):
+        calls.append(1)
+        return {"content": len(calls)}
+
+    assert requests.run('a', work) == {"content": 1}
+    assert requests.run('b', work) == {"content": 2}
+    assert requests.run('a', work) == {"content": 3}
+
+
+def test_errors_reach_every_caller():
+    requests = InFlightRequests()
+    work = BlockingWork()
+
+    def failing(progress, on_text, cancel):
+        work(progress, on_text, cancel)
+        raise RuntimeError("quota")
+
+    errors = []
+
+    def call():
+        try:
+            requests.run('key', failing)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=call) for _ in range(2)]
+    threads[0].start()
+    wait_for(lambda: work.calls == 1)
+    threads[1].start()
+    wait_for(lambda: requests._jobs['key'].subscribers == 2)
+    work.release.set()
+    for thread in threads:
+        thread.join(5)
+    assert errors == ["quota", "quota"]
+    assert len(requests) == 0
+
+
+def test_async_callers_share_one_run():
+    requests = AsyncInFlightRequests()
+    calls = []
+
+    async def work(progress, on_text):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"content": "done"}
+
+    async def main():
+        return await asyncio.gather(*(requests.run('key', work) for _ in range(3)))
+
+    assert asyncio.run(main()) == [{"content": "done"}] * 3
+    assert calls == [1] and len(requests) == 0
+
+
+def test_cancelling_every_async_caller_cancels_the_run():
+    requests = AsyncInFlightRequests()
+    cancelled = []
+
+    async def work(progress, on_text):
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        callers = [asyncio.ensure_future(requests.run('key', work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        callers[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not cancelled
+        callers[1].cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(main())
+    assert cancelled == [1] and len(requests) == 0
+
+
+def test_cancelling_one_caller_keeps_the_run_for_the_others():
+    requests = InFlightRequests()
+    work = BlockingWork()
+    cancel = CancelToken()
+    first, first_results = run_in_thread(requests, 'key', work, cancel)
+    wait_for(lambda: work.calls == 1)
+    second, second_results = run_in_thread(requests, 'key', work)
+    wait_for(lambda: requests._jobs['key'].subscribers == 2)
+    cancel.cancel()
+    wait_for(lambda: requests._jobs['key'].subscribers == 1)
+    assert not requests._jobs['key'].cancel.cancelled
+    work.release.set()
+    second.join(5)
+    first.join(5)
+    assert first_results[0]['cancelled']
+    assert second_results == [{"content": "done"}]
+    assert work.calls == 1
+
+
+def test_last_caller_leaving_aborts_the_run():
+    requests = InFlightRequests()
+    work = BlockingWork()
+    cancel = CancelToken()
+    thread, results = run_in_thread(requests, 'key', work, cancel)
+    wait_for(lambda: work.calls == 1)
+    job = requests._jobs['key']
+    cancel.cancel()
+    thread.join(5)
+    assert job.cancel.cancelled
+    assert results[0]['cancelled']
+    assert len(requests) == 0
+
+
+def test_hold_keeps_a_run_alive_until_released():
+    requests = InFlightRequests()
+    work = BlockingWork()
+    cancel = CancelToken()
+    thread, _ = run_in_thread(requests, 'key', work, cancel)
+    wait_for(lambda: work.calls == 1)
+    job = requests._jobs['key']
+    release = requests.hold('key')
+    cancel.cancel()
+    assert not job.cancel.cancelled
+    release()
+    release()
+    assert job.cancel.cancelled
+    thread.join(5)
+
+
+def test_hold_of_an_idle_key_does_nothing():
+    requests = InFlightRequests()
+    requests.hold('key')()
+    assert len(requests) == 0
+
+
+def test_reanalysing_the_same_file_joins_the_running_request(qt_app, monkeypatch, tmp_path):
+    # Pressing "Analyze Content" again starts a new job and cancels the old
+    # one straight away; the new job must join the request, not restart it.
+    from sef.qt import AnalysisJob
+
+    work = BlockingWork()
+    monkeypatch.setattr(analysis, 'analyze_media',
+                        lambda *args, cancel=None, **options: work(None, None, cancel))
+    engine = AnalysisEngine(api_key='key')
+    executor = JobExecutor(max_workers=4)
+    file_path = str(tmp_path / 'image.jpg')
+
+    def click(previous):
+        job = AnalysisJob(engine, file_path, executor=executor)
+        job.start()
+        if previous is not None:
+            previous.cancel()
+        return job
+
+    first = click(None)
+    wait_for(lambda: work.calls == 1)
+    second = click(first)
+    job = click(second)
+    running = next(iter(engine.in_flight._jobs.values()))
+    # Once the cancelled jobs have let go, only the last one is subscribed.
+    wait_for(lambda: second.job.done() and len(running._progress) == 1)
+    work.release.set()
+    assert job.job.result(5)['content'] == 'done'
+    assert first.job.result(5)['cancelled']
+    assert work.calls == 1
+    executor.shutdown()
@@ -0,0 +1,80 @@
+import threading
+
+import pytest
+
+from sef.jobs import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, JobExecutor, QueueFull
+
+
+def blocked_executor(queue_limit):
+    # One worker held busy, so everything submitted afterwards waits.
+    executor = JobExecutor(max_workers=1, queue_limit=queue_limit)
+    started, release = threading.Event(), threading.Event()
+    executor.submit(lambda cancel: (started.set(), release.wait(5)))
+    started.wait(5)
+    return executor, release
+
+
+def test_admitted_work_shares_the_queue_limit():
+    executor, release = blocked_executor(2)
+    free = executor.admit()
+    executor.submit(lambda cancel: None)
+    with pytest.raises(QueueFull):
+        executor.admit()
+    with pytest.raises(QueueFull):
+        executor.submit(lambda cancel: None)
+    free()
+    free()
+    assert executor.stats()['admitted'] == 0
+    executor.admit()
+    release.set()
+    executor.shutdown()
+
+
+def test_jobs_start_by_priority_then_arrival():
+    executor, release = blocked_executor(10)
+    order = []
+    for name, priority in [('low', PRIORITY_LOW), ('normal', PRIORITY_NORMAL), ('high 1', PRIORITY_HIGH),
+                           ('high 2', PRIORITY_HIGH)]:
+        executor.submit(lambda cancel, name=name: order.append(name), priority)
+    last = executor.submit(lambda cancel: None, PRIORITY_LOW)
+    release.set()
+    last.result(5)
+    assert order == ['high 1', 'high 2', 'normal', 'low']
+    executor.shutdown()
+
+
+def test_full_queue_refuses_jobs_until_cancelled_ones_are_dropped():
+    executor, release = blocked_executor(2)
+    ran = []
+    first = executor.submit(lambda cancel: ran.append('first'))
+    executor.submit(lambda cancel: ran.append('second'))
+    with pytest.raises(QueueFull):
+        executor.submit(lambda cancel: ran.append('third'))
+    first.cancel()
+    assert executor.stats()['queued'] == 1
+    third = executor.submit(lambda cancel: ran.append('third'))
+    release.set()
+    third.result(5)
+    assert ran == ['second', 'third']
+    assert first.future.cancelled()
+    executor.shutdown()
+
+
+def test_running_jobs_see_their_cancel_token():
+    executor = JobExecutor(max_workers=1)
+    started = threading.Event()
+    job = executor.submit(lambda cancel: (started.set(), cancel.wait(5))[1])
+    started.wait(5)
+    job.cancel()
+    assert job.cancelled()
+    executor.shutdown()
+
+
+def test_workers_are_capped():
+    executor = JobExecutor(max_workers=2)
+    release = threading.Event()
+    jobs = [executor.submit(lambda cancel: release.wait(5)) for _ in range(5)]
+    assert executor.stats()['workers'] == 2
+    release.set()
+    assert all(job.result(5) for job in jobs)
+    executor.shutdown()
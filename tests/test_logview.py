@@ -0,0 +1,42 @@
+import os
+import time
+
+import pytest
+
+pytest.importorskip('PyQt6.QtWidgets')
+
+from sef.logview import SessionLog
+
+
+def test_session_log_rolls_over_past_its_cap(tmp_path):
+    log = SessionLog(str(tmp_path), max_bytes=100)
+    for line in range(30):
+        log.write(f'line {line:02d}\n')
+    log.close()
+    current, rolled = log.path, log.path + '.1'
+    assert sorted(os.listdir(tmp_path)) == sorted([os.path.basename(current), os.path.basename(rolled)])
+    assert os.path.getsize(rolled) > 100 and os.path.getsize(current) <= 100
+    with open(current, encoding='utf-8') as file:
+        assert file.read().endswith('line 29\n')
+
+
+def test_old_session_logs_are_pruned(tmp_path):
+    old = tmp_path / 'analysis-20200101-000000-1.log'
+    recent = tmp_path / 'analysis-20200102-000000-1.log.1'
+    other = tmp_path / 'notes.txt'
+    for path in (old, recent, other):
+        path.write_text('x')
+    os.utime(old, (time.time() - 3 * 86400,) * 2)
+    os.utime(other, (time.time() - 3 * 86400,) * 2)
+    SessionLog(str(tmp_path), max_age=2 * 86400).close()
+    assert not old.exists() and recent.exists() and other.exists()
+
+
+def test_falls_back_to_an_anonymous_file(tmp_path):
+    blocked = tmp_path / 'file'
+    blocked.write_text('')
+    log = SessionLog(str(blocked / 'logs'), max_bytes=10)
+    assert log.path is None
+    log.write('x' * 20)
+    log.write('y')
+    log.close()
@@ -0,0 +1,70 @@
+import io
+import random
+
+import pytest
+
+Image = pytest.importorskip('PIL.Image')
+
+from PIL.PngImagePlugin import PngInfo  # noqa: E402
+
+from sef.media import preprocess_image, strip_metadata  # noqa: E402
+
+GPS_INFO_TAG = 0x8825
+MAKE_TAG = 0x010F
+
+
+def noisy_image(size):
+    return Image.frombytes('RGB', size, random.Random(0).randbytes(size[0] * size[1] * 3))
+
+
+def tagged_jpeg(size, quality):
+    exif = Image.Exif()
+    exif[MAKE_TAG] = 'Camera'
+    exif[GPS_INFO_TAG] = {1: 'N', 2: (40.0, 42.0, 46.0)}
+    output = io.BytesIO()
+    noisy_image(size).save(output, 'JPEG', quality=quality, exif=exif,
+                           xmp=b'<x:xmpmeta xmlns:x="adobe:ns:meta/"></x:xmpmeta>')
+    return output.getvalue()
+
+
+def assert_no_exif(data):
+    with Image.open(io.BytesIO(data)) as image:
+        assert not image.getexif()
+        assert 'xmp' not in image.info
+    assert b'Exif\x00\x00' not in data
+
+
+def test_passed_through_jpeg_keeps_no_exif(tmp_path):
+    # Low quality and within MAX_EDGE: re-encoding would be larger, so the
+    # original pixels are sent.
+    original = tagged_jpeg((256, 256), 20)
+    path = tmp_path / 'gps.jpg'
+    path.write_bytes(original)
+    data, mime_type, info = preprocess_image(str(path))
+    assert mime_type == 'image/jpeg'
+    assert_no_exif(data)
+    with Image.open(io.BytesIO(data)) as stripped, Image.open(io.BytesIO(original)) as source:
+        assert stripped.tobytes() == source.tobytes()
+    assert info["bytes"] == len(data) < len(original)
+
+
+def test_reencoded_jpeg_keeps_no_exif():
+    data, _, info = preprocess_image(tagged_jpeg((2400, 1200), 95))
+    assert_no_exif(data)
+    assert info["size"] == (1600, 800)
+
+
+def test_png_text_chunks_are_stripped():
+    output = io.BytesIO()
+    metadata = PngInfo()
+    metadata.add_text('Location', '40.7128 N, 74.0060 W')
+    Image.new('RGB', (8, 8), (10, 20, 30)).save(output, 'PNG', pnginfo=metadata)
+    stripped = strip_metadata(output.getvalue(), 'image/png')
+    assert b'Location' not in stripped
+    with Image.open(io.BytesIO(stripped)) as image:
+        assert image.getpixel((0, 0)) == (10, 20, 30)
+
+
+def test_unknown_formats_are_not_stripped():
+    assert strip_metadata(b'GIF89a...', 'image/gif') is None
+    assert strip_metadata(b'not a jpeg', 'image/jpeg') is None
@@ -0,0 +1,90 @@
+from concurrent.futures import Future
+
+import pytest
+
+from sef.jobs import JobExecutor
+
+
+class StubEngine:
+    def hold_media(self, file_path, **options):
+        return lambda: None
+
+    def analyze_media(self, file_path, progress, on_text, cancel, **options):
+        return {"content": f"about {file_path}"}
+
+    def submit_scenario(self, scenario, description, progress, on_text, cancel):
+        future = Future()
+        future.set_result({"content": description})
+        return future
+
+
+def test_media_results_carry_the_analysed_file(qt_app, tmp_path):
+    # The window may have loaded another file by the time the result lands.
+    from sef.qt import AnalysisJob
+
+    executor = JobExecutor(max_workers=1)
+    file_path = str(tmp_path / 'image.jpg')
+    analysis_result = AnalysisJob(StubEngine(), file_path, executor=executor).start().result(5)
+    assert analysis_result['file_path'] == file_path
+    executor.shutdown()
+
+
+def test_scenario_results_carry_no_file(qt_app):
+    from sef.qt import ScenarioAnalysisJob
+
+    job = ScenarioAnalysisJob(StubEngine(), 'Fire', 'Smoke over the docks')
+    results = []
+    job.analysis_complete.connect(results.append)
+    job.start()
+    assert results[0]['file_path'] is None
+    assert results[0]['content'] == 'Smoke over the docks'
+
+
+def test_scenarios_are_admitted_under_the_queue_limit(qt_app):
+    from sef.jobs import QueueFull
+    from sef.qt import ScenarioAnalysisJob
+
+    pending = Future()
+
+    class SlowEngine(StubEngine):
+        def submit_scenario(self, scenario, description, progress, on_text, cancel):
+            return pending
+
+    executor = JobExecutor(max_workers=1, queue_limit=1)
+    ScenarioAnalysisJob(SlowEngine(), 'Fire', 'Smoke', executor=executor).start()
+    with pytest.raises(QueueFull):
+        ScenarioAnalysisJob(SlowEngine(), 'Flood', 'Water', executor=executor).start()
+    pending.set_result({"content": "Smoke"})
+    ScenarioAnalysisJob(StubEngine(), 'Flood', 'Water', executor=executor).start()
+    executor.shutdown()
+
+
+def test_history_model_reads_pages_on_demand(qt_app):
+    from PyQt6.QtCore import QObject, pyqtSignal
+    from PyQt6.QtGui import QImage
+
+    from sef.history import CACHED_PAGES, PAGE_SIZE, HistoryModel
+    from sef.store import HistoryStore
+
+    class NoThumbnails(QObject):
+        thumbnail_ready = pyqtSignal(str, QImage)
+
+        def thumbnail(self, file_path):
+            return None
+
+        def generate(self, file_path):
+            pass
+
+    store = HistoryStore(':memory:')
+    for number in range(PAGE_SIZE * (CACHED_PAGES + 2)):
+        store.add(f'/media/{number}.jpg', f"Finding {number}")
+    model = HistoryModel(store, NoThumbnails())
+    assert model.rowCount() == PAGE_SIZE * (CACHED_PAGES + 2)
+    for row in range(0, model.rowCount(), PAGE_SIZE):
+        model.data(model.index(row))
+    assert len(model._pages) == CACHED_PAGES
+    assert model.entry(PAGE_SIZE + 3) == (f'/media/{PAGE_SIZE + 3}.jpg', f"Finding {PAGE_SIZE + 3}")
+    model.add(None, "Scenario finding")
+    assert model.entry(model.rowCount() - 1) == (None, "Scenario finding")
+    model.set_search('scenario')
+    assert model.rowCount() == 1
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from sef.scheduler import RequestScheduler, TokenBucket, parse_retry_after
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_bucket_admits_a_burst_then_spaces_requests_out():
+    clock = FakeClock()
+    bucket = TokenBucket(60, clock=clock)
+    assert [bucket.reserve(1) for _ in range(60)] == [0.0] * 60
+    # The bucket is empty: each caller waits for the debt ahead of it.
+    assert bucket.reserve(1) == pytest.approx(1.0)
+    assert bucket.reserve(1) == pytest.approx(2.0)
+    clock.now = 2.0
+    assert bucket.reserve(1) == pytest.approx(1.0)
+
+
+def test_bucket_refills_up_to_capacity_only():
+    clock = FakeClock()
+    bucket = TokenBucket(60, capacity=10, clock=clock)
+    clock.now = 3600.0
+    assert [bucket.reserve(1) for _ in range(10)] == [0.0] * 10
+    assert bucket.reserve(1) > 0
+
+
+def test_credit_returns_overestimated_tokens():
+    clock = FakeClock()
+    bucket = TokenBucket(1000, clock=clock)
+    bucket.reserve(1000)
+    bucket.credit(400)
+    assert bucket.reserve(400) == 0.0
+    assert bucket.reserve(1) > 0
+
+
+def test_scheduler_waits_for_the_scarcer_budget():
+    clock = FakeClock()
+    scheduler = RequestScheduler(requests_per_minute=600, tokens_per_minute=1200, clock=clock, sleep=clock.sleep)
+    assert scheduler.acquire(1200) == 0.0
+    assert scheduler.acquire(600) == pytest.approx(30.0)
+    assert clock.now == pytest.approx(30.0)
+    stats = scheduler.stats()
+    assert stats['admitted'] == 2 and stats['max_wait'] == pytest.approx(30.0)
+    assert stats['queue_depth'] == 0
+
+
+def test_settle_charges_the_difference():
+    clock = FakeClock()
+    scheduler = RequestScheduler(requests_per_minute=600, tokens_per_minute=1000, clock=clock)
+    scheduler.reserve(1000)
+    scheduler.settle(1000, 200)
+    assert scheduler.reserve(800) == 0.0
+
+
+def test_only_transient_statuses_are_retried():
+    scheduler = RequestScheduler(max_retries=2)
+    assert scheduler.should_retry(429, 0)
+    assert scheduler.should_retry(503, 1)
+    assert not scheduler.should_retry(503, 2)
+    assert not scheduler.should_retry(400, 0)
+
+
+def test_retry_after_seconds_and_http_dates():
+    assert parse_retry_after('7') == 7.0
+    assert parse_retry_after('-3') == 0.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert parse_retry_after(format_datetime(retry_at, usegmt=True)) == pytest.approx(30, abs=2)
+    past = datetime.now(timezone.utc) - timedelta(seconds=30)
+    assert parse_retry_after(format_datetime(past, usegmt=True)) == 0.0
+
+
+def test_retry_after_overrides_backoff_within_the_cap():
+    clock = FakeClock()
+    scheduler = RequestScheduler(backoff_base=1.0, backoff_max=20.0, clock=clock, sleep=clock.sleep)
+    assert scheduler.backoff(0, '12') == 12.0
+    assert clock.now == 12.0
+    assert scheduler.retry_delay(0, '600') == 20.0
+    assert 0.0 <= scheduler.retry_delay(3) <= 8.0
+    assert scheduler.stats()['retries'] == 3
@@ -0,0 +1,80 @@
+import random
+
+import pytest
+
+from sef.spatial import GridIndex, cluster_size, haversine
+
+NEW_YORK = (40.7128, -74.0060)
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(3)
+    return {item_id: (NEW_YORK[0] + rng.gauss(0, 0.05), NEW_YORK[1] + rng.gauss(0, 0.05))
+            for item_id in range(1, 2001)}
+
+
+@pytest.fixture
+def index(points):
+    index = GridIndex()
+    for item_id, (lat, lon) in points.items():
+        index.insert(item_id, lat, lon)
+    return index
+
+
+def brute_force(points, south, west, north, east):
+    return {item_id for item_id, (lat, lon) in points.items() if south <= lat <= north and west <= lon <= east}
+
+
+@pytest.mark.parametrize('box', [(40.70, -74.02, 40.72, -74.00), (40.0, -75.0, 41.0, -73.0),
+                                 (40.7128, -74.0060, 40.7128, -74.0060), (50.0, 10.0, 51.0, 11.0)])
+def test_bbox_matches_a_brute_force_filter(index, points, box):
+    assert {item_id for item_id, _, _ in index.bbox(*box)} == brute_force(points, *box)
+
+
+def test_radius_is_exact_and_nearest_first(index, points):
+    found = index.radius(*NEW_YORK, 2000)
+    assert {item_id for item_id, *_ in found} == {
+        item_id for item_id, (lat, lon) in points.items() if haversine(*NEW_YORK, lat, lon) <= 2000}
+    distances = [distance for *_, distance in found]
+    assert distances == sorted(distances)
+
+
+def test_removed_and_moved_points(index, points):
+    index.remove(1)
+    index.insert(2, 10.0, 10.0)
+    del points[1]
+    points[2] = (10.0, 10.0)
+    assert len(index) == 1999 and 1 not in index
+    box = (40.0, -75.0, 41.0, -73.0)
+    assert {item_id for item_id, _, _ in index.bbox(*box)} == brute_force(points, *box)
+    assert [item_id for item_id, _, _ in index.bbox(9.9, 9.9, 10.1, 10.1)] == [2]
+
+
+@pytest.mark.parametrize('zoom', [8, 10, 12, 13, 17])
+def test_clusters_account_for_every_point_in_view(index, points, zoom):
+    box = (40.60, -74.20, 40.80, -73.80)
+    clusters = index.cluster(*box, zoom)
+    in_view = brute_force(points, *box)
+    total = sum(cluster['count'] for cluster in clusters)
+    if cluster_size(zoom) < 2 * index.cell_size:
+        assert total == len(in_view)
+    else:
+        # Coarse clusters merge whole cells, so cells on the edge count in full.
+        assert total >= len(in_view)
+    assert len({cluster['key'] for cluster in clusters}) == len(clusters)
+    for cluster in clusters:
+        if cluster['count'] == 1:
+            assert cluster['key'] == f"i{cluster['id']}"
+            assert (cluster['lat'], cluster['lon']) == pytest.approx(points[cluster['id']])
+
+
+def test_fine_clusters_are_the_mean_of_their_members():
+    index = GridIndex()
+    index.insert('a', 40.0, -74.0)
+    index.insert('b', 40.0002, -74.0002)
+    [cluster] = index.cluster(39.9, -74.1, 40.1, -73.9, 14)
+    assert cluster['count'] == 2
+    assert (cluster['lat'], cluster['lon']) == pytest.approx((40.0001, -74.0001))
+    [first, second] = sorted(index.cluster(39.9, -74.1, 40.1, -73.9, 22), key=lambda cluster: cluster['id'])
+    assert (first['id'], second['id']) == ('a', 'b')
@@ -0,0 +1,70 @@
+import sqlite3
+
+import pytest
+
+from sef.store import HistoryStore, fts_query
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / 'history.db'))
+    yield store
+    store.close()
+
+
+def fill(store):
+    store.add('/media/fire.jpg', 'Smoke rising from a warehouse roof', created=1.0)
+    store.add('/media/crowd.mp4', 'Large crowd gathering near the stadium gate', created=2.0)
+    store.add(None, 'Warehouse fire scenario: evacuate and call the fire brigade', created=3.0)
+    for number in range(20):
+        store.add(f'/media/{number}.jpg', f'Routine patrol footage {number}', created=10.0 + number)
+
+
+def test_history_is_kept_in_wal_mode(store, tmp_path):
+    assert store._db.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_pages_are_in_insertion_order(store):
+    fill(store)
+    assert store.count() == 23
+    rows = store.page(1, 2)
+    assert [(created, file_path) for _, created, file_path in rows] == [(2.0, '/media/crowd.mp4'), (3.0, None)]
+    assert store.insights(rows[0][0]) == 'Large crowd gathering near the stadium gate'
+    assert len(store.page(20, 10)) == 3
+    assert store.insights(999) is None
+
+
+@pytest.mark.parametrize('full_text', [True, False])
+def test_search_matches_every_word(store, full_text):
+    if full_text and not store.full_text:
+        pytest.skip("SQLite built without FTS5")
+    store.full_text = full_text
+    fill(store)
+    assert store.count('warehouse') == 2
+    assert [row[2] for row in store.page(0, 10, 'warehouse fire')] == [None]
+    assert store.count('patrol') == 20
+    assert [row[2] for row in store.page(5, 2, 'patrol')] == ['/media/5.jpg', '/media/6.jpg']
+    assert store.count('   ') == 23
+
+
+def test_prefix_search_and_inert_syntax(store):
+    if not store.full_text:
+        pytest.skip("SQLite built without FTS5")
+    fill(store)
+    assert store.count('ware') == 2
+    assert store.count('gather stad') == 1
+    # FTS operators are searched for as words, not parsed.
+    assert store.count('"NEAR(') == 1
+    assert store.count('fire AND OR') == 0
+    assert fts_query('say "hi"') == '"say"* """hi"""*'
+
+
+def test_history_survives_reopening(tmp_path):
+    path = str(tmp_path / 'history.db')
+    store = HistoryStore(path)
+    store.add('/media/fire.jpg', 'Smoke rising')
+    store.close()
+    reopened = HistoryStore(path)
+    assert reopened.count('smoke') == 1
+    reopened.close()
+    assert sqlite3.connect(path).execute('SELECT count(*) FROM analyses').fetchone()[0] == 1
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from sef.timeseries import RollingSeries, lttb
+
+NOW = 1_700_000_000.0
+
+
+def test_lttb_keeps_the_ends_and_the_peaks():
+    xs = np.arange(10000, dtype=float)
+    ys = np.sin(xs / 500)
+    ys[1234], ys[8765] = 50, -50
+    picked_xs, picked_ys = lttb(xs, ys, 100)
+    assert len(picked_xs) == 100
+    assert picked_xs[0] == 0 and picked_xs[-1] == 9999
+    assert np.all(np.diff(picked_xs) > 0)
+    assert 50 in picked_ys and -50 in picked_ys
+
+
+def test_lttb_leaves_short_series_alone():
+    xs, ys = lttb([1, 2, 3], [4, 5, 6], 10)
+    assert xs.tolist() == [1, 2, 3] and ys.tolist() == [4, 5, 6]
+
+
+def test_gauge_reads_back_interval_means_and_skips_gaps():
+    series = RollingSeries('gauge')
+    series.record(10, NOW - 5.5)
+    series.record(20, NOW - 5.2)
+    series.record(40, NOW - 1)
+    timestamps, values = series.window(60, NOW)
+    assert timestamps.tolist() == [NOW - 6, NOW - 1]
+    assert values.tolist() == [15, 40]
+
+
+def test_gauge_reduced_to_chart_points():
+    series = RollingSeries('gauge')
+    for second in range(3600):
+        series.record(second % 100, NOW - 3600 + second)
+    timestamps, values = series.window(3600, NOW, 300)
+    assert len(timestamps) == 300 and values.max() == 99
+
+
+def test_long_windows_read_coarser_rings():
+    series = RollingSeries('counter')
+    series.record(1, NOW - 20 * 86400)
+    series.record(1, NOW - 10)
+    timestamps, counts = series.window(30 * 86400, NOW)
+    assert timestamps[1] - timestamps[0] == 60
+    assert counts.sum() == 2
+    # Too old for the seconds ring: only the recent incident is there.
+    assert series.window(7 * 86400, NOW)[1].sum() == 1
+
+
+def test_counter_is_summed_into_buckets_ending_now():
+    # A sparse counter: LTTB would turn this into 0/1 spikes.
+    series = RollingSeries('counter')
+    rng = np.random.default_rng(1)
+    for timestamp in NOW - rng.uniform(0, 86400, 500):
+        series.record(1, timestamp)
+    timestamps, counts = series.window(86400, NOW, 300)
+    assert len(counts) == 300
+    assert counts.sum() == 500
+    assert timestamps[1] - timestamps[0] == 288
+    assert timestamps[-1] + 288 > NOW
+
+
+def test_old_samples_fall_out_of_the_ring():
+    series = RollingSeries('counter', resolutions=((1, 10),))
+    series.record(1, NOW - 20)
+    series.record(1, NOW)
+    assert series.window(10, NOW)[1].sum() == 1
+
+
+def test_unknown_kind():
+    with pytest.raises(ValueError):
+        RollingSeries('histogram')